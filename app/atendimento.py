@@ -0,0 +1,279 @@
+"""Processamento de uma mensagem do cliente: identificação, comandos, IA e resposta.
+
+Roda fora do request do webhook (ver app/utils/jobs.py), então pode demorar
+o quanto precisar sem segurar a UltraMsg esperando.
+"""
+import re
+from typing import Dict, Optional
+
+from app.config import LIMITE_AVISO_INTERVALO, LIMITE_MAX_TELEFONES, config, logger
+from app.utils.db import (
+    executar_db,
+    buscar_cliente_por_telefone,
+    salvar_novo_cliente,
+    adicionar_ao_carrinho,
+    ver_carrinho,
+    fechar_pedido,
+)
+from app.utils.cache import CacheTTL
+from app.utils.cache_respostas import cache_respostas, motivo_sem_cache
+from app.utils.cardapio_cache import obter_cardapio_formatado, buscar_produto_no_cardapio
+from app.utils.ferramentas import FerramentasAtendimento
+from app.utils.groq_client import (
+    ErroGroq, gerar_resposta_nordestina, resposta_de_falha, resposta_do_cache, RESPOSTA_SOBRECARGA,
+)
+from app.utils.intencoes import classificar, extrair_nome
+from app.utils.limites import verificar_limite
+from app.utils.memoria import memoria, obter_historico, registrar_turno
+from app.utils.telemetria import medir
+from app.utils.ultramsg_client import enfileirar_mensagem
+
+_nao_digitos = re.compile(r"\D+")
+
+# Contexto das respostas que vão pro cache: igual pra todo cliente, sem nome
+CONTEXTO_FAQ = "Responda como atendente simpático de hamburgueria, sem chamar o cliente pelo nome."
+
+def _only_digits(s: str) -> str:
+    return _nao_digitos.sub("", s or "")
+
+def extrair_telefone(raw_chat_id: Optional[str], raw_from: Optional[str]) -> Optional[str]:
+    val = raw_chat_id or raw_from
+    if not val:
+        return None
+    num = val.split("@")[0]
+    return _only_digits(num)
+
+def _formatar_carrinho(itens: list) -> str:
+    if not itens:
+        return "Teu carrinho tá vazio ainda, meu rei!"
+    
+    texto = "🛒 *SEU CARRINHO* 🛒\n\n"
+    total_centavos = 0
+    
+    for item in itens:
+        preco_reais = item['preco_centavos'] / 100
+        subtotal_reais = item['subtotal_centavos'] / 100
+        texto += f"• {item['quantidade']}x *{item['nome']}* - R$ {subtotal_reais:.2f}\n"
+        total_centavos += item['subtotal_centavos']
+    
+    total_reais = total_centavos / 100
+    texto += f"\n💰 *Total: R$ {total_reais:.2f}*"
+    return texto
+
+RESPOSTA_LIMITE_TELEFONE = "Calma, meu rei! Uma mensagem de cada vez, que eu já te respondo, visse?"
+
+# Quem já foi avisado do limite recentemente (pra não responder cada mensagem do spam)
+_avisados = CacheTTL(maxsize=LIMITE_MAX_TELEFONES, ttl=LIMITE_AVISO_INTERVALO)
+config.ao_mudar(("LIMITE_AVISO_INTERVALO",), lambda: setattr(_avisados, "ttl", config.LIMITE_AVISO_INTERVALO))
+
+async def _responder_limitado(telefone: str, motivo: str) -> Dict:
+    logger.info(f"🚦 Limite de mensagens atingido ({motivo}) para {telefone}")
+    if _avisados.adicionar_se_ausente(telefone):
+        resposta = RESPOSTA_LIMITE_TELEFONE if motivo == "telefone" else RESPOSTA_SOBRECARGA
+        await enfileirar_mensagem(telefone, resposta)
+    return {"status": "limitado", "motivo": motivo}
+
+async def _lembrar(telefone: str, texto_cliente: str, resposta: str):
+    """Guarda o turno na memória da conversa; as respostas de comando entram resumidas."""
+    await registrar_turno(telefone, "user", texto_cliente)
+    await registrar_turno(telefone, "assistant", resposta)
+
+async def processar_mensagem(msg: Dict) -> Dict:
+    """Pipeline completo de uma mensagem já validada pelo webhook.
+
+    Falha (banco fora, IA indisponível) sai como exceção: a fila do Postgres tenta
+    de novo até JOBS_MAX_TENTATIVAS. Enquanto `msg["tentativas_restantes"]` for
+    maior que zero, erro transitório da IA também sobe em vez de virar resposta
+    "Eita!" pro cliente.
+    """
+    with medir("processar_mensagem"):
+        return await _processar_mensagem(msg)
+
+async def _processar_mensagem(msg: Dict) -> Dict:
+    try:
+        telefone  = msg["telefone"]
+        texto_cli = msg["texto"]
+        pushname  = msg.get("pushname", "")
+
+        with medir("cliente_busca"):
+            cliente = await executar_db(buscar_cliente_por_telefone, telefone)
+        logger.info(f"👤 Cliente encontrado: {cliente is not None}")
+
+        contexto = None
+
+        if not cliente:
+            logger.info("🆕 Cliente novo, verificando nome...")
+            nome_detectado = extrair_nome(texto_cli)
+            nome_para_cadastro = nome_detectado or pushname
+            
+            if nome_para_cadastro:
+                try:
+                    logger.info(f"💾 Cadastrando cliente: {nome_para_cadastro}")
+                    cliente_id = await executar_db(salvar_novo_cliente, telefone, nome_para_cadastro)
+                    cliente = {"id": cliente_id, "nome": nome_para_cadastro, "telefone": telefone}
+                    contexto = f"Oi {nome_para_cadastro}! Te cadastrei aqui rapidinho. Bem-vindo!"
+                    logger.info(f"✅ Cliente cadastrado com ID: {cliente_id}")
+                except Exception as e:
+                    logger.exception(f"❌ Erro ao cadastrar cliente: {e}")
+                    contexto = "Eita! Deu um problema aqui. Me diga seu nome pra eu te cadastrar direitinho."
+            else:
+                logger.info("❓ Nome não detectado, pedindo para cliente se identificar")
+                contexto = "Oi, meu rei! Pra eu te atender melhor, me diga seu nome completo, por favor."
+
+        if cliente:
+            nome_cliente = cliente.get('nome', 'meu rei')
+            logger.info(f"🎯 Processando comandos para cliente: {nome_cliente}")
+            
+            with medir("intencao"):
+                intencao = classificar(texto_cli)
+            logger.info(f"🧭 Intenção: {intencao.nome} (confiança {intencao.confianca:.2f})")
+
+            if intencao.nome == "cardapio":
+                logger.info("📋 Comando: mostrar cardápio")
+                resposta = await obter_cardapio_formatado()
+                logger.info("📤 Enviando cardápio")
+                await _lembrar(telefone, texto_cli, "[mostrei o cardápio]")
+                
+                try:
+                    await enfileirar_mensagem(telefone, resposta)
+                    logger.info("✅ Cardápio enfileirado para envio")
+                    return {"status": "ok"}
+                except Exception as e:
+                    logger.exception(f"❌ Erro ao enviar cardápio: {e}")
+                    return {"status": "erro_envio", "detail": str(e)}
+
+            if intencao.nome == "adicionar":
+                logger.info(f"🛒 Comando: adicionar {[(i.quantidade, i.produto) for i in intencao.itens]}")
+                linhas = []
+                carrinho = None
+                for item in intencao.itens:
+                    produto = await buscar_produto_no_cardapio(item.produto)
+                    if not produto:
+                        logger.info(f"❌ Produto não encontrado: {item.produto}")
+                        linhas.append(f"Oxente! Num achei '{item.produto}' no cardápio não.")
+                        continue
+
+                    logger.info(f"✅ Produto encontrado: {produto['nome']}")
+                    try:
+                        carrinho = await executar_db(adicionar_ao_carrinho, cliente['id'], produto['id'], item.quantidade)
+                        logger.info(f"📦 Carrinho {carrinho['carrinho_id']}: total {carrinho['total_centavos']} centavos")
+                        preco_reais = produto['preco_centavos'] * item.quantidade / 100
+                        qtd = f"{item.quantidade}x " if item.quantidade > 1 else ""
+                        linhas.append(f"Oxente! Coloquei {qtd}*{produto['nome']}* (R$ {preco_reais:.2f}) no teu carrinho!")
+                        logger.info("✅ Produto adicionado ao carrinho")
+                    except Exception as e:
+                        logger.exception(f"❌ Erro ao adicionar no carrinho: {e}")
+                        linhas.append(f"Eita! Deu problema pra adicionar *{produto['nome']}* no carrinho. Tenta de novo, visse?")
+
+                resposta = "\n".join(linhas)
+                if carrinho:
+                    resposta += "\n\n" + _formatar_carrinho(carrinho['itens'])
+                    await _lembrar(telefone, texto_cli, "[mostrei o carrinho: " + ", ".join(f"{i['quantidade']}x {i['nome']}" for i in carrinho['itens']) + "]")
+                else:
+                    resposta += " Quer ver o que tem disponível?"
+
+                try:
+                    await enfileirar_mensagem(telefone, resposta)
+                    logger.info("✅ Resposta do carrinho enfileirada")
+                    return {"status": "ok"}
+                except Exception as e:
+                    logger.exception(f"❌ Erro ao enviar resposta do carrinho: {e}")
+                    return {"status": "erro_envio", "detail": str(e)}
+
+            if intencao.nome == "ver_carrinho":
+                logger.info("👀 Comando: ver carrinho")
+                itens = (await executar_db(ver_carrinho, cliente['id']))['itens']
+                if itens:
+                    resposta = _formatar_carrinho(itens)
+                    logger.info(f"📦 Mostrando carrinho com {len(itens)} itens")
+                    await _lembrar(telefone, texto_cli, "[mostrei o carrinho: " + ", ".join(f"{i['quantidade']}x {i['nome']}" for i in itens) + "]")
+                else:
+                    resposta = "Teu carrinho tá vazio ainda, meu rei! Quer dar uma olhada no cardápio?"
+                    logger.info("📦 Carrinho vazio")
+                
+                try:
+                    await enfileirar_mensagem(telefone, resposta)
+                    logger.info("✅ Carrinho enfileirado")
+                    return {"status": "ok"}
+                except Exception as e:
+                    logger.exception(f"❌ Erro ao enviar carrinho: {e}")
+                    return {"status": "erro_envio", "detail": str(e)}
+
+            if intencao.nome == "fechar_pedido":
+                logger.info("🧾 Comando: fechar pedido")
+                pedido = await executar_db(fechar_pedido, cliente['id'])
+                if pedido:
+                    numero = pedido['carrinho_id'][:8].upper()
+                    resposta = (
+                        f"✅ Pedido *#{numero}* fechado, meu rei!\n\n"
+                        + _formatar_carrinho(pedido['itens']).replace("SEU CARRINHO", "SEU PEDIDO")
+                        + "\n\nJá mandei pra cozinha, visse?"
+                    )
+                    logger.info(f"🧾 Pedido {pedido['carrinho_id']} fechado: total {pedido['total_centavos']} centavos")
+                    await _lembrar(telefone, texto_cli, f"[fechei o pedido #{numero}, total R$ {pedido['total_centavos'] / 100:.2f}]")
+                else:
+                    resposta = "Teu carrinho tá vazio ainda, meu rei! Bota alguma coisa nele antes de fechar o pedido."
+                    logger.info("🧾 Nada pra fechar: carrinho vazio")
+
+                try:
+                    await enfileirar_mensagem(telefone, resposta)
+                    logger.info("✅ Confirmação do pedido enfileirada")
+                    return {"status": "ok"}
+                except Exception as e:
+                    logger.exception(f"❌ Erro ao enviar confirmação do pedido: {e}")
+                    return {"status": "erro_envio", "detail": str(e)}
+            
+            
+            contexto = f"Cliente: {nome_cliente}. Responda como atendente simpático de hamburgueria."
+
+        with medir("memoria_historico"):
+            historico = await obter_historico(telefone)
+        recente = memoria.segundos_desde_ultimo_turno(telefone)
+        motivo = motivo_sem_cache(texto_cli, recente) if cliente else "cadastro"
+        ferramentas = None
+        resposta = resposta_do_cache(texto_cli) if motivo is None else None
+        if resposta is None:
+            # Só gasta ficha o que vai mesmo pra IA: o limite protege o Groq, não o cache
+            motivo_limite = await verificar_limite(telefone)
+            if motivo_limite:
+                return await _responder_limitado(telefone, motivo_limite)
+
+            logger.info("🤖 Gerando resposta via IA...")
+            repetir = msg.get("tentativas_restantes", 0) > 0
+            with medir("ia_resposta"):
+                try:
+                    if motivo is None:
+                        # Resposta que vai pro cache: só as ferramentas do cardápio, iguais pra todo cliente
+                        if config.GROQ_FERRAMENTAS:
+                            ferramentas = FerramentasAtendimento()
+                        resposta = await gerar_resposta_nordestina(
+                            texto_cli, CONTEXTO_FAQ, guardar_no_cache=True, ferramentas=ferramentas,
+                            conversa=telefone, repassar_falhas=repetir,
+                        )
+                    else:
+                        cache_respostas.registrar_bypass(motivo)
+                        if config.GROQ_FERRAMENTAS:
+                            ferramentas = FerramentasAtendimento(cliente['id'] if cliente else None)
+                        resposta = await gerar_resposta_nordestina(
+                            texto_cli, contexto, historico, ferramentas=ferramentas,
+                            conversa=telefone, repassar_falhas=repetir,
+                        )
+                except ErroGroq as e:
+                    # Se a IA já mexeu no carrinho, repetir a mensagem duplicaria o que ela fez
+                    if not (ferramentas and ferramentas.alteracoes):
+                        raise
+                    resposta = resposta_de_falha(e)
+        logger.info(f"💭 Resposta gerada: {resposta}")
+        if ferramentas and ferramentas.alteracoes:
+            await _lembrar(telefone, texto_cli, "[" + "; ".join(ferramentas.alteracoes) + "] " + resposta)
+        else:
+            await _lembrar(telefone, texto_cli, resposta)
+
+        await enfileirar_mensagem(telefone, resposta)
+        logger.info("✅ Mensagem enfileirada para envio!")
+        return {"status": "ok"}
+
+    except Exception as e:
+        # Sobe pra fila de jobs, que registra a falha e decide se tenta de novo
+        logger.error(f"💥 Erro processando mensagem de {msg.get('telefone')}: {e}")
+        raise
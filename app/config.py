@@ -1,21 +1,408 @@
+"""Configuração do bot, lida das variáveis de ambiente.
+
+Cada variável é um `Campo` de `Configuracao`, com tipo (da anotação), padrão e
+limites. `exigir_config_valida()` confere tudo de uma vez na subida e para o
+processo se algo estiver errado, em vez de cada mensagem descobrir sozinha.
+
+Os campos `recarregavel=True` (pool, timeouts, TTLs de cache, limites...) podem
+mudar com o processo rodando, pela tabela config_ajustes (ver
+app/utils/ajustes.py). Quem precisa do valor atual lê `config.NOME` na hora do
+uso ou registra `config.ao_mudar(...)`; as constantes do módulo
+(`from app.config import NOME`) guardam o valor da subida.
+"""
 import os
 import logging
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+_VERDADEIRO = ("1", "true", "yes", "y")
+
+GROQ_MODELS_VALIDOS = [
+    "llama-3.3-70b-versatile",
+]
+
+
+class ConfiguracaoInvalida(RuntimeError):
+    def __init__(self, erros: List[str]):
+        super().__init__("Configuração inválida: " + "; ".join(erros))
+        self.erros = erros
+
+
+class Campo:
+    """Uma variável de ambiente; o nome e o tipo vêm do atributo em `Configuracao`."""
+
+    def __init__(self, padrao, minimo=None, maximo=None, opcoes=None,
+                 recarregavel: bool = False, segredo: bool = False, tratar: Optional[Callable] = None):
+        self.padrao = padrao
+        self.minimo = minimo
+        self.maximo = maximo
+        self.opcoes = opcoes
+        self.recarregavel = recarregavel
+        self.segredo = segredo
+        self.tratar = tratar
+
+    def __set_name__(self, dono, nome):
+        self.nome = nome
+        self.tipo = dono.__annotations__[nome]
+
+    def __get__(self, instancia, dono=None):
+        if instancia is None:
+            return self
+        return instancia._valores[self.nome]
+
+    def converter(self, bruto: str):
+        bruto = bruto.strip()
+        if self.tipo is bool:
+            return bruto.lower() in _VERDADEIRO
+        if self.tipo is list:
+            return [parte.strip() for parte in bruto.split(",") if parte.strip()]
+        valor = self.tipo(bruto)
+        return self.tratar(valor) if self.tratar else valor
+
+    def problema(self, valor) -> Optional[str]:
+        if self.opcoes and valor not in self.opcoes:
+            return f"{self.nome}={valor!r}: use um de {', '.join(self.opcoes)}"
+        if self.minimo is not None and valor < self.minimo:
+            return f"{self.nome}={valor}: o mínimo é {self.minimo}"
+        if self.maximo is not None and valor > self.maximo:
+            return f"{self.nome}={valor}: o máximo é {self.maximo}"
+        return None
+
+
+_url = lambda s: s.rstrip("/")
+_BACKENDS = ("memoria", "postgres")
+
+
+class Configuracao:
+    ULTRAMSG_INSTANCE_ID: str = Campo("")
+    ULTRAMSG_TOKEN: str       = Campo("", segredo=True)
+    ULTRAMSG_BASE_URL: str    = Campo("https://api.ultramsg.com", tratar=_url)
+    GROQ_API_KEY: str         = Campo("", segredo=True)
+    GROQ_MODEL: str           = Campo("", recarregavel=True)
+    GROQ_BASE_URL: str        = Campo("https://api.groq.com/openai/v1", tratar=_url)
+    DATABASE_URL: str         = Campo("", segredo=True)
+    DEBUG: bool               = Campo(False)
+
+    # Pool de conexões do PostgreSQL
+    DB_POOL_MIN: int      = Campo(1, minimo=0, recarregavel=True)
+    DB_POOL_MAX: int      = Campo(10, minimo=1, recarregavel=True)
+    DB_POOL_TIMEOUT: float = Campo(5.0, minimo=0.1, recarregavel=True)
+
+    # Cliente Groq
+    GROQ_MAX_CONCORRENCIA: int = Campo(8, minimo=1)
+    GROQ_MAX_CONEXOES: int     = Campo(20, minimo=1)
+    GROQ_TIMEOUT: float        = Campo(30.0, minimo=1, recarregavel=True)
+    GROQ_MAX_TENTATIVAS: int   = Campo(3, minimo=1, recarregavel=True)
+    GROQ_BACKOFF_MAX: float    = Campo(10.0, minimo=0, recarregavel=True)
+    # Com mais chamadas que isso esperando vaga, a IA é pulada e vai uma resposta pronta
+    # (0 = 4x GROQ_MAX_CONCORRENCIA)
+    GROQ_MAX_AGUARDANDO: int   = Campo(0, minimo=0, recarregavel=True)
+    # Modo ferramentas: a IA consulta cardápio e carrinho sozinha em vez de receber tudo no prompt
+    GROQ_FERRAMENTAS: bool          = Campo(True, recarregavel=True)
+    GROQ_FERRAMENTAS_MAX_PASSOS: int = Campo(4, minimo=1, maximo=10, recarregavel=True)
+    GROQ_USO_TTL: float             = Campo(86400.0, minimo=1, recarregavel=True)
+
+    # Envio pela UltraMsg
+    ULTRAMSG_TIMEOUT: float      = Campo(15.0, minimo=1, recarregavel=True)
+    ULTRAMSG_MAX_TENTATIVAS: int = Campo(4, minimo=1, recarregavel=True)
+    ULTRAMSG_WORKERS: int        = Campo(4, minimo=1)
+    ULTRAMSG_FILA_MAX: int       = Campo(1000, minimo=0)
+
+    # Fila de processamento do webhook
+    JOBS_BACKEND: str            = Campo("memoria", opcoes=_BACKENDS, tratar=str.lower)
+    JOBS_WORKERS: int            = Campo(8, minimo=1)
+    JOBS_FILA_MAX: int           = Campo(5000, minimo=0)
+    JOBS_MAX_TENTATIVAS: int     = Campo(3, minimo=1)
+    JOBS_BACKOFF_BASE: float     = Campo(5.0, minimo=0)   # espera antes da 2ª tentativa; dobra a cada falha
+    JOBS_POLL_INTERVALO: float   = Campo(5.0, minimo=0.1)
+    JOBS_TRAVADO_APOS: float     = Campo(300.0, minimo=1)
+    JOBS_DRENAGEM_TIMEOUT: float = Campo(25.0, minimo=0)
+
+    # Agrupamento de mensagens seguidas do mesmo cliente (0 = desligado)
+    AGRUPAR_JANELA_MS: float     = Campo(0.0, minimo=0, recarregavel=True)
+    AGRUPAR_MAX_ESPERA_MS: float = Campo(4000.0, minimo=0, recarregavel=True)
+    AGRUPAR_MAX_MENSAGENS: int   = Campo(6, minimo=1, recarregavel=True)
+
+    # Deduplicação de webhooks reenviados
+    DEDUP_MAX: int       = Campo(50000, minimo=1)
+    DEDUP_TTL: float     = Campo(86400.0, minimo=1, recarregavel=True)
+    DEDUP_POSTGRES: bool = Campo(False)
+
+    # Cache do cardápio (invalidado na hora via NOTIFY; o TTL é só rede de segurança)
+    CARDAPIO_CACHE_TTL: float = Campo(600.0, minimo=1, recarregavel=True)
+
+    # Cache telefone -> cliente
+    CLIENTES_CACHE_MAX: int   = Campo(10000, minimo=1)
+    CLIENTES_CACHE_TTL: float = Campo(300.0, minimo=0, recarregavel=True)
+
+    # Memória de conversa enviada pra IA
+    MEMORIA_MAX_CONVERSAS: int    = Campo(20000, minimo=1)
+    MEMORIA_MAX_TURNOS: int       = Campo(10, minimo=1)
+    MEMORIA_MAX_CHARS_RESUMO: int = Campo(600, minimo=0)
+    MEMORIA_MAX_CHARS_TURNO: int  = Campo(1000, minimo=50)
+    MEMORIA_TOKENS_HISTORICO: int = Campo(600, minimo=0)
+    MEMORIA_POSTGRES: bool        = Campo(False)
+    # Turnos mais velhos que isso saem de conversas_turnos na manutenção (0 = nunca)
+    MEMORIA_RETENCAO_DIAS: float  = Campo(30.0, minimo=0, recarregavel=True)
+
+    # Cache de respostas da IA pra perguntas repetidas
+    CACHE_RESPOSTAS_ATIVO: bool          = Campo(True, recarregavel=True)
+    CACHE_RESPOSTAS_MAX: int             = Campo(2000, minimo=1)
+    CACHE_RESPOSTAS_TTL: float           = Campo(3600.0, minimo=1, recarregavel=True)
+    CACHE_RESPOSTAS_SIMILARIDADE: float  = Campo(0.8, minimo=0, maximo=1, recarregavel=True)
+    # Conversa com turno mais novo que isso (segundos) não usa nem alimenta o cache
+    CACHE_RESPOSTAS_CONVERSA_RECENTE: float = Campo(900.0, minimo=0, recarregavel=True)
+
+    # Dicionários regionais extras pro nordestinizar (JSON, separados por vírgula)
+    NORDESTE_DICIONARIOS: list = Campo([])
+
+    # Limite de mensagens que vão pra IA (token bucket), por telefone e no total
+    LIMITE_BACKEND: str               = Campo("memoria", opcoes=_BACKENDS, tratar=str.lower)
+    LIMITE_TELEFONE_CAPACIDADE: float = Campo(5.0, minimo=1, recarregavel=True)
+    LIMITE_TELEFONE_POR_MINUTO: float = Campo(10.0, minimo=0.01, recarregavel=True)
+    LIMITE_GLOBAL_CAPACIDADE: float   = Campo(60.0, minimo=1, recarregavel=True)
+    LIMITE_GLOBAL_POR_MINUTO: float   = Campo(300.0, minimo=0.01, recarregavel=True)
+    LIMITE_MAX_TELEFONES: int         = Campo(50000, minimo=1)
+    LIMITE_AVISO_INTERVALO: float     = Campo(60.0, minimo=0, recarregavel=True)
+
+    # Servidor de produção (python -m app.servidor)
+    WEB_WORKERS: int            = Campo(0, minimo=0)   # 0 = automático (ver app/servidor.py)
+    WEB_DRENAGEM_TIMEOUT: float = Campo(5.0, minimo=0)
+    AQUECER_CONEXOES: bool      = Campo(True)
+
+    # Fração das medições de tempo por etapa que entram nos histogramas do /metrics
+    METRICAS_AMOSTRAGEM: float = Campo(1.0, minimo=0, maximo=1, recarregavel=True)
+
+    # Exportação de pedidos fechados (GET /pedidos/export); token vazio = desligado
+    EXPORT_TOKEN: str = Campo("", segredo=True)
+    EXPORT_LOTE: int  = Campo(500, minimo=1, recarregavel=True)
+
+    # Manutenção das tabelas (python -m app.manutencao, ou no processo web a cada intervalo)
+    MANUTENCAO_INTERVALO: float             = Campo(3600.0, minimo=0)   # 0 = só pelo comando
+    MANUTENCAO_LOTE: int                    = Campo(500, minimo=1, recarregavel=True)
+    MANUTENCAO_PAUSA_MS: float              = Campo(50.0, minimo=0, recarregavel=True)
+    MANUTENCAO_LOCK_TIMEOUT_MS: int         = Campo(2000, minimo=1, recarregavel=True)
+    MANUTENCAO_CARRINHO_EXPIRA_HORAS: float = Campo(24.0, minimo=0.1, recarregavel=True)
+    MANUTENCAO_CARRINHO_APAGA_DIAS: float   = Campo(30.0, minimo=0, recarregavel=True)  # 0 = nunca apaga
+    MANUTENCAO_JOBS_ERRO_DIAS: float        = Campo(7.0, minimo=0, recarregavel=True)   # 0 = nunca apaga
+    MANUTENCAO_CRIAR_INDICES: bool          = Campo(True)
 
+    LOG_LEVEL: str = Campo("INFO", opcoes=("DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"),
+                           recarregavel=True, tratar=str.upper)
 
-ULTRAMSG_INSTANCE_ID = os.getenv("ULTRAMSG_INSTANCE_ID","").strip()
-ULTRAMSG_TOKEN       = os.getenv("ULTRAMSG_TOKEN", "").strip()
-ULTRAMSG_BASE_URL    = os.getenv("ULTRAMSG_BASE_URL", "https://api.ultramsg.com").rstrip("/")
-GROQ_API_KEY         = os.getenv("GROQ_API_KEY", "").strip()
-GROQ_MODEL           = os.getenv("GROQ_MODEL", "")
-DATABASE_URL         = os.getenv("DATABASE_URL", "").strip()
-DEBUG                = os.getenv("DEBUG", "false").lower() in ("1","true","yes","y")
+    def __init__(self, ambiente: Optional[Dict[str, str]] = None):
+        ambiente = os.environ if ambiente is None else ambiente
+        self._valores: Dict = {}
+        self._erros_leitura: List[str] = []
+        for campo in self.campos():
+            bruto = ambiente.get(campo.nome)
+            valor = campo.padrao
+            if bruto is not None and bruto.strip():
+                try:
+                    valor = campo.converter(bruto)
+                except ValueError:
+                    self._erros_leitura.append(f"{campo.nome}={bruto!r}: esperava {campo.tipo.__name__}")
+            self._valores[campo.nome] = valor
+        # Valores do ambiente: é pra eles que um ajuste removido volta
+        self._originais = dict(self._valores)
+        self._ouvintes: List[Tuple[frozenset, Callable[[], None]]] = []
+
+    @classmethod
+    def campos(cls) -> List[Campo]:
+        return [v for v in vars(cls).values() if isinstance(v, Campo)]
+
+    @classmethod
+    def campo(cls, nome: str) -> Optional[Campo]:
+        valor = vars(cls).get(nome)
+        return valor if isinstance(valor, Campo) else None
+
+    def valores(self) -> Dict:
+        return dict(self._valores)
+
+    def validar(self, valores: Optional[Dict] = None) -> Tuple[List[str], List[str]]:
+        """(erros, avisos) da configuração inteira; erro impede a subida, aviso só vai pro log."""
+        v = self._valores if valores is None else valores
+        erros = list(self._erros_leitura) if valores is None else []
+        erros += [p for p in (c.problema(v[c.nome]) for c in self.campos()) if p]
+        avisos = []
+
+        if v["DB_POOL_MIN"] > v["DB_POOL_MAX"]:
+            erros.append(f"DB_POOL_MIN={v['DB_POOL_MIN']} maior que DB_POOL_MAX={v['DB_POOL_MAX']}")
+        if not v["GROQ_API_KEY"]:
+            avisos.append("GROQ_API_KEY vazia: as respostas da IA ficam desligadas")
+        elif v["GROQ_MODEL"] not in GROQ_MODELS_VALIDOS:
+            erros.append(f"GROQ_MODEL={v['GROQ_MODEL']!r} não é um modelo válido ({', '.join(GROQ_MODELS_VALIDOS)})")
+        if not v["DATABASE_URL"]:
+            avisos.append("DATABASE_URL vazia: sem cadastro de clientes, cardápio nem carrinho")
+            for nome, usa_banco in (
+                ("JOBS_BACKEND=postgres", v["JOBS_BACKEND"] == "postgres"),
+                ("LIMITE_BACKEND=postgres", v["LIMITE_BACKEND"] == "postgres"),
+                ("DEDUP_POSTGRES", v["DEDUP_POSTGRES"]),
+                ("MEMORIA_POSTGRES", v["MEMORIA_POSTGRES"]),
+            ):
+                if usa_banco:
+                    erros.append(f"{nome} precisa de DATABASE_URL")
+        if not (v["ULTRAMSG_INSTANCE_ID"] and v["ULTRAMSG_TOKEN"]):
+            avisos.append("ULTRAMSG_INSTANCE_ID/ULTRAMSG_TOKEN vazios: as respostas não serão enviadas")
+        return erros, avisos
+
+    def aplicar(self, ajustes: Dict[str, str]) -> Dict[str, Tuple]:
+        """Troca os campos recarregáveis pelos `ajustes` (texto, como no ambiente), tudo ou nada.
+
+        Campo recarregável fora de `ajustes` volta ao valor do ambiente. Devolve
+        {nome: (antes, depois)} do que mudou; levanta ConfiguracaoInvalida sem
+        mexer em nada se algum ajuste for inválido.
+        """
+        novos = dict(self._valores)
+        erros = []
+        for campo in self.campos():
+            if campo.recarregavel:
+                novos[campo.nome] = self._originais[campo.nome]
+        for nome, bruto in ajustes.items():
+            campo = self.campo(nome)
+            if campo is None or not campo.recarregavel:
+                erros.append(f"{nome}: não pode ser ajustado com o processo rodando")
+                continue
+            try:
+                novos[nome] = campo.converter(str(bruto))
+            except ValueError:
+                erros.append(f"{nome}={bruto!r}: esperava {campo.tipo.__name__}")
+        erros += self.validar(novos)[0]
+        if erros:
+            raise ConfiguracaoInvalida(erros)
+
+        mudancas = {n: (self._valores[n], novos[n]) for n in novos if novos[n] != self._valores[n]}
+        self._valores = novos
+        for nomes, func in self._ouvintes:
+            if nomes & mudancas.keys():
+                try:
+                    func()
+                except Exception as e:
+                    logger.exception(f"Falha ao aplicar ajuste de {', '.join(sorted(nomes & mudancas.keys()))}: {e}")
+        return mudancas
+
+    def ao_mudar(self, nomes: Iterable[str], func: Callable[[], None]):
+        """Chama `func()` depois de um `aplicar` que mude algum dos `nomes`."""
+        self._ouvintes.append((frozenset(nomes), func))
+
+    def resumo(self) -> Dict:
+        """Valores atuais (segredos mascarados), o que pode ser ajustado e o que está ajustado."""
+        def mostrar(campo: Campo, valor):
+            return ("***" if valor else "") if campo.segredo else valor
+        return {
+            "valores": {c.nome: mostrar(c, self._valores[c.nome]) for c in self.campos()},
+            "recarregaveis": [c.nome for c in self.campos() if c.recarregavel],
+            "ajustados": {
+                c.nome: self._valores[c.nome] for c in self.campos()
+                if c.recarregavel and self._valores[c.nome] != self._originais[c.nome]
+            },
+        }
+
+
+config = Configuracao()
+
+# Constantes com os valores da subida, pra `from app.config import NOME`.
+# Declaradas uma a uma (e não via globals()) pra linters e IDEs enxergarem;
+# tests/test_config.py confere que nenhum Campo ficou de fora.
+ULTRAMSG_INSTANCE_ID: str = config.ULTRAMSG_INSTANCE_ID
+ULTRAMSG_TOKEN: str = config.ULTRAMSG_TOKEN
+ULTRAMSG_BASE_URL: str = config.ULTRAMSG_BASE_URL
+GROQ_API_KEY: str = config.GROQ_API_KEY
+GROQ_MODEL: str = config.GROQ_MODEL
+GROQ_BASE_URL: str = config.GROQ_BASE_URL
+DATABASE_URL: str = config.DATABASE_URL
+DEBUG: bool = config.DEBUG
+
+DB_POOL_MIN: int = config.DB_POOL_MIN
+DB_POOL_MAX: int = config.DB_POOL_MAX
+DB_POOL_TIMEOUT: float = config.DB_POOL_TIMEOUT
+
+GROQ_MAX_CONCORRENCIA: int = config.GROQ_MAX_CONCORRENCIA
+GROQ_MAX_CONEXOES: int = config.GROQ_MAX_CONEXOES
+GROQ_TIMEOUT: float = config.GROQ_TIMEOUT
+GROQ_MAX_TENTATIVAS: int = config.GROQ_MAX_TENTATIVAS
+GROQ_BACKOFF_MAX: float = config.GROQ_BACKOFF_MAX
+GROQ_MAX_AGUARDANDO: int = config.GROQ_MAX_AGUARDANDO
+GROQ_FERRAMENTAS: bool = config.GROQ_FERRAMENTAS
+GROQ_FERRAMENTAS_MAX_PASSOS: int = config.GROQ_FERRAMENTAS_MAX_PASSOS
+GROQ_USO_TTL: float = config.GROQ_USO_TTL
+
+ULTRAMSG_TIMEOUT: float = config.ULTRAMSG_TIMEOUT
+ULTRAMSG_MAX_TENTATIVAS: int = config.ULTRAMSG_MAX_TENTATIVAS
+ULTRAMSG_WORKERS: int = config.ULTRAMSG_WORKERS
+ULTRAMSG_FILA_MAX: int = config.ULTRAMSG_FILA_MAX
+
+JOBS_BACKEND: str = config.JOBS_BACKEND
+JOBS_WORKERS: int = config.JOBS_WORKERS
+JOBS_FILA_MAX: int = config.JOBS_FILA_MAX
+JOBS_MAX_TENTATIVAS: int = config.JOBS_MAX_TENTATIVAS
+JOBS_BACKOFF_BASE: float = config.JOBS_BACKOFF_BASE
+JOBS_POLL_INTERVALO: float = config.JOBS_POLL_INTERVALO
+JOBS_TRAVADO_APOS: float = config.JOBS_TRAVADO_APOS
+JOBS_DRENAGEM_TIMEOUT: float = config.JOBS_DRENAGEM_TIMEOUT
+
+AGRUPAR_JANELA_MS: float = config.AGRUPAR_JANELA_MS
+AGRUPAR_MAX_ESPERA_MS: float = config.AGRUPAR_MAX_ESPERA_MS
+AGRUPAR_MAX_MENSAGENS: int = config.AGRUPAR_MAX_MENSAGENS
+
+DEDUP_MAX: int = config.DEDUP_MAX
+DEDUP_TTL: float = config.DEDUP_TTL
+DEDUP_POSTGRES: bool = config.DEDUP_POSTGRES
+
+CARDAPIO_CACHE_TTL: float = config.CARDAPIO_CACHE_TTL
+
+CLIENTES_CACHE_MAX: int = config.CLIENTES_CACHE_MAX
+CLIENTES_CACHE_TTL: float = config.CLIENTES_CACHE_TTL
+
+MEMORIA_MAX_CONVERSAS: int = config.MEMORIA_MAX_CONVERSAS
+MEMORIA_MAX_TURNOS: int = config.MEMORIA_MAX_TURNOS
+MEMORIA_MAX_CHARS_RESUMO: int = config.MEMORIA_MAX_CHARS_RESUMO
+MEMORIA_MAX_CHARS_TURNO: int = config.MEMORIA_MAX_CHARS_TURNO
+MEMORIA_TOKENS_HISTORICO: int = config.MEMORIA_TOKENS_HISTORICO
+MEMORIA_POSTGRES: bool = config.MEMORIA_POSTGRES
+MEMORIA_RETENCAO_DIAS: float = config.MEMORIA_RETENCAO_DIAS
+
+CACHE_RESPOSTAS_ATIVO: bool = config.CACHE_RESPOSTAS_ATIVO
+CACHE_RESPOSTAS_MAX: int = config.CACHE_RESPOSTAS_MAX
+CACHE_RESPOSTAS_TTL: float = config.CACHE_RESPOSTAS_TTL
+CACHE_RESPOSTAS_SIMILARIDADE: float = config.CACHE_RESPOSTAS_SIMILARIDADE
+CACHE_RESPOSTAS_CONVERSA_RECENTE: float = config.CACHE_RESPOSTAS_CONVERSA_RECENTE
+
+NORDESTE_DICIONARIOS: list = config.NORDESTE_DICIONARIOS
+
+LIMITE_BACKEND: str = config.LIMITE_BACKEND
+LIMITE_TELEFONE_CAPACIDADE: float = config.LIMITE_TELEFONE_CAPACIDADE
+LIMITE_TELEFONE_POR_MINUTO: float = config.LIMITE_TELEFONE_POR_MINUTO
+LIMITE_GLOBAL_CAPACIDADE: float = config.LIMITE_GLOBAL_CAPACIDADE
+LIMITE_GLOBAL_POR_MINUTO: float = config.LIMITE_GLOBAL_POR_MINUTO
+LIMITE_MAX_TELEFONES: int = config.LIMITE_MAX_TELEFONES
+LIMITE_AVISO_INTERVALO: float = config.LIMITE_AVISO_INTERVALO
+
+WEB_WORKERS: int = config.WEB_WORKERS
+WEB_DRENAGEM_TIMEOUT: float = config.WEB_DRENAGEM_TIMEOUT
+AQUECER_CONEXOES: bool = config.AQUECER_CONEXOES
+
+METRICAS_AMOSTRAGEM: float = config.METRICAS_AMOSTRAGEM
+
+EXPORT_TOKEN: str = config.EXPORT_TOKEN
+EXPORT_LOTE: int = config.EXPORT_LOTE
+
+MANUTENCAO_INTERVALO: float = config.MANUTENCAO_INTERVALO
+MANUTENCAO_LOTE: int = config.MANUTENCAO_LOTE
+MANUTENCAO_PAUSA_MS: float = config.MANUTENCAO_PAUSA_MS
+MANUTENCAO_LOCK_TIMEOUT_MS: int = config.MANUTENCAO_LOCK_TIMEOUT_MS
+MANUTENCAO_CARRINHO_EXPIRA_HORAS: float = config.MANUTENCAO_CARRINHO_EXPIRA_HORAS
+MANUTENCAO_CARRINHO_APAGA_DIAS: float = config.MANUTENCAO_CARRINHO_APAGA_DIAS
+MANUTENCAO_JOBS_ERRO_DIAS: float = config.MANUTENCAO_JOBS_ERRO_DIAS
+MANUTENCAO_CRIAR_INDICES: bool = config.MANUTENCAO_CRIAR_INDICES
+
+LOG_LEVEL: str = config.LOG_LEVEL
 
-LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
 RENDER_ENV = os.getenv("RENDER", False)
 
+_nivel_log = getattr(logging, LOG_LEVEL, logging.INFO)
 if RENDER_ENV:
     logging.basicConfig(
-        level=getattr(logging, LOG_LEVEL),
+        level=_nivel_log,
         format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
         handlers=[
             logging.StreamHandler()
@@ -23,8 +410,21 @@ if RENDER_ENV:
     )
 else:
     logging.basicConfig(
-        level=getattr(logging, LOG_LEVEL),
+        level=_nivel_log,
         format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
     )
 
-logger = logging.getLogger(__name__)
\ No newline at end of file
+logger = logging.getLogger(__name__)
+
+config.ao_mudar(("LOG_LEVEL",), lambda: logging.getLogger().setLevel(config.LOG_LEVEL))
+
+
+def exigir_config_valida():
+    """Confere a configuração na subida: avisos vão pro log, erros param o processo."""
+    erros, avisos = config.validar()
+    for aviso in avisos:
+        logger.warning(f"⚠️ {aviso}")
+    if erros:
+        for erro in erros:
+            logger.error(f"❌ {erro}")
+        raise ConfiguracaoInvalida(erros)
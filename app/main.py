@@ -1,101 +1,132 @@
-from fastapi import FastAPI, Request
+# Primeiro import de propósito: marca o começo do carregamento do worker
+from app.utils.processo import marcar, metricas_processo, relatorio_inicializacao
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+import asyncio
+import hmac
 import logging
 import sys
-from typing import Optional
+from typing import Dict, Optional
 import traceback
 import os
+import time
 
-from app.config import DEBUG, logger
+from app.config import (
+    AQUECER_CONEXOES,
+    DEBUG,
+    DATABASE_URL,
+    EXPORT_TOKEN,
+    GROQ_API_KEY,
+    JOBS_DRENAGEM_TIMEOUT,
+    MANUTENCAO_INTERVALO,
+    config,
+    exigir_config_valida,
+    logger,
+)
+from app.atendimento import processar_mensagem, extrair_telefone
+from app.manutencao import manutencao_periodica, metricas_manutencao
 from app.utils.db import (
-    buscar_cliente_por_telefone,
-    salvar_novo_cliente,
+    abrir_pool,
+    aquecer_pool,
+    fechar_pool,
+    metricas_pool,
+    metricas_clientes_cache,
+    executar_db,
     buscar_cardapio_ativo,
-    buscar_produto_por_nome,
-    criar_carrinho,
-    buscar_carrinho_aberto,
-    adicionar_item_carrinho,
-    listar_itens_carrinho
 )
-from app.utils.groq_client import gerar_resposta_nordestina
-from app.utils.ultramsg_client import enviar_mensagem
-
-app = FastAPI(title="WhatsApp Bot Hamburgueria", version="1.0.0")
-
-logger.info("🚀 Aplicação iniciada!")
-logger.info(f"🔧 Debug mode: {DEBUG}")
-logger.info(f"🖥️ Python version: {sys.version}")
+from app.utils.agrupador import criar_agrupador
+from app.utils.ajustes import ajustes, metricas_ajustes
+from app.utils.cache_respostas import metricas_cache_respostas
+from app.utils.cardapio_cache import cache_cardapio, metricas_cardapio
+from app.utils.exportacao import FORMATOS, exportar
+from app.utils.groq_client import aquecer_cliente_groq, fechar_cliente_groq, metricas_groq
+from app.utils.idempotencia import esquecer, primeira_vez, metricas_idempotencia
+from app.utils.jobs import criar_fila_jobs
+from app.utils.limites import metricas_limites
+from app.utils.memoria import metricas_memoria
+from app.utils.telemetria import formato_prometheus, medir, telemetria
+from app.utils.ultramsg_client import (
+    aquecer_cliente_ultramsg,
+    fechar_cliente_ultramsg,
+    metricas_ultramsg,
+)
 
-def _only_digits(s: str) -> str:
-    import re
-    return re.sub(r"\D+", "", s or "")
+fila_jobs = criar_fila_jobs(processar_mensagem)
 
-def _extrair_telefone(raw_chat_id: Optional[str], raw_from: Optional[str]) -> Optional[str]:
-    val = raw_chat_id or raw_from
-    if not val:
-        return None
-    num = val.split("@")[0]
-    return _only_digits(num)
+async def _enfileirar_job(msg: Dict):
+    """Destino do agrupador. Se a fila recusar, os ids são esquecidos pra um reenvio da UltraMsg ser aceito."""
+    try:
+        await fila_jobs.enfileirar(msg)
+    except Exception:
+        await esquecer(msg.get("message_ids") or [msg.get("message_id")])
+        raise
 
-def _detectar_nome(texto: str) -> Optional[str]:
-    import re
-    texto = texto.lower()
-    match = re.search(r"(?:meu nome é|sou o|sou a|aqui é o|aqui é a|me chamo)\s+([a-zA-ZÀ-ÿ\s]{3,})", texto)
-    if match:
-        nome = match.group(1).strip().title()
-        return nome
-    return None
+agrupador = criar_agrupador(_enfileirar_job)
 
-def _detectar_comando_cardapio(texto: str) -> bool:
-    texto = texto.lower()
-    palavras_cardapio = ['cardápio', 'cardapio', 'menu', 'produtos', 'hamburguer', 'lanche', 'o que tem']
-    return any(palavra in texto for palavra in palavras_cardapio)
+async def _aquecer():
+    """Roda depois que o worker já aceita requisições: cardápio, conexões do pool e clientes HTTP.
 
-def _detectar_adicionar_carrinho(texto: str) -> Optional[str]:
-    import re
-    texto = texto.lower()
-    patterns = [
-        r"quero (?:o |um |uma )?(.+)",
-        r"adiciona (?:o |um |uma )?(.+)",
-        r"coloca (?:o |um |uma )?(.+)(?:\s+no carrinho)?",
-        r"vou querer (?:o |um |uma )?(.+)"
-    ]
-    
-    for pattern in patterns:
-        match = re.search(pattern, texto)
-        if match:
-            produto = match.group(1).strip()
-            produto = re.sub(r"\s+(no carrinho|pra mim|por favor).*", "", produto)
-            return produto
-    return None
+    Nada disso é obrigatório pra primeira resposta (cada peça se inicia sozinha
+    no primeiro uso); aqui só se adianta o custo pra ela não pagar.
+    """
+    try:
+        if DATABASE_URL:
+            await cache_cardapio.iniciar()
+        if AQUECER_CONEXOES:
+            await asyncio.gather(
+                *([aquecer_pool()] if DATABASE_URL else []),
+                *([aquecer_cliente_groq()] if GROQ_API_KEY else []),
+                aquecer_cliente_ultramsg(),
+            )
+        marcar("aquecido")
+        logger.info(f"🔥 Worker {os.getpid()} aquecido: {relatorio_inicializacao()}")
+    except Exception as e:
+        logger.error(f"❌ Falha no aquecimento: {e}")
 
-def _formatar_cardapio(cardapio: list) -> str:
-    if not cardapio:
-        return "Eita! Num tem nada no cardápio não, visse!"
-    
-    texto = "🍔 *CARDÁPIO DA CASA* 🍔\n\n"
-    for item in cardapio:
-        preco_reais = item['preco_centavos'] / 100
-        texto += f"• *{item['nome']}* - R$ {preco_reais:.2f}\n"
-    
-    texto += "\n💬 Pra pedir, é só falar: *'Quero um [nome do produto]'*"
-    return texto
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    marcar("importado")
+    exigir_config_valida()
+    marcar("config")
+    if DATABASE_URL:
+        try:
+            await asyncio.to_thread(ajustes.aplicar_na_subida)
+            marcar("ajustes")
+            await asyncio.to_thread(abrir_pool)
+            marcar("pool")
+            # Mesmos ajustes já aplicados: aqui só começa a escutar mudanças
+            await ajustes.iniciar()
+        except Exception as e:
+            logger.error(f"❌ Não consegui abrir o pool do banco: {e}")
+    await fila_jobs.iniciar()
+    aquecimento = asyncio.create_task(_aquecer())
+    manutencao = asyncio.create_task(manutencao_periodica()) if DATABASE_URL and MANUTENCAO_INTERVALO > 0 else None
+    marcar("pronto")
+    processo = metricas_processo()
+    logger.info(
+        f"🚀 Worker {processo['pid']} pronto em {processo['inicializacao_ms']['pronto']:.0f}ms "
+        f"({relatorio_inicializacao()}), memória {processo['rss_mb']:.1f} MB, "
+        f"debug={DEBUG}, Python {sys.version.split()[0]}"
+    )
+    yield
+    inicio = time.perf_counter()
+    for tarefa in (aquecimento, manutencao):
+        if tarefa is not None:
+            tarefa.cancel()
+    await agrupador.esvaziar()
+    # Primeiro termina as mensagens em andamento, depois entrega o que ficou na fila de saída,
+    # tudo dentro de JOBS_DRENAGEM_TIMEOUT
+    await fila_jobs.parar(JOBS_DRENAGEM_TIMEOUT)
+    await fechar_cliente_ultramsg(max(JOBS_DRENAGEM_TIMEOUT - (time.perf_counter() - inicio), 1.0))
+    await fechar_cliente_groq()
+    await cache_cardapio.parar()
+    await ajustes.parar()
+    await asyncio.to_thread(fechar_pool)
+    logger.info(f"🛑 Worker {os.getpid()} encerrado, drenagem levou {time.perf_counter() - inicio:.1f}s")
 
-def _formatar_carrinho(itens: list) -> str:
-    if not itens:
-        return "Teu carrinho tá vazio ainda, meu rei!"
-    
-    texto = "🛒 *SEU CARRINHO* 🛒\n\n"
-    total_centavos = 0
-    
-    for item in itens:
-        preco_reais = item['preco_centavos'] / 100
-        subtotal_reais = item['subtotal_centavos'] / 100
-        texto += f"• {item['quantidade']}x *{item['nome']}* - R$ {subtotal_reais:.2f}\n"
-        total_centavos += item['subtotal_centavos']
-    
-    total_reais = total_centavos / 100
-    texto += f"\n💰 *Total: R$ {total_reais:.2f}*"
-    return texto
+app = FastAPI(title="WhatsApp Bot Hamburgueria", version="1.0.0", lifespan=lifespan)
 
 @app.get("/")
 async def health_check():
@@ -107,24 +138,94 @@ async def health_check():
         "debug": DEBUG
     }
 
+async def _metricas_gerais() -> dict:
+    return {
+        "pool": metricas_pool(),
+        "jobs": fila_jobs.metricas(),
+        "agrupador": agrupador.metricas(),
+        "dedup": metricas_idempotencia(),
+        "cardapio": metricas_cardapio(),
+        "clientes_cache": metricas_clientes_cache(),
+        "memoria": metricas_memoria(),
+        "cache_respostas": metricas_cache_respostas(),
+        "groq": metricas_groq(),
+        "ultramsg": metricas_ultramsg(),
+        "processo": metricas_processo(),
+        "limites": await metricas_limites(),
+        "manutencao": metricas_manutencao(),
+        "ajustes": metricas_ajustes(),
+    }
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Histogramas por etapa + métricas dos componentes, no formato texto do Prometheus"""
+    return PlainTextResponse(formato_prometheus(await _metricas_gerais()), media_type="text/plain; version=0.0.4")
+
 @app.get("/test-db")
 async def test_database():
     """Endpoint para testar conexão com banco"""
     try:
-        cardapio = buscar_cardapio_ativo()
+        cardapio = await executar_db(buscar_cardapio_ativo)
         logger.info(f"✅ Teste de DB: {len(cardapio)} itens no cardápio")
-        return {"status": "ok", "cardapio_count": len(cardapio)}
+        return {
+            "status": "ok",
+            "cardapio_count": len(cardapio),
+            **(await _metricas_gerais()),
+            "etapas": telemetria.resumo(),
+            "config": config.resumo(),
+        }
     except Exception as e:
         logger.error(f"❌ Erro no teste de DB: {e}")
         return {"status": "error", "message": str(e)}
 
+def _token_valido(req: Request) -> bool:
+    recebido = req.query_params.get("token") or ""
+    autorizacao = req.headers.get("authorization", "")
+    if autorizacao.lower().startswith("bearer "):
+        recebido = autorizacao[7:].strip()
+    return bool(EXPORT_TOKEN) and hmac.compare_digest(recebido.encode(), EXPORT_TOKEN.encode())
+
+def _data(valor: Optional[str], padrao: datetime) -> datetime:
+    if not valor:
+        return padrao
+    try:
+        data = datetime.fromisoformat(valor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Data inválida: {valor}")
+    return data if data.tzinfo else data.replace(tzinfo=timezone.utc)
+
+@app.get("/pedidos/export")
+async def exportar_pedidos(req: Request, inicio: Optional[str] = None, fim: Optional[str] = None, formato: str = "csv"):
+    """Pedidos fechados em [inicio, fim) com os itens, em streaming (padrão: últimas 24h)"""
+    if not EXPORT_TOKEN:
+        raise HTTPException(status_code=404, detail="Exportação desligada (EXPORT_TOKEN vazio)")
+    if not _token_valido(req):
+        raise HTTPException(status_code=401, detail="Token inválido")
+    if formato not in FORMATOS:
+        raise HTTPException(status_code=400, detail=f"Formato deve ser um de: {', '.join(FORMATOS)}")
+    agora = datetime.now(timezone.utc)
+    de = _data(inicio, agora - timedelta(days=1))
+    ate = _data(fim, agora)
+    logger.info(f"📤 Exportando pedidos de {de.isoformat()} a {ate.isoformat()} ({formato})")
+    nome = f"pedidos_{de:%Y%m%d%H%M}_{ate:%Y%m%d%H%M}.{formato}"
+    return StreamingResponse(
+        exportar(formato, de, ate),
+        media_type=FORMATOS[formato],
+        headers={"Content-Disposition": f'attachment; filename="{nome}"'},
+    )
+
 @app.post("/")
 async def webhook_ultramsg(req: Request):
+    with medir("webhook"):
+        return await _webhook_ultramsg(req)
+
+async def _webhook_ultramsg(req: Request):
     try:
         logger.info("📨 Webhook chamado!")
         
-        body = await req.json()
-        logger.info(f"📋 Payload recebido: {body}")
+        with medir("webhook_parse"):
+            body = await req.json()
+        logger.debug(f"📋 Payload recebido: {body}")
 
         if body.get("event_type") != "message_received":
             logger.info(f"⏭️  Ignorando evento: {body.get('event_type')}")
@@ -144,132 +245,36 @@ async def webhook_ultramsg(req: Request):
 
         logger.info(f"💬 Mensagem recebida: '{texto_cli}' de {pushname}")
 
-        telefone = _extrair_telefone(chat_id, from_id)
+        telefone = extrair_telefone(chat_id, from_id)
         if not telefone:
             logger.error("❌ Sem telefone no payload")
             return {"status": "erro", "detail": "sem telefone"}
 
         logger.info(f"📱 Telefone extraído: {telefone}")
 
-        cliente = buscar_cliente_por_telefone(telefone)
-        logger.info(f"👤 Cliente encontrado: {cliente is not None}")
-
-        contexto = None
-
-        if not cliente:
-            logger.info("🆕 Cliente novo, verificando nome...")
-            nome_detectado = _detectar_nome(texto_cli)
-            nome_para_cadastro = nome_detectado or pushname
-            
-            if nome_para_cadastro:
-                try:
-                    logger.info(f"💾 Cadastrando cliente: {nome_para_cadastro}")
-                    cliente_id = salvar_novo_cliente(telefone, nome_para_cadastro)
-                    cliente = {"id": cliente_id, "nome": nome_para_cadastro, "telefone": telefone}
-                    contexto = f"Oi {nome_para_cadastro}! Te cadastrei aqui rapidinho. Bem-vindo!"
-                    logger.info(f"✅ Cliente cadastrado com ID: {cliente_id}")
-                except Exception as e:
-                    logger.exception(f"❌ Erro ao cadastrar cliente: {e}")
-                    contexto = "Eita! Deu um problema aqui. Me diga seu nome pra eu te cadastrar direitinho."
-            else:
-                logger.info("❓ Nome não detectado, pedindo para cliente se identificar")
-                contexto = "Oi, meu rei! Pra eu te atender melhor, me diga seu nome completo, por favor."
-
-        if cliente:
-            nome_cliente = cliente.get('nome', 'meu rei')
-            logger.info(f"🎯 Processando comandos para cliente: {nome_cliente}")
-            
-            if _detectar_comando_cardapio(texto_cli):
-                logger.info("📋 Comando: mostrar cardápio")
-                cardapio = buscar_cardapio_ativo()
-                resposta = _formatar_cardapio(cardapio)
-                logger.info(f"📤 Enviando cardápio com {len(cardapio)} itens")
-                
-                try:
-                    await enviar_mensagem(telefone, resposta)
-                    logger.info("✅ Cardápio enviado com sucesso")
-                    return {"status": "ok"}
-                except Exception as e:
-                    logger.exception(f"❌ Erro ao enviar cardápio: {e}")
-                    return {"status": "erro_envio", "detail": str(e)}
-
-            produto_desejado = _detectar_adicionar_carrinho(texto_cli)
-            if produto_desejado:
-                logger.info(f"🛒 Comando: adicionar produto '{produto_desejado}'")
-                produto = buscar_produto_por_nome(produto_desejado)
-                
-                if produto:
-                    logger.info(f"✅ Produto encontrado: {produto['nome']}")
-
-                    carrinho = buscar_carrinho_aberto(cliente['id'])
-                    if not carrinho:
-                        carrinho_id = criar_carrinho(cliente['id'])
-                        logger.info(f"🆕 Carrinho criado: {carrinho_id}")
-                    else:
-                        carrinho_id = str(carrinho['id'])
-                        logger.info(f"📦 Usando carrinho existente: {carrinho_id}")
-                    
-                    try:
-                        adicionar_item_carrinho(carrinho_id, produto['id'])
-                        preco_reais = produto['preco_centavos'] / 100
-                        resposta = f"Oxente! Coloquei *{produto['nome']}* (R$ {preco_reais:.2f}) no teu carrinho!"
-                        
-                        #aqui o carrinho atualizado
-                        itens = listar_itens_carrinho(carrinho_id)
-                        resposta += "\n\n" + _formatar_carrinho(itens)
-                        logger.info("✅ Produto adicionado ao carrinho")
-                        
-                    except Exception as e:
-                        logger.exception(f"❌ Erro ao adicionar no carrinho: {e}")
-                        resposta = "Eita! Deu problema pra adicionar no carrinho. Tenta de novo, visse?"
-                else:
-                    logger.info(f"❌ Produto não encontrado: {produto_desejado}")
-                    resposta = f"Oxente! Num achei '{produto_desejado}' no cardápio não. Quer ver o que tem disponível?"
-                
-                try:
-                    await enviar_mensagem(telefone, resposta)
-                    logger.info("✅ Resposta do carrinho enviada")
-                    return {"status": "ok"}
-                except Exception as e:
-                    logger.exception(f"❌ Erro ao enviar resposta do carrinho: {e}")
-                    return {"status": "erro_envio", "detail": str(e)}
-            
-            
-            if any(palavra in texto_cli.lower() for palavra in ['carrinho', 'pedido', 'meu pedido']):
-                logger.info("👀 Comando: ver carrinho")
-                carrinho = buscar_carrinho_aberto(cliente['id'])
-                if carrinho:
-                    itens = listar_itens_carrinho(str(carrinho['id']))
-                    resposta = _formatar_carrinho(itens)
-                    logger.info(f"📦 Mostrando carrinho com {len(itens)} itens")
-                else:
-                    resposta = "Teu carrinho tá vazio ainda, meu rei! Quer dar uma olhada no cardápio?"
-                    logger.info("📦 Carrinho vazio")
-                
-                try:
-                    await enviar_mensagem(telefone, resposta)
-                    logger.info("✅ Carrinho enviado")
-                    return {"status": "ok"}
-                except Exception as e:
-                    logger.exception(f"❌ Erro ao enviar carrinho: {e}")
-                    return {"status": "erro_envio", "detail": str(e)}
-            
-            
-            contexto = f"Cliente: {nome_cliente}. Responda como atendente simpático de hamburgueria."
-
-        logger.info("🤖 Gerando resposta via IA...")
-        resposta = gerar_resposta_nordestina(texto_cli, contexto)
-        logger.info(f"💭 Resposta gerada: {resposta}")
-
-        try:
-            await enviar_mensagem(telefone, resposta)
-            logger.info("✅ Mensagem enviada com sucesso!")
-        except Exception as e:
-            logger.exception(f"❌ Falha ao enviar via UltraMsg: {e}")
-            return {"status": "erro_envio", "detail": str(e)}
+        message_id = data.get("id")
+        with medir("dedup"):
+            nova = await primeira_vez(message_id)
+        if not nova:
+            logger.info(f"🔁 Mensagem repetida ignorada: {message_id}")
+            return {"status": "duplicada"}
 
-        return {"status": "ok"}
+        with medir("enfileirar"):
+            try:
+                await agrupador.adicionar({
+                    "telefone": telefone,
+                    "texto": texto_cli,
+                    "pushname": pushname,
+                    "message_id": message_id,
+                })
+            except Exception as e:
+                # Sem 2xx a UltraMsg reenvia; o id já foi esquecido em _enfileirar_job
+                logger.exception(f"❌ Mensagem {message_id} não entrou na fila: {e}")
+                raise HTTPException(status_code=503, detail="fila indisponível")
+        return {"status": "enfileirado"}
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.exception(f"💥 Erro geral no webhook: {e}")
         logger.error(f"🔍 Traceback completo: {traceback.format_exc()}")
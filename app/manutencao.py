@@ -0,0 +1,214 @@
+"""Manutenção das tabelas: expira carrinhos parados, apaga dados velhos e cria índices.
+
+Uso:
+    python -m app.manutencao               # roda uma vez e mostra o relatório
+    python -m app.manutencao --sem-indices # só limpeza, só recomenda os índices
+
+No processo web roda sozinha a cada MANUTENCAO_INTERVALO segundos (0 desliga);
+com vários workers só um roda por vez (advisory lock). A limpeza anda em lotes
+de MANUTENCAO_LOTE linhas, cada lote na sua própria transação, pulando linhas
+travadas e com lock_timeout curto: carrinhos e itens_carrinho nunca ficam
+presos enquanto o bot atende. Os índices são criados com CONCURRENTLY, que não
+bloqueia escrita.
+"""
+import asyncio
+import json
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+import psycopg2
+from psycopg2.extras import RealDictCursor
+
+from app.config import (
+    DATABASE_URL,
+    MANUTENCAO_INTERVALO,
+    MANUTENCAO_CRIAR_INDICES,
+    config,
+    logger,
+)
+from app.utils.db import fechar_pool
+from app.utils.idempotencia import limpar_mensagens_antigas
+from app.utils.limites import limpar_fichas_antigas
+
+# Chave do pg_try_advisory_lock que impede duas manutenções ao mesmo tempo
+TRAVA_MANUTENCAO = 7_001_019
+
+# Índices que as consultas quentes do carrinho e a limpeza usam
+INDICES = [
+    # adicionar_ao_carrinho / ver_carrinho / fechar_pedido
+    ("carrinhos_abertos_usuario_idx",
+     "ON carrinhos (usuario_id, criado_em DESC) WHERE status = 'aberto'"),
+    # expiração e remoção de carrinhos parados (migrations/010)
+    ("carrinhos_status_atualizado_em_idx",
+     "ON carrinhos (status, atualizado_em) WHERE status <> 'fechado'"),
+    # remoção de turnos velhos do histórico de conversa
+    ("conversas_turnos_criado_em_idx", "ON conversas_turnos (criado_em)"),
+]
+
+_EXPIRAR_CARRINHOS = """
+    WITH lote AS (
+        SELECT id FROM carrinhos
+        WHERE status = 'aberto' AND atualizado_em < now() - make_interval(secs => %(idade)s)
+        ORDER BY atualizado_em
+        LIMIT %(lote)s
+        FOR UPDATE SKIP LOCKED
+    )
+    UPDATE carrinhos c SET status = 'expirado'
+    FROM lote WHERE c.id = lote.id
+"""
+
+# Os itens saem no mesmo comando que o carrinho; a FK só é checada no fim do comando
+_APAGAR_EXPIRADOS = """
+    WITH lote AS (
+        SELECT id FROM carrinhos
+        WHERE status = 'expirado' AND atualizado_em < now() - make_interval(secs => %(idade)s)
+        ORDER BY atualizado_em
+        LIMIT %(lote)s
+        FOR UPDATE SKIP LOCKED
+    ), itens AS (
+        DELETE FROM itens_carrinho ic USING lote WHERE ic.carrinho_id = lote.id
+    )
+    DELETE FROM carrinhos c USING lote WHERE c.id = lote.id
+"""
+
+_APAGAR_TURNOS = """
+    DELETE FROM conversas_turnos WHERE id IN (
+        SELECT id FROM conversas_turnos
+        WHERE criado_em < now() - make_interval(secs => %(idade)s)
+        ORDER BY criado_em
+        LIMIT %(lote)s
+    )
+"""
+
+# Jobs que esgotaram as tentativas; ficam um tempo pra investigação
+_APAGAR_JOBS_ERRO = """
+    DELETE FROM jobs_webhook WHERE id IN (
+        SELECT id FROM jobs_webhook
+        WHERE status = 'erro' AND criado_em < now() - make_interval(secs => %(idade)s)
+        ORDER BY id
+        LIMIT %(lote)s
+    )
+"""
+
+_estado: Dict = {"execucoes": 0, "puladas": 0, "ultima_em": None, "ultima": None}
+
+
+def _conectar():
+    """Conexão própria, fora do pool: autocommit (um lote = uma transação) e lock_timeout curto."""
+    conn = psycopg2.connect(DATABASE_URL, cursor_factory=RealDictCursor, application_name="bot-manutencao")
+    conn.autocommit = True
+    with conn.cursor() as cur:
+        cur.execute("SELECT set_config('lock_timeout', %s, false)", (f"{config.MANUTENCAO_LOCK_TIMEOUT_MS}ms",))
+    return conn
+
+def _em_lotes(cur, sql: str, params: Dict) -> int:
+    """Repete o comando até um lote vir incompleto; pausa entre lotes pra não disputar com o bot."""
+    total = 0
+    lote = config.MANUTENCAO_LOTE
+    while True:
+        cur.execute(sql, {**params, "lote": lote})
+        total += cur.rowcount
+        if cur.rowcount < lote:
+            return total
+        time.sleep(config.MANUTENCAO_PAUSA_MS / 1000)
+
+def _garantir_indices(cur, criar: bool) -> Dict:
+    cur.execute("""
+        SELECT c.relname AS nome, i.indisvalid AS valido
+        FROM pg_class c JOIN pg_index i ON i.indexrelid = c.oid
+        WHERE c.relname = ANY(%s)
+    """, ([nome for nome, _ in INDICES],))
+    existentes = {row["nome"]: row["valido"] for row in cur.fetchall()}
+
+    criados: List[str] = []
+    recomendados: List[str] = []
+    for nome, definicao in INDICES:
+        valido = existentes.get(nome)
+        if valido:
+            continue
+        ddl = f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {nome} {definicao}"
+        if not criar:
+            logger.info(f"💡 Índice recomendado: {ddl}")
+            recomendados.append(ddl)
+            continue
+        if valido is False:
+            # Sobra de um CONCURRENTLY interrompido: existe mas não é usado
+            cur.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {nome}")
+        logger.info(f"🗂️ Criando índice {nome}")
+        cur.execute(ddl)
+        criados.append(nome)
+    return {"criados": criados, "recomendados": recomendados}
+
+def _tarefa(relatorio: Dict, nome: str, func, *args):
+    inicio = time.perf_counter()
+    try:
+        resultado = func(*args)
+        relatorio[nome] = resultado if isinstance(resultado, dict) else {"linhas": resultado}
+    except Exception as e:
+        logger.error(f"❌ Manutenção '{nome}' falhou: {e}")
+        relatorio[nome] = {"erro": str(e)}
+    relatorio[nome]["ms"] = round((time.perf_counter() - inicio) * 1000, 1)
+
+def rodar_manutencao(criar_indices: bool = MANUTENCAO_CRIAR_INDICES) -> Optional[Dict]:
+    """Roda todas as tarefas e devolve o relatório; None se outro processo já está rodando."""
+    inicio = time.perf_counter()
+    conn = _conectar()
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT pg_try_advisory_lock(%s) AS ok", (TRAVA_MANUTENCAO,))
+            if not cur.fetchone()["ok"]:
+                _estado["puladas"] += 1
+                logger.info("🧹 Manutenção já rodando em outro processo, pulando")
+                return None
+
+            relatorio: Dict = {}
+            # Índices primeiro: a expiração já usa o índice de status
+            _tarefa(relatorio, "indices", _garantir_indices, cur, criar_indices)
+            _tarefa(relatorio, "carrinhos_expirados", _em_lotes, cur, _EXPIRAR_CARRINHOS,
+                    {"idade": config.MANUTENCAO_CARRINHO_EXPIRA_HORAS * 3600})
+            if config.MANUTENCAO_CARRINHO_APAGA_DIAS > 0:
+                _tarefa(relatorio, "carrinhos_apagados", _em_lotes, cur, _APAGAR_EXPIRADOS,
+                        {"idade": config.MANUTENCAO_CARRINHO_APAGA_DIAS * 86400})
+            if config.MEMORIA_RETENCAO_DIAS > 0:
+                _tarefa(relatorio, "conversas_turnos", _em_lotes, cur, _APAGAR_TURNOS,
+                        {"idade": config.MEMORIA_RETENCAO_DIAS * 86400})
+            if config.MANUTENCAO_JOBS_ERRO_DIAS > 0:
+                _tarefa(relatorio, "jobs_com_erro", _em_lotes, cur, _APAGAR_JOBS_ERRO,
+                        {"idade": config.MANUTENCAO_JOBS_ERRO_DIAS * 86400})
+            _tarefa(relatorio, "mensagens_recebidas", limpar_mensagens_antigas)
+            _tarefa(relatorio, "limites_fichas", limpar_fichas_antigas)
+            relatorio["total_ms"] = round((time.perf_counter() - inicio) * 1000, 1)
+    finally:
+        # Fechar a sessão solta o advisory lock
+        conn.close()
+
+    _estado["execucoes"] += 1
+    _estado["ultima_em"] = datetime.now(timezone.utc).isoformat()
+    _estado["ultima"] = relatorio
+    resumo = ", ".join(
+        f"{nome}={r['linhas']}" for nome, r in relatorio.items() if isinstance(r, dict) and "linhas" in r
+    )
+    logger.info(f"🧹 Manutenção concluída em {relatorio['total_ms']:.0f}ms: {resumo}")
+    return relatorio
+
+async def manutencao_periodica():
+    """Laço do processo web; cancelado no desligamento."""
+    while True:
+        await asyncio.sleep(MANUTENCAO_INTERVALO)
+        try:
+            await asyncio.to_thread(rodar_manutencao)
+        except Exception as e:
+            logger.error(f"❌ Erro na manutenção periódica: {e}")
+
+def metricas_manutencao() -> Dict:
+    return {"intervalo_s": MANUTENCAO_INTERVALO, **_estado}
+
+
+if __name__ == "__main__":
+    try:
+        relatorio = rodar_manutencao(criar_indices="--sem-indices" not in sys.argv[1:] and MANUTENCAO_CRIAR_INDICES)
+        print(json.dumps(relatorio, indent=2, ensure_ascii=False))
+    finally:
+        fechar_pool()
@@ -0,0 +1,42 @@
+"""Aplica os arquivos .sql de migrations/ em ordem, uma única vez cada.
+
+Uso:
+    python -m app.migrar
+"""
+from pathlib import Path
+
+from app.config import logger
+from app.utils.db import get_conn, fechar_pool
+
+MIGRATIONS_DIR = Path(__file__).resolve().parent.parent / "migrations"
+
+
+def aplicar_migracoes() -> list:
+    with get_conn() as conn, conn.cursor() as cur:
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                nome TEXT PRIMARY KEY,
+                aplicada_em TIMESTAMPTZ NOT NULL DEFAULT now()
+            )
+        """)
+        cur.execute("SELECT nome FROM schema_migrations")
+        feitas = {row["nome"] for row in cur.fetchall()}
+
+    aplicadas = []
+    for arquivo in sorted(MIGRATIONS_DIR.glob("*.sql")):
+        if arquivo.name in feitas:
+            continue
+        logger.info(f"🗄️ Aplicando migração {arquivo.name}")
+        with get_conn() as conn, conn.cursor() as cur:
+            cur.execute(arquivo.read_text(encoding="utf-8"))
+            cur.execute("INSERT INTO schema_migrations (nome) VALUES (%s)", (arquivo.name,))
+        aplicadas.append(arquivo.name)
+    return aplicadas
+
+
+if __name__ == "__main__":
+    try:
+        aplicadas = aplicar_migracoes()
+        logger.info(f"✅ {len(aplicadas)} migração(ões) aplicada(s)")
+    finally:
+        fechar_pool()
@@ -0,0 +1,62 @@
+"""Servidor de produção: vários workers uvicorn, com uvloop/httptools quando instalados.
+
+Uso:
+    python -m app.servidor
+
+WEB_WORKERS define quantos processos. Com 0 (padrão) é um por CPU quando
+JOBS_BACKEND=postgres; com a fila em memória fica um só, porque cada processo
+teria a sua fila e mensagens do mesmo cliente poderiam sair de ordem. No SIGTERM cada worker
+para de aceitar conexões, espera as requisições abertas por até
+WEB_DRENAGEM_TIMEOUT e depois drena as conversas em andamento por até
+JOBS_DRENAGEM_TIMEOUT (ver o lifespan em app/main.py). A soma dos dois deve
+caber no tempo que a plataforma espera antes do SIGKILL (30s no Render).
+"""
+import importlib.util
+import os
+
+from app.config import JOBS_BACKEND, LOG_LEVEL, WEB_WORKERS, WEB_DRENAGEM_TIMEOUT, exigir_config_valida, logger
+
+
+def _disponivel(modulo: str) -> bool:
+    return importlib.util.find_spec(modulo) is not None
+
+def numero_de_workers() -> int:
+    if WEB_WORKERS > 0:
+        return WEB_WORKERS
+    if JOBS_BACKEND == "memoria":
+        return 1
+    return os.cpu_count() or 1
+
+
+def main():
+    # Antes de subir os workers: configuração errada para aqui, uma vez só
+    exigir_config_valida()
+    import uvicorn
+
+    workers = numero_de_workers()
+    loop = "uvloop" if _disponivel("uvloop") else "asyncio"
+    http = "httptools" if _disponivel("httptools") else "h11"
+    porta = int(os.getenv("PORT", 10000))
+
+    if workers > 1 and JOBS_BACKEND == "memoria":
+        logger.warning(
+            "⚠️ Vários workers com JOBS_BACKEND=memoria: use JOBS_BACKEND=postgres, "
+            "DEDUP_POSTGRES=true e MEMORIA_POSTGRES=true pra manter ordem, deduplicação e memória entre processos"
+        )
+    logger.info(f"🚀 Subindo {workers} worker(s) na porta {porta} (loop={loop}, http={http})")
+
+    uvicorn.run(
+        "app.main:app",
+        host="0.0.0.0",
+        port=porta,
+        workers=workers,
+        loop=loop,
+        http=http,
+        timeout_graceful_shutdown=WEB_DRENAGEM_TIMEOUT,
+        proxy_headers=True,
+        log_level=LOG_LEVEL.lower(),
+    )
+
+
+if __name__ == "__main__":
+    main()
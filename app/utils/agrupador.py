@@ -0,0 +1,131 @@
+"""Junta as mensagens que o cliente manda em sequência ("oi", "quero", "um x-salada").
+
+Cada mensagem reinicia uma janela curta (AGRUPAR_JANELA_MS) por telefone; quando
+a janela fecha sem mensagem nova, o grupo vira uma mensagem só, com os textos
+unidos, e segue pra fila de jobs. O atraso acrescentado nunca passa de
+AGRUPAR_MAX_ESPERA_MS contado da primeira mensagem, e com AGRUPAR_MAX_MENSAGENS
+o grupo sai na hora. Com janela 0 (padrão) as mensagens passam direto.
+"""
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from app.config import config
+
+logger = logging.getLogger(__name__)
+
+Destino = Callable[[Dict], Awaitable[None]]
+
+
+class _Grupo:
+    __slots__ = ("mensagens", "primeira_em", "tarefa")
+
+    def __init__(self):
+        self.mensagens: List[Dict] = []
+        self.primeira_em = time.monotonic()
+        self.tarefa: Optional[asyncio.Task] = None
+
+
+def juntar(mensagens: List[Dict]) -> Dict:
+    """Uma mensagem com os textos na ordem em que chegaram; ids de todas ficam em `message_ids`."""
+    if len(mensagens) == 1:
+        return mensagens[0]
+    ultima = mensagens[-1]
+    return {
+        **ultima,
+        "texto": " ".join(m["texto"] for m in mensagens if m["texto"]),
+        "pushname": next((m["pushname"] for m in reversed(mensagens) if m.get("pushname")), ""),
+        "message_ids": [m.get("message_id") for m in mensagens],
+    }
+
+
+class Agrupador:
+    def __init__(self, destino: Destino, janela_ms: float, max_espera_ms: float, max_mensagens: int):
+        self.destino = destino
+        self.configurar(janela_ms, max_espera_ms, max_mensagens)
+        self._grupos: Dict[str, _Grupo] = {}
+        self.recebidas = 0
+        self.liberadas = 0
+        self.espera_total = 0.0
+        self.espera_max = 0.0
+
+    def configurar(self, janela_ms: float, max_espera_ms: float, max_mensagens: int):
+        """Vale pras próximas mensagens; grupos já esperando mantêm o prazo que tinham."""
+        self.janela = janela_ms / 1000
+        self.max_espera = max_espera_ms / 1000
+        self.max_mensagens = max(1, max_mensagens)
+
+    @property
+    def ativo(self) -> bool:
+        return self.janela > 0
+
+    async def adicionar(self, msg: Dict):
+        self.recebidas += 1
+        if not self.ativo:
+            self.liberadas += 1
+            await self.destino(msg)
+            return
+
+        telefone = msg["telefone"]
+        grupo = self._grupos.get(telefone)
+        if grupo is None:
+            grupo = self._grupos[telefone] = _Grupo()
+        grupo.mensagens.append(msg)
+        if grupo.tarefa is not None:
+            grupo.tarefa.cancel()
+
+        if len(grupo.mensagens) >= self.max_mensagens:
+            await self._liberar(telefone)
+            return
+        restante = grupo.primeira_em + self.max_espera - time.monotonic()
+        grupo.tarefa = asyncio.create_task(self._esperar(telefone, max(0.0, min(self.janela, restante))))
+
+    async def _esperar(self, telefone: str, atraso: float):
+        await asyncio.sleep(atraso)
+        try:
+            await self._liberar(telefone)
+        except Exception as e:
+            logger.exception(f"Falha ao liberar mensagens agrupadas de {telefone}: {e}")
+
+    async def _liberar(self, telefone: str):
+        grupo = self._grupos.pop(telefone, None)
+        if grupo is None:
+            return
+        espera = time.monotonic() - grupo.primeira_em
+        self.espera_total += espera
+        self.espera_max = max(self.espera_max, espera)
+        self.liberadas += 1
+        if len(grupo.mensagens) > 1:
+            logger.info(f"🧺 {len(grupo.mensagens)} mensagens de {telefone} juntadas em uma")
+        await self.destino(juntar(grupo.mensagens))
+
+    async def esvaziar(self):
+        """Libera na hora tudo que está esperando (usado no desligamento)."""
+        for telefone in list(self._grupos):
+            tarefa = self._grupos[telefone].tarefa
+            if tarefa is not None:
+                tarefa.cancel()
+            await self._liberar(telefone)
+
+    def metricas(self) -> Dict:
+        return {
+            "ativo": self.ativo,
+            "janela_ms": self.janela * 1000,
+            "max_espera_ms": self.max_espera * 1000,
+            "recebidas": self.recebidas,
+            "liberadas": self.liberadas,
+            "economizadas": self.recebidas - self.liberadas - sum(len(g.mensagens) for g in self._grupos.values()),
+            "aguardando": len(self._grupos),
+            "espera_media_ms": round(self.espera_total * 1000 / self.liberadas, 3) if self.liberadas and self.ativo else 0.0,
+            "espera_max_ms": round(self.espera_max * 1000, 3),
+        }
+
+
+def criar_agrupador(destino: Destino) -> Agrupador:
+    def configurar():
+        agrupador.configurar(config.AGRUPAR_JANELA_MS, config.AGRUPAR_MAX_ESPERA_MS, config.AGRUPAR_MAX_MENSAGENS)
+
+    agrupador = Agrupador(destino, config.AGRUPAR_JANELA_MS, config.AGRUPAR_MAX_ESPERA_MS, config.AGRUPAR_MAX_MENSAGENS)
+    config.ao_mudar(("AGRUPAR_JANELA_MS", "AGRUPAR_MAX_ESPERA_MS", "AGRUPAR_MAX_MENSAGENS"), configurar)
+    return agrupador
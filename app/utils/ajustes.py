@@ -0,0 +1,165 @@
+"""Ajustes de configuração sem reiniciar os workers.
+
+Os campos recarregáveis de app/config.py (pool, timeouts, TTLs, limites...)
+podem ser sobrescritos na tabela config_ajustes. Um trigger avisa
+(NOTIFY config_ajustada) e cada processo relê a tabela inteira e aplica tudo de
+uma vez, depois de validar; se algo estiver inválido, nada muda. Ajuste
+removido volta ao valor do ambiente. Segredos e o que só vale na subida (URLs,
+quantidade de workers, backends) ficam de fora.
+
+Uso:
+    python -m app.utils.ajustes                              # ajustes atuais
+    python -m app.utils.ajustes LIMITE_GLOBAL_POR_MINUTO=600 GROQ_TIMEOUT=20
+    python -m app.utils.ajustes --remover GROQ_TIMEOUT
+"""
+import asyncio
+import logging
+import sys
+from typing import Dict, Iterable, Optional
+
+import psycopg2
+
+from app.config import DATABASE_URL, Configuracao, ConfiguracaoInvalida, config
+from app.utils.db import executar_db, fechar_pool, get_conn, OuvintePostgres
+
+logger = logging.getLogger(__name__)
+
+CANAL_AJUSTES = "config_ajustada"
+
+
+def ler_ajustes() -> Dict[str, str]:
+    with get_conn() as conn, conn.cursor() as cur:
+        cur.execute("SELECT chave, valor FROM config_ajustes")
+        return {row["chave"]: row["valor"] for row in cur.fetchall()}
+
+def _ler_ajustes_sem_pool() -> Dict[str, str]:
+    """Conexão avulsa: na subida o pool ainda não existe (o tamanho dele pode estar ajustado)."""
+    conn = psycopg2.connect(DATABASE_URL, application_name="bot-ajustes")
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT chave, valor FROM config_ajustes")
+            return dict(cur.fetchall())
+    finally:
+        conn.close()
+
+def gravar_ajustes(ajustes: Dict[str, str]):
+    with get_conn() as conn, conn.cursor() as cur:
+        for chave, valor in ajustes.items():
+            cur.execute("""
+                INSERT INTO config_ajustes (chave, valor) VALUES (%s, %s)
+                ON CONFLICT (chave) DO UPDATE SET valor = EXCLUDED.valor, atualizado_em = now()
+            """, (chave, valor))
+
+def remover_ajustes(chaves: Iterable[str]) -> int:
+    with get_conn() as conn, conn.cursor() as cur:
+        cur.execute("DELETE FROM config_ajustes WHERE chave = ANY(%s)", (list(chaves),))
+        return cur.rowcount
+
+
+class AjustesDinamicos:
+    def __init__(self):
+        self.recargas = 0
+        self.rejeitadas = 0
+        self.ultimo_erro: Optional[str] = None
+        self._lock: Optional[asyncio.Lock] = None
+        self._tarefa: Optional[asyncio.Task] = None
+        self._ouvinte = OuvintePostgres(CANAL_AJUSTES, self._avisado)
+
+    def aplicar_na_subida(self) -> Dict:
+        """Aplica os ajustes salvos antes de abrir o pool, pra ele já nascer no tamanho certo.
+
+        Síncrono (roda numa thread); falha aqui só vai pro log, `iniciar` tenta de novo.
+        """
+        try:
+            mudancas = config.aplicar(_ler_ajustes_sem_pool())
+        except ConfiguracaoInvalida as e:
+            self.rejeitadas += 1
+            self.ultimo_erro = str(e)
+            logger.error(f"❌ Ajustes rejeitados, configuração mantida: {e}")
+            return {}
+        except Exception as e:
+            logger.warning(f"Não consegui ler config_ajustes na subida: {e}")
+            return {}
+        for nome, (antes, depois) in mudancas.items():
+            logger.info(f"🔧 {nome}: {antes} -> {depois}")
+        return mudancas
+
+    def _avisado(self):
+        self._tarefa = asyncio.create_task(self.recarregar())
+
+    async def recarregar(self) -> Dict:
+        """Lê a tabela e aplica; devolve {nome: (antes, depois)} do que mudou."""
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            try:
+                ajustes = await executar_db(ler_ajustes)
+            except Exception as e:
+                logger.error(f"Não consegui ler config_ajustes: {e}")
+                return {}
+            try:
+                mudancas = config.aplicar(ajustes)
+            except ConfiguracaoInvalida as e:
+                self.rejeitadas += 1
+                self.ultimo_erro = str(e)
+                logger.error(f"❌ Ajustes rejeitados, configuração mantida: {e}")
+                return {}
+            self.recargas += 1
+            for nome, (antes, depois) in mudancas.items():
+                logger.info(f"🔧 {nome}: {antes} -> {depois}")
+            return mudancas
+
+    async def iniciar(self):
+        """Aplica os ajustes já gravados e começa a escutar alterações da tabela."""
+        await self.recarregar()
+        self._ouvinte.iniciar()
+
+    async def parar(self):
+        await asyncio.to_thread(self._ouvinte.parar)
+
+    def metricas(self) -> Dict:
+        return {
+            "recargas": self.recargas,
+            "rejeitadas": self.rejeitadas,
+            "ultimo_erro": self.ultimo_erro,
+            "ajustados": config.resumo()["ajustados"],
+            "avisos_notify": self._ouvinte.avisos,
+        }
+
+
+ajustes = AjustesDinamicos()
+
+def metricas_ajustes() -> Dict:
+    return ajustes.metricas()
+
+
+def _main(argumentos):
+    atuais = ler_ajustes()
+    if not argumentos:
+        for chave, valor in sorted(atuais.items()):
+            print(f"{chave}={valor}")
+        print("\nRecarregáveis: " + ", ".join(config.resumo()["recarregaveis"]))
+        return 0
+
+    if argumentos[0] == "--remover":
+        print(f"{remover_ajustes(argumentos[1:])} ajuste(s) removido(s)")
+        return 0
+
+    novos = dict(a.split("=", 1) for a in argumentos if "=" in a)
+    # Valida contra uma configuração descartável antes de gravar: os workers rejeitariam tudo
+    try:
+        Configuracao().aplicar({**atuais, **novos})
+    except ConfiguracaoInvalida as e:
+        print(e, file=sys.stderr)
+        return 1
+    gravar_ajustes(novos)
+    print(f"{len(novos)} ajuste(s) gravado(s)")
+    return 0
+
+
+if __name__ == "__main__":
+    try:
+        codigo = _main(sys.argv[1:])
+    finally:
+        fechar_pool()
+    sys.exit(codigo)
@@ -0,0 +1,140 @@
+"""Busca aproximada de produtos do cardápio, em memória.
+
+Substitui o `LOWER(nome) LIKE '%...%'`: ignora acentos, aceita erros de digitação
+("hamburguer", "x-bacom"), conhece sinônimos comuns e devolve os candidatos
+ordenados por pontuação em vez do primeiro que o banco achar.
+
+O índice é montado a partir do cardápio em cache (ver cardapio_cache.py) e
+refeito a cada recarga.
+"""
+import re
+import unicodedata
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+_nao_alfanumerico = re.compile(r"[^a-z0-9]+")
+
+STOPWORDS = {
+    "o", "a", "os", "as", "um", "uma", "uns", "umas", "de", "do", "da", "dos", "das",
+    "com", "sem", "pra", "para", "por", "favor", "me", "mim", "no", "na", "e",
+}
+
+# Variações que o povo escreve -> forma usada no índice
+SINONIMOS = {
+    "hamburguer": "burger",
+    "hamburger": "burger",
+    "hamburgue": "burger",
+    "burguer": "burger",
+    "burgue": "burger",
+    "xis": "x",
+    "refri": "refrigerante",
+    "refris": "refrigerante",
+    "cocacola": "coca",
+    "batatinha": "batata",
+    "fritas": "batata",
+    "milkshake": "shake",
+    "milk": "shake",
+}
+
+
+def normalizar(texto: str) -> str:
+    """Minúsculas, sem acento, só letras/números separados por um espaço."""
+    texto = unicodedata.normalize("NFKD", (texto or "").lower())
+    texto = "".join(c for c in texto if not unicodedata.combining(c))
+    return _nao_alfanumerico.sub(" ", texto).strip()
+
+def tokens(texto: str) -> List[str]:
+    saida = []
+    for tok in normalizar(texto).split():
+        if tok in STOPWORDS:
+            continue
+        # "xbacon" / "xburger" -> "x" + "bacon"
+        if len(tok) > 2 and tok[0] == "x" and tok[1] not in "aeiou" and tok not in SINONIMOS:
+            saida.append("x")
+            tok = tok[1:]
+        saida.append(SINONIMOS.get(tok, tok))
+    return saida
+
+def trigramas(texto: str) -> Set[str]:
+    t = f"  {texto} "
+    return {t[i:i + 3] for i in range(len(t) - 2)}
+
+def distancia_edicao(a: str, b: str, limite: int = 3) -> int:
+    """Levenshtein com corte: para de calcular quando passa de `limite`."""
+    if abs(len(a) - len(b)) > limite:
+        return limite + 1
+    anterior = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        atual = [i]
+        for j, cb in enumerate(b, 1):
+            atual.append(min(anterior[j] + 1, atual[j - 1] + 1, anterior[j - 1] + (ca != cb)))
+        if min(atual) > limite:
+            return limite + 1
+        anterior = atual
+    return anterior[-1]
+
+def _similaridade_token(q: str, alvo: str) -> float:
+    if q == alvo:
+        return 1.0
+    if len(q) >= 3 and alvo.startswith(q):
+        return 0.9
+    limite = 1 if len(q) <= 4 else 2
+    d = distancia_edicao(q, alvo, limite)
+    if d > limite:
+        return 0.0
+    return 1.0 - d / max(len(q), len(alvo))
+
+
+class IndiceProdutos:
+    def __init__(self, itens: Iterable[Dict]):
+        self.itens: List[Dict] = list(itens)
+        self._tokens: List[List[str]] = []
+        self._trigramas: List[Set[str]] = []
+        self._por_trigrama: Dict[str, Set[int]] = defaultdict(set)
+        self._vocabulario: Set[str] = set()
+        for i, item in enumerate(self.itens):
+            toks = tokens(item["nome"])
+            self._vocabulario.update(toks)
+            tri = trigramas(" ".join(toks))
+            self._tokens.append(toks)
+            self._trigramas.append(tri)
+            for t in tri:
+                self._por_trigrama[t].add(i)
+
+    def __len__(self) -> int:
+        return len(self.itens)
+
+    def _conhecido(self, tok: str) -> bool:
+        return tok in self._vocabulario or any(_similaridade_token(tok, v) for v in self._vocabulario)
+
+    def buscar(self, consulta: str, limite: int = 3, minimo: float = 0.55) -> List[Tuple[Dict, float]]:
+        """Candidatos ordenados por pontuação (0 a 1)."""
+        # Palavras que não lembram nada do cardápio ("bem passado", "porção") não contam
+        q_tokens = [q for q in tokens(consulta) if self._conhecido(q)]
+        if not q_tokens:
+            return []
+        q_tri = trigramas(" ".join(q_tokens))
+
+        candidatos: Set[int] = set()
+        for t in q_tri:
+            candidatos |= self._por_trigrama.get(t, set())
+
+        resultado = []
+        for i in candidatos:
+            p_tokens = self._tokens[i]
+            p_tri = self._trigramas[i]
+            dice = 2 * len(q_tri & p_tri) / (len(q_tri) + len(p_tri))
+            # Quanto dos tokens da consulta aparece (aproximadamente) no nome
+            cobertura = sum(max((_similaridade_token(q, p) for p in p_tokens), default=0.0) for q in q_tokens) / len(q_tokens)
+            # Penaliza de leve nomes com muito mais palavras do que o pedido
+            extras = max(len(p_tokens) - len(q_tokens), 0) * 0.03
+            score = 0.6 * cobertura + 0.4 * dice - extras
+            if score >= minimo:
+                resultado.append((self.itens[i], round(score, 4)))
+
+        resultado.sort(key=lambda par: (-par[1], par[0]["nome"]))
+        return resultado[:limite]
+
+    def melhor(self, consulta: str, minimo: float = 0.55) -> Optional[Dict]:
+        candidatos = self.buscar(consulta, limite=1, minimo=minimo)
+        return candidatos[0][0] if candidatos else None
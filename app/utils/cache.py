@@ -0,0 +1,100 @@
+"""Cache em memória com LRU + TTL e contadores de acerto."""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+_AUSENTE = object()
+
+
+class CacheTTL:
+    """Dicionário limitado a `maxsize` entradas, cada uma válida por `ttl` segundos.
+
+    Quando enche, descarta a entrada usada há mais tempo. Thread-safe, pra poder
+    ser usado tanto no event loop quanto nas threads do banco.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._dados: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.expirados = 0
+        self.descartados = 0
+
+    def get(self, chave: Hashable, padrao: Any = None) -> Any:
+        with self._lock:
+            item = self._dados.get(chave, _AUSENTE)
+            if item is _AUSENTE:
+                self.misses += 1
+                return padrao
+            valor, expira_em = item
+            if expira_em < time.monotonic():
+                del self._dados[chave]
+                self.expirados += 1
+                self.misses += 1
+                return padrao
+            self._dados.move_to_end(chave)
+            self.hits += 1
+            return valor
+
+    def set(self, chave: Hashable, valor: Any, ttl: Optional[float] = None):
+        with self._lock:
+            self._dados[chave] = (valor, time.monotonic() + (self.ttl if ttl is None else ttl))
+            self._dados.move_to_end(chave)
+            while len(self._dados) > self.maxsize:
+                self._dados.popitem(last=False)
+                self.descartados += 1
+
+    def adicionar_se_ausente(self, chave: Hashable, valor: Any = True) -> bool:
+        """Grava e retorna True se a chave não existia (ou tinha expirado), tudo sob o mesmo lock."""
+        with self._lock:
+            item = self._dados.get(chave, _AUSENTE)
+            if item is not _AUSENTE and item[1] >= time.monotonic():
+                self._dados.move_to_end(chave)
+                self.hits += 1
+                return False
+            self.misses += 1
+            self._dados[chave] = (valor, time.monotonic() + self.ttl)
+            self._dados.move_to_end(chave)
+            while len(self._dados) > self.maxsize:
+                self._dados.popitem(last=False)
+                self.descartados += 1
+            return True
+
+    def __contains__(self, chave: Hashable) -> bool:
+        with self._lock:
+            item = self._dados.get(chave, _AUSENTE)
+            return item is not _AUSENTE and item[1] >= time.monotonic()
+
+    def itens(self) -> List[Tuple[Hashable, Any]]:
+        """Cópia dos pares (chave, valor) ainda válidos, do menos para o mais recente."""
+        agora = time.monotonic()
+        with self._lock:
+            return [(chave, item[0]) for chave, item in self._dados.items() if item[1] >= agora]
+
+    def remover(self, chave: Hashable):
+        with self._lock:
+            self._dados.pop(chave, None)
+
+    def limpar(self):
+        with self._lock:
+            self._dados.clear()
+
+    def __len__(self) -> int:
+        return len(self._dados)
+
+    def metricas(self) -> Dict:
+        total = self.hits + self.misses
+        return {
+            "tamanho": len(self._dados),
+            "maxsize": self.maxsize,
+            "ttl_s": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "taxa_acerto": round(self.hits / total, 4) if total else 0.0,
+            "expirados": self.expirados,
+            "descartados": self.descartados,
+        }
@@ -0,0 +1,170 @@
+"""Cache de respostas da IA pra perguntas repetidas ("vocês abrem que horas?", "tem delivery?").
+
+Guarda a resposta *base* (antes do nordestinizar), gerada sem nome nem histórico
+do cliente, então pode ser reaproveitada pra qualquer um. A chave é a mensagem
+normalizada; se não houver chave igual, procura uma pergunta parecida pela
+sobreposição de palavras (Jaccard) acima de CACHE_RESPOSTAS_SIMILARIDADE.
+
+Mensagens que dependem do cliente (carrinho, números, continuação de uma
+conversa recente) passam direto, ver `motivo_sem_cache`.
+"""
+import re
+import time
+from collections import OrderedDict, defaultdict
+from typing import Dict, FrozenSet, Optional, Set, Tuple
+
+from app.config import (
+    CACHE_RESPOSTAS_MAX,
+    CACHE_RESPOSTAS_TTL,
+    CACHE_RESPOSTAS_SIMILARIDADE,
+    config,
+)
+from app.utils.busca_produtos import normalizar
+
+# Palavras que não mudam o sentido da pergunta
+_IRRELEVANTES = {
+    "o", "a", "os", "as", "um", "uma", "de", "do", "da", "e", "que", "q", "ai", "ae", "tu",
+    "oi", "ola", "opa", "bom", "boa", "dia", "tarde", "noite", "por", "favor", "pf", "pfv",
+    "voces", "vcs", "vc", "voce", "ce", "ces", "me", "ne", "hein", "moco", "moca",
+}
+_PESSOAIS = {"carrinho", "pedido", "meu", "minha", "meus", "minhas", "cpf", "endereco", "nome"}
+_digitos = re.compile(r"\d")
+
+
+def chave_da_mensagem(texto: str) -> Tuple[str, FrozenSet[str]]:
+    tokens = [t for t in normalizar(texto).split() if t not in _IRRELEVANTES]
+    return " ".join(tokens), frozenset(tokens)
+
+def motivo_sem_cache(texto: str, segundos_desde_ultimo_turno: Optional[float] = None) -> Optional[str]:
+    """Por que essa mensagem não pode usar resposta pronta (None = pode).
+
+    `segundos_desde_ultimo_turno` vem da memória da conversa (None = sem conversa).
+    """
+    if not config.CACHE_RESPOSTAS_ATIVO:
+        return "desligado"
+    if len(texto) > 160:
+        return "longa"
+    if _digitos.search(texto):
+        return "numeros"
+    chave, tokens = chave_da_mensagem(texto)
+    if not chave:
+        return "vazia"
+    if tokens & _PESSOAIS:
+        return "pessoal"
+    # "sim", "e o de frango?" etc. dependem do que acabou de ser dito; a resposta
+    # não pode ir pro cache de todo mundo nem vir dele
+    if (segundos_desde_ultimo_turno is not None
+            and segundos_desde_ultimo_turno < config.CACHE_RESPOSTAS_CONVERSA_RECENTE):
+        return "conversa_recente"
+    return None
+
+
+class CacheRespostas:
+    def __init__(self, maxsize: int, ttl: float, similaridade_min: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.similaridade_min = similaridade_min
+        self._entradas: "OrderedDict[str, Tuple[FrozenSet[str], str, float]]" = OrderedDict()
+        self._por_token: Dict[str, Set[str]] = defaultdict(set)
+        self.hits_exatos = 0
+        self.hits_similares = 0
+        self.misses = 0
+        self.bypass: Dict[str, int] = defaultdict(int)
+        self.latencia_ia_total_ms = 0.0
+        self.chamadas_ia = 0
+        self.limpezas = 0
+
+    def _remover(self, chave: str):
+        tokens, _, _ = self._entradas.pop(chave)
+        for t in tokens:
+            chaves = self._por_token.get(t)
+            if chaves is not None:
+                chaves.discard(chave)
+                if not chaves:
+                    del self._por_token[t]
+
+    def _valida(self, chave: str) -> Optional[str]:
+        entrada = self._entradas.get(chave)
+        if entrada is None:
+            return None
+        if entrada[2] < time.monotonic():
+            self._remover(chave)
+            return None
+        self._entradas.move_to_end(chave)
+        return entrada[1]
+
+    def buscar(self, texto: str) -> Optional[str]:
+        chave, tokens = chave_da_mensagem(texto)
+        resposta = self._valida(chave)
+        if resposta is not None:
+            self.hits_exatos += 1
+            return resposta
+
+        candidatas: Set[str] = set()
+        for t in tokens:
+            candidatas |= self._por_token.get(t, set())
+        melhor, melhor_sim = None, 0.0
+        for candidata in candidatas:
+            outros = self._entradas[candidata][0]
+            sim = len(tokens & outros) / len(tokens | outros)
+            if sim > melhor_sim:
+                melhor, melhor_sim = candidata, sim
+        if melhor is not None and melhor_sim >= self.similaridade_min:
+            resposta = self._valida(melhor)
+            if resposta is not None:
+                self.hits_similares += 1
+                return resposta
+
+        self.misses += 1
+        return None
+
+    def guardar(self, texto: str, resposta: str, latencia_ms: float):
+        chave, tokens = chave_da_mensagem(texto)
+        if chave in self._entradas:
+            self._remover(chave)
+        self._entradas[chave] = (tokens, resposta, time.monotonic() + self.ttl)
+        for t in tokens:
+            self._por_token[t].add(chave)
+        while len(self._entradas) > self.maxsize:
+            self._remover(next(iter(self._entradas)))
+        self.latencia_ia_total_ms += latencia_ms
+        self.chamadas_ia += 1
+
+    def limpar(self):
+        """Chamado quando o cardápio muda: respostas antigas podem citar produto ou preço velho."""
+        self._entradas.clear()
+        self._por_token.clear()
+        self.limpezas += 1
+
+    def registrar_bypass(self, motivo: str):
+        self.bypass[motivo] += 1
+
+    def metricas(self) -> Dict:
+        hits = self.hits_exatos + self.hits_similares
+        total = hits + self.misses
+        latencia_media = self.latencia_ia_total_ms / self.chamadas_ia if self.chamadas_ia else 0.0
+        return {
+            "ativo": config.CACHE_RESPOSTAS_ATIVO,
+            "tamanho": len(self._entradas),
+            "maxsize": self.maxsize,
+            "hits_exatos": self.hits_exatos,
+            "hits_similares": self.hits_similares,
+            "misses": self.misses,
+            "taxa_acerto": round(hits / total, 4) if total else 0.0,
+            "bypass": dict(self.bypass),
+            "limpezas": self.limpezas,
+            "latencia_ia_media_ms": round(latencia_media, 3),
+            "latencia_economizada_ms": round(hits * latencia_media, 3),
+        }
+
+
+cache_respostas = CacheRespostas(CACHE_RESPOSTAS_MAX, CACHE_RESPOSTAS_TTL, CACHE_RESPOSTAS_SIMILARIDADE)
+
+def _ajustar_cache_respostas():
+    cache_respostas.ttl = config.CACHE_RESPOSTAS_TTL
+    cache_respostas.similaridade_min = config.CACHE_RESPOSTAS_SIMILARIDADE
+
+config.ao_mudar(("CACHE_RESPOSTAS_TTL", "CACHE_RESPOSTAS_SIMILARIDADE"), _ajustar_cache_respostas)
+
+def metricas_cache_respostas() -> Dict:
+    return cache_respostas.metricas()
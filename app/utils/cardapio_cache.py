@@ -0,0 +1,145 @@
+"""Cache do cardápio ativo, já formatado pra mandar no WhatsApp.
+
+O cardápio muda poucas vezes por dia, então fica em memória e só é relido do
+banco quando o TTL vence ou quando a tabela `cardapio` avisa que mudou
+(trigger + NOTIFY, ver migrations/003_cardapio_notify.sql).
+"""
+import asyncio
+import logging
+import time
+from typing import Dict, List, Optional, Tuple
+
+from app.config import CARDAPIO_CACHE_TTL, config
+from app.utils.busca_produtos import IndiceProdutos
+from app.utils.cache_respostas import cache_respostas
+from app.utils.db import executar_db, buscar_cardapio_ativo, OuvintePostgres
+
+logger = logging.getLogger(__name__)
+
+CANAL_CARDAPIO = "cardapio_alterado"
+
+
+def formatar_cardapio(cardapio: list) -> str:
+    if not cardapio:
+        return "Eita! Num tem nada no cardápio não, visse!"
+
+    texto = "🍔 *CARDÁPIO DA CASA* 🍔\n\n"
+    for item in cardapio:
+        preco_reais = item['preco_centavos'] / 100
+        texto += f"• *{item['nome']}* - R$ {preco_reais:.2f}\n"
+
+    texto += "\n💬 Pra pedir, é só falar: *'Quero um [nome do produto]'*"
+    return texto
+
+
+class CacheCardapio:
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self.itens: List[Dict] = []
+        self.formatado: str = ""
+        self.indice = IndiceProdutos([])
+        self.versao = 0
+        self._expira_em = 0.0
+        self._lock: Optional[asyncio.Lock] = None
+        self.hits = 0
+        self.misses = 0
+        self.recargas = 0
+        self.invalidacoes = 0
+        self.ultima_recarga_ms = 0.0
+        self._ouvinte = OuvintePostgres(CANAL_CARDAPIO, self.invalidar)
+
+    def invalidar(self):
+        self._expira_em = 0.0
+        self.invalidacoes += 1
+
+    def _valido(self) -> bool:
+        return time.monotonic() < self._expira_em
+
+    async def _garantir(self):
+        if self._valido():
+            self.hits += 1
+            return
+        self.misses += 1
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        # Só uma recarga por vez; quem chegar durante ela usa o resultado
+        async with self._lock:
+            if self._valido():
+                return
+            await self.recarregar()
+
+    async def recarregar(self):
+        inicio = time.perf_counter()
+        itens = await executar_db(buscar_cardapio_ativo)
+        novos = [dict(item) for item in itens]
+        if self.versao and novos != self.itens:
+            cache_respostas.limpar()
+        self.itens = novos
+        self.formatado = formatar_cardapio(self.itens)
+        self.indice = IndiceProdutos(self.itens)
+        self.versao += 1
+        self._expira_em = time.monotonic() + self.ttl
+        self.recargas += 1
+        self.ultima_recarga_ms = (time.perf_counter() - inicio) * 1000
+        logger.info(f"Cardápio recarregado: {len(self.itens)} itens (versão {self.versao})")
+
+    async def obter(self) -> List[Dict]:
+        await self._garantir()
+        return self.itens
+
+    async def obter_formatado(self) -> str:
+        await self._garantir()
+        return self.formatado
+
+    async def obter_indice(self) -> IndiceProdutos:
+        await self._garantir()
+        return self.indice
+
+    async def iniciar(self):
+        """Carrega o cardápio e começa a escutar alterações da tabela."""
+        try:
+            await self.recarregar()
+        except Exception as e:
+            logger.error(f"Não consegui pré-carregar o cardápio: {e}")
+        self._ouvinte.iniciar()
+
+    async def parar(self):
+        await asyncio.to_thread(self._ouvinte.parar)
+
+    def metricas(self) -> Dict:
+        total = self.hits + self.misses
+        return {
+            "itens": len(self.itens),
+            "versao": self.versao,
+            "ttl_s": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "taxa_acerto": round(self.hits / total, 4) if total else 0.0,
+            "recargas": self.recargas,
+            "invalidacoes": self.invalidacoes,
+            "avisos_notify": self._ouvinte.avisos,
+            "ultima_recarga_ms": round(self.ultima_recarga_ms, 3),
+        }
+
+
+cache_cardapio = CacheCardapio(CARDAPIO_CACHE_TTL)
+config.ao_mudar(("CARDAPIO_CACHE_TTL",), lambda: setattr(cache_cardapio, "ttl", config.CARDAPIO_CACHE_TTL))
+
+async def obter_cardapio() -> List[Dict]:
+    return await cache_cardapio.obter()
+
+async def obter_cardapio_formatado() -> str:
+    return await cache_cardapio.obter_formatado()
+
+async def buscar_produto_no_cardapio(nome_produto: str) -> Optional[Dict]:
+    """Produto do cardápio que melhor combina com o texto (busca aproximada, sem ir ao banco)."""
+    return (await cache_cardapio.obter_indice()).melhor(nome_produto)
+
+async def buscar_candidatos_no_cardapio(nome_produto: str, limite: int = 3) -> List[Tuple[Dict, float]]:
+    return (await cache_cardapio.obter_indice()).buscar(nome_produto, limite=limite)
+
+def invalidar_cardapio():
+    cache_cardapio.invalidar()
+
+def metricas_cardapio() -> Dict:
+    return cache_cardapio.metricas()
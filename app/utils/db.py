@@ -1,31 +1,324 @@
-import os, re, psycopg2
+import os, re, time, asyncio, functools, select, threading, psycopg2
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from psycopg2.extras import RealDictCursor
-from typing import Optional, Dict, List
+from psycopg2.pool import ThreadedConnectionPool
+from typing import Callable, Optional, Dict, List
 import logging
-from app.config import DATABASE_URL
+from app.config import (
+    DATABASE_URL,
+    DB_POOL_MAX,
+    CLIENTES_CACHE_MAX,
+    CLIENTES_CACHE_TTL,
+    config,
+)
+from app.utils.cache import CacheTTL
+from app.utils.telemetria import amostrar, observar
 
 _phone_digits_re = re.compile(r"\D+")
 
 def _only_digits(s: str) -> str:
     return _phone_digits_re.sub("", s or "")
 
-def get_conn():
+
+class PoolConexoes:
+    """Pool de conexões thread-safe que espera por uma vaga (até `timeout`) e guarda métricas."""
+
+    def __init__(self, dsn: str, minconn: int, maxconn: int, timeout: float):
+        self._pool = ThreadedConnectionPool(minconn, maxconn, dsn, cursor_factory=RealDictCursor)
+        self._vagas = threading.BoundedSemaphore(maxconn)
+        self._lock = threading.Lock()
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.timeout = timeout
+        # Aposentado: fecha quando a última conexão emprestada voltar
+        self._aposentado = False
+        self.checkouts = 0
+        self.em_uso = 0
+        self.timeouts = 0
+        self.descartadas = 0
+        self.espera_total = 0.0
+        self.espera_max = 0.0
+
+    @contextmanager
+    def conexao(self):
+        inicio = time.perf_counter()
+        if not self._vagas.acquire(timeout=self.timeout):
+            with self._lock:
+                self.timeouts += 1
+            raise RuntimeError(f"Pool de conexões esgotado: nenhuma conexão livre em {self.timeout}s.")
+        # Conta como em uso antes do getconn, pra um pool aposentado não fechar no meio
+        with self._lock:
+            fechado = self._pool.closed
+            if not fechado:
+                self.em_uso += 1
+        if fechado:
+            self._vagas.release()
+            raise RuntimeError("Pool de conexões fechado.")
+        try:
+            conn = self._pool.getconn()
+        except Exception:
+            with self._lock:
+                self.em_uso -= 1
+                self._fechar_se_aposentado()
+            self._vagas.release()
+            raise
+
+        espera = time.perf_counter() - inicio
+        with self._lock:
+            self.checkouts += 1
+            self.espera_total += espera
+            self.espera_max = max(self.espera_max, espera)
+
+        descartar = False
+        try:
+            # `with conn` faz commit no sucesso e rollback na exceção
+            with conn:
+                yield conn
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            descartar = True
+            raise
+        finally:
+            descartar = descartar or bool(conn.closed)
+            try:
+                self._devolver(conn, descartar)
+            finally:
+                self._vagas.release()
+
+    def _devolver(self, conn, descartar: bool):
+        with self._lock:
+            try:
+                if self._pool.closed:
+                    # O pool fechou com ela emprestada (shutdown com timeout): só fecha a conexão
+                    conn.close()
+                else:
+                    self._pool.putconn(conn, close=descartar)
+            finally:
+                self.em_uso -= 1
+                if descartar:
+                    self.descartadas += 1
+                self._fechar_se_aposentado()
+
+    def _fechar_se_aposentado(self):
+        # Chamado com self._lock
+        if self._aposentado and not self.em_uso and not self._pool.closed:
+            self._pool.closeall()
+
+    def aposentar(self):
+        """Fecha o pool quando a última conexão emprestada voltar (na hora, se nenhuma estiver)."""
+        with self._lock:
+            self._aposentado = True
+            self._fechar_se_aposentado()
+
+    def fechar(self, timeout: float = 0):
+        """Espera as conexões em uso voltarem (até `timeout`) e fecha todas."""
+        limite = time.monotonic() + timeout
+        while self.em_uso and time.monotonic() < limite:
+            time.sleep(0.05)
+        with self._lock:
+            if self.em_uso:
+                logging.warning(f"Fechando pool com {self.em_uso} conexão(ões) ainda em uso")
+            if not self._pool.closed:
+                self._pool.closeall()
+
+    def metricas(self) -> Dict:
+        with self._lock:
+            return {
+                "minconn": self.minconn,
+                "maxconn": self.maxconn,
+                "checkouts": self.checkouts,
+                "em_uso": self.em_uso,
+                "timeouts_espera": self.timeouts,
+                "conexoes_descartadas": self.descartadas,
+                "espera_total_ms": round(self.espera_total * 1000, 3),
+                "espera_media_ms": round(self.espera_total * 1000 / self.checkouts, 3) if self.checkouts else 0.0,
+                "espera_max_ms": round(self.espera_max * 1000, 3),
+            }
+
+
+_pool: Optional[PoolConexoes] = None
+_pool_lock = threading.Lock()
+# Threads dedicadas ao banco: no máximo uma por conexão do pool
+_executor = ThreadPoolExecutor(max_workers=DB_POOL_MAX, thread_name_prefix="db")
+
+def abrir_pool() -> PoolConexoes:
+    """Abre o pool global (idempotente). Chamado no startup da aplicação.
+
+    Usa os valores atuais de `config`, que na subida já incluem os ajustes salvos
+    (ver AjustesDinamicos.aplicar_na_subida).
+    """
+    global _pool, _executor
     if not DATABASE_URL:
         raise RuntimeError("DATABASE_URL não configurada.")
-    return psycopg2.connect(DATABASE_URL, cursor_factory=RealDictCursor)
+    with _pool_lock:
+        if _pool is None:
+            _pool = PoolConexoes(DATABASE_URL, config.DB_POOL_MIN, config.DB_POOL_MAX, config.DB_POOL_TIMEOUT)
+            if config.DB_POOL_MAX != DB_POOL_MAX:
+                _executor.shutdown(wait=False)
+                _executor = ThreadPoolExecutor(max_workers=config.DB_POOL_MAX, thread_name_prefix="db")
+            logging.info(f"Pool de conexões aberto (min={config.DB_POOL_MIN}, max={config.DB_POOL_MAX})")
+        return _pool
+
+def _trocar_pool():
+    """Troca o pool e as threads do banco pelos do tamanho novo, sem derrubar quem está usando.
+
+    Quem já pegou conexão devolve pro pool antigo, que fecha quando esvaziar;
+    as tarefas já na fila do executor antigo ainda rodam.
+    """
+    global _pool, _executor
+    novo = PoolConexoes(DATABASE_URL, config.DB_POOL_MIN, config.DB_POOL_MAX, config.DB_POOL_TIMEOUT)
+    with _pool_lock:
+        antigo, _pool = _pool, novo
+        executor_antigo, _executor = _executor, ThreadPoolExecutor(max_workers=config.DB_POOL_MAX, thread_name_prefix="db")
+    executor_antigo.shutdown(wait=False)
+    if antigo is not None:
+        antigo.aposentar()
+    logging.info(f"Pool de conexões redimensionado (min={config.DB_POOL_MIN}, max={config.DB_POOL_MAX})")
+
+def _redimensionar_pool():
+    # Abrir as conexões do pool novo bloqueia: fica fora do event loop
+    if _pool is not None:
+        threading.Thread(target=_trocar_pool, name="db-redimensionar", daemon=True).start()
+
+def _ajustar_timeout_pool():
+    if _pool is not None:
+        _pool.timeout = config.DB_POOL_TIMEOUT
+
+config.ao_mudar(("DB_POOL_MIN", "DB_POOL_MAX"), _redimensionar_pool)
+config.ao_mudar(("DB_POOL_TIMEOUT",), _ajustar_timeout_pool)
+
+def _ping():
+    with get_conn() as conn, conn.cursor() as cur:
+        cur.execute("SELECT 1")
+
+async def aquecer_pool():
+    """Passa DB_POOL_MIN consultas em paralelo, pra conexões e threads do executor já estarem de pé."""
+    await asyncio.gather(*(executar_db(_ping) for _ in range(max(config.DB_POOL_MIN, 1))))
+
+def fechar_pool(timeout: Optional[float] = None):
+    """Drena e fecha o pool global (por até DB_POOL_TIMEOUT, o valor atual). Chamado no shutdown da aplicação."""
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.fechar(config.DB_POOL_TIMEOUT if timeout is None else timeout)
+        logging.info("Pool de conexões fechado")
+
+def metricas_pool() -> Dict:
+    return _pool.metricas() if _pool is not None else {}
+
+def get_conn():
+    """Empresta uma conexão do pool; use como `with get_conn() as conn`."""
+    pool = _pool or abrir_pool()
+    return pool.conexao()
+
+async def executar_db(func, *args, **kwargs):
+    """Roda uma função de banco (síncrona) fora do event loop.
+
+    Mede a espera por uma thread livre (`db_espera`) e a execução (`db.<função>`).
+    """
+    loop = asyncio.get_running_loop()
+    chamada = functools.partial(func, *args, **kwargs)
+    if not amostrar():
+        return await loop.run_in_executor(_executor, chamada)
+
+    enfileirada = time.perf_counter()
+
+    def medida():
+        inicio = time.perf_counter()
+        observar("db_espera", inicio - enfileirada)
+        try:
+            return chamada()
+        finally:
+            observar(f"db.{func.__name__}", time.perf_counter() - inicio)
+
+    return await loop.run_in_executor(_executor, medida)
+
+
+class OuvintePostgres:
+    """Thread com uma conexão própria (fora do pool) presa em LISTEN `canal`.
+
+    A cada NOTIFY chama `callback()` no event loop. Também chama ao (re)conectar,
+    já que avisos enviados enquanto estava desconectado se perdem.
+    """
+
+    def __init__(self, canal: str, callback: Callable[[], None]):
+        self.canal = canal
+        self.callback = callback
+        self.avisos = 0
+        self.reconexoes = 0
+        self._parar = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def iniciar(self):
+        if self._thread is not None or not DATABASE_URL:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._parar.clear()
+        self._thread = threading.Thread(target=self._rodar, name=f"listen-{self.canal}", daemon=True)
+        self._thread.start()
+
+    def parar(self):
+        self._parar.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+            self._thread = None
+
+    def _avisar(self):
+        self.avisos += 1
+        self._loop.call_soon_threadsafe(self.callback)
+
+    def _rodar(self):
+        while not self._parar.is_set():
+            conn = None
+            try:
+                conn = psycopg2.connect(DATABASE_URL)
+                conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+                with conn.cursor() as cur:
+                    cur.execute(f"LISTEN {self.canal}")
+                self._avisar()
+                while not self._parar.is_set():
+                    if select.select([conn], [], [], 1.0) == ([], [], []):
+                        continue
+                    conn.poll()
+                    if conn.notifies:
+                        conn.notifies.clear()
+                        self._avisar()
+            except Exception as e:
+                self.reconexoes += 1
+                logging.error(f"LISTEN {self.canal} caiu ({e}), reconectando")
+                self._parar.wait(2.0)
+            finally:
+                if conn is not None:
+                    conn.close()
+
+# Só clientes encontrados entram no cache: um "não achei" guardado faria
+# outro worker tentar cadastrar de novo quem acabou de ser cadastrado.
+_clientes_cache = CacheTTL(maxsize=CLIENTES_CACHE_MAX, ttl=CLIENTES_CACHE_TTL)
+config.ao_mudar(("CLIENTES_CACHE_TTL",), lambda: setattr(_clientes_cache, "ttl", config.CLIENTES_CACHE_TTL))
+
+def metricas_clientes_cache() -> Dict:
+    return _clientes_cache.metricas()
 
 def buscar_cliente_por_telefone(telefone: str) -> Optional[Dict]:
     """Telefone pode vir em formato +55... ou 55... ou @c.us. Extraímos só dígitos."""
     num = _only_digits(telefone)
+    cliente = _clientes_cache.get(num)
+    if cliente is not None:
+        return cliente
+    # clientes.telefone é guardado só com dígitos (migrations/004), então usa o índice UNIQUE
     with get_conn() as conn, conn.cursor() as cur:
         cur.execute("""
             SELECT id, nome, telefone, email
             FROM clientes
-            WHERE regexp_replace(telefone, '\\D', '', 'g') = %s
+            WHERE telefone = %s
             LIMIT 1
         """, (num,))
         row = cur.fetchone()
-        return row
+    if row is not None:
+        _clientes_cache.set(num, row)
+    return row
 
 def salvar_novo_cliente(telefone: str, nome: Optional[str] = None, email: Optional[str] = None):
     """Salva novo cliente apenas com telefone e nome (sem CPF)"""
@@ -43,7 +336,8 @@ def salvar_novo_cliente(telefone: str, nome: Optional[str] = None, email: Option
             cliente_id = cur.fetchone()['id']
             conn.commit()
             logging.info(f"Cliente inserido com sucesso. ID: {cliente_id}")
-            return cliente_id
+        _clientes_cache.set(telefone_digits, {"id": cliente_id, "nome": nome, "telefone": telefone_digits, "email": email})
+        return cliente_id
     except Exception as e:
         logging.error(f"Erro ao inserir cliente no banco: {e}")
         raise
@@ -59,82 +353,135 @@ def buscar_cardapio_ativo() -> List[Dict]:
         """)
         return cur.fetchall()
 
-def buscar_produto_por_nome(nome_produto: str) -> Optional[Dict]:
-    """Busca produto por nome (busca parcial)"""
-    with get_conn() as conn, conn.cursor() as cur:
-        cur.execute("""
-            SELECT id, nome, preco_centavos, ativo
-            FROM cardapio
-            WHERE ativo = true AND LOWER(nome) LIKE LOWER(%s)
-            LIMIT 1
-        """, (f"%{nome_produto}%",))
-        return cur.fetchone()
-
-def criar_carrinho(cliente_id: int) -> str:
-    """Cria um novo carrinho para o cliente"""
-    with get_conn() as conn, conn.cursor() as cur:
-        cur.execute("""
-            INSERT INTO carrinhos (usuario_id, status)
-            VALUES (%s, 'aberto')
-            RETURNING id
-        """, (cliente_id,))
-        carrinho_id = cur.fetchone()['id']
-        conn.commit()
-        return str(carrinho_id)
+def _resumo_carrinho(linhas: List[Dict]) -> Dict:
+    itens = [dict(linha) for linha in linhas]
+    return {
+        "carrinho_id": str(itens[0]["carrinho_id"]) if itens else None,
+        "itens": itens,
+        "total_centavos": sum(item["subtotal_centavos"] for item in itens),
+    }
 
-def buscar_carrinho_aberto(cliente_id: int) -> Optional[Dict]:
-    """Busca carrinho aberto do cliente"""
-    with get_conn() as conn, conn.cursor() as cur:
-        cur.execute("""
-            SELECT id, usuario_id, status, criado_em
-            FROM carrinhos
-            WHERE usuario_id = %s AND status = 'aberto'
-            ORDER BY criado_em DESC
-            LIMIT 1
-        """, (cliente_id,))
-        return cur.fetchone()
+def adicionar_ao_carrinho(cliente_id: int, produto_id: int, quantidade: int = 1) -> Dict:
+    """Pega (ou cria) o carrinho aberto, soma o item e devolve as linhas e o total, num único comando.
 
-def adicionar_item_carrinho(carrinho_id: str, produto_id: int, quantidade: int = 1):
-    """Adiciona item ao carrinho ou atualiza quantidade"""
+    A criação do carrinho não tem trava própria: as mensagens de um mesmo cliente
+    já são processadas uma por vez pela fila de jobs.
+    """
     with get_conn() as conn, conn.cursor() as cur:
-        # Verifica se item já existe no carrinho
         cur.execute("""
-            SELECT quantidade FROM itens_carrinho
-            WHERE carrinho_id = %s AND produto_id = %s
-        """, (carrinho_id, produto_id))
-        
-        item_existente = cur.fetchone()
-        
-        if item_existente:
-            # Atualiza quantidade
-            nova_quantidade = item_existente['quantidade'] + quantidade
-            cur.execute("""
-                UPDATE itens_carrinho
-                SET quantidade = %s
-                WHERE carrinho_id = %s AND produto_id = %s
-            """, (nova_quantidade, carrinho_id, produto_id))
-        else:
-            # Insere novo item
-            cur.execute("""
+            WITH existente AS (
+                SELECT id FROM carrinhos
+                WHERE usuario_id = %(cliente)s AND status = 'aberto'
+                ORDER BY criado_em DESC
+                LIMIT 1
+            ), toque AS (
+                -- Atividade nova: a manutenção expira pelo atualizado_em
+                UPDATE carrinhos SET atualizado_em = now()
+                WHERE id = (SELECT id FROM existente) AND status = 'aberto'
+            ), novo AS (
+                INSERT INTO carrinhos (usuario_id, status)
+                SELECT %(cliente)s, 'aberto'
+                WHERE NOT EXISTS (SELECT 1 FROM existente)
+                RETURNING id
+            ), alvo AS (
+                SELECT id FROM existente
+                UNION ALL
+                SELECT id FROM novo
+            ), upsert AS (
                 INSERT INTO itens_carrinho (carrinho_id, produto_id, quantidade)
-                VALUES (%s, %s, %s)
-            """, (carrinho_id, produto_id, quantidade))
-        
-        conn.commit()
+                SELECT id, %(produto)s, %(quantidade)s FROM alvo
+                ON CONFLICT (carrinho_id, produto_id)
+                DO UPDATE SET quantidade = itens_carrinho.quantidade + EXCLUDED.quantidade
+                RETURNING carrinho_id, produto_id, quantidade
+            ), linhas AS (
+                -- O upsert não é visível pro resto do comando: a linha nova vem do RETURNING
+                SELECT carrinho_id, produto_id, quantidade FROM upsert
+                UNION ALL
+                SELECT ic.carrinho_id, ic.produto_id, ic.quantidade
+                FROM itens_carrinho ic
+                JOIN alvo ON ic.carrinho_id = alvo.id
+                WHERE ic.produto_id <> %(produto)s
+            )
+            SELECT
+                l.carrinho_id,
+                l.produto_id,
+                l.quantidade,
+                c.nome,
+                c.preco_centavos,
+                (l.quantidade * c.preco_centavos) as subtotal_centavos
+            FROM linhas l
+            JOIN cardapio c ON l.produto_id = c.id
+            ORDER BY c.nome
+        """, {"cliente": cliente_id, "produto": produto_id, "quantidade": quantidade})
+        return _resumo_carrinho(cur.fetchall())
 
-def listar_itens_carrinho(carrinho_id: str) -> List[Dict]:
-    """Lista itens do carrinho com detalhes dos produtos"""
+def ver_carrinho(cliente_id: int) -> Dict:
+    """Itens e total do carrinho aberto mais recente do cliente, numa consulta só."""
     with get_conn() as conn, conn.cursor() as cur:
         cur.execute("""
-            SELECT 
+            WITH alvo AS (
+                SELECT id FROM carrinhos
+                WHERE usuario_id = %s AND status = 'aberto'
+                ORDER BY criado_em DESC
+                LIMIT 1
+            )
+            SELECT
+                ic.carrinho_id,
                 ic.produto_id,
                 ic.quantidade,
                 c.nome,
                 c.preco_centavos,
                 (ic.quantidade * c.preco_centavos) as subtotal_centavos
-            FROM itens_carrinho ic
+            FROM alvo
+            JOIN itens_carrinho ic ON ic.carrinho_id = alvo.id
             JOIN cardapio c ON ic.produto_id = c.id
-            WHERE ic.carrinho_id = %s
             ORDER BY c.nome
-        """, (carrinho_id,))
-        return cur.fetchall()
+        """, (cliente_id,))
+        return _resumo_carrinho(cur.fetchall())
+
+def fechar_pedido(cliente_id: int) -> Optional[Dict]:
+    """Fecha o carrinho aberto do cliente num único comando: congela preços e total.
+
+    Devolve None se não houver carrinho aberto com itens. Como em
+    `adicionar_ao_carrinho`, conta com a fila processando um cliente por vez.
+    """
+    with get_conn() as conn, conn.cursor() as cur:
+        cur.execute("""
+            WITH alvo AS (
+                SELECT id FROM carrinhos
+                WHERE usuario_id = %s AND status = 'aberto'
+                ORDER BY criado_em DESC
+                LIMIT 1
+                FOR UPDATE
+            ), precos AS (
+                UPDATE itens_carrinho ic
+                SET preco_unitario_centavos = c.preco_centavos
+                FROM cardapio c, alvo
+                WHERE ic.carrinho_id = alvo.id AND c.id = ic.produto_id
+                RETURNING
+                    ic.carrinho_id,
+                    ic.produto_id,
+                    ic.quantidade,
+                    c.nome,
+                    c.preco_centavos,
+                    (ic.quantidade * c.preco_centavos) as subtotal_centavos
+            ), fechado AS (
+                UPDATE carrinhos
+                SET status = 'fechado',
+                    fechado_em = now(),
+                    atualizado_em = now(),
+                    total_centavos = (SELECT SUM(subtotal_centavos) FROM precos)
+                WHERE id = (SELECT id FROM alvo) AND EXISTS (SELECT 1 FROM precos)
+                RETURNING id, fechado_em
+            )
+            SELECT p.*, f.fechado_em
+            FROM precos p
+            JOIN fechado f ON f.id = p.carrinho_id
+            ORDER BY p.nome
+        """, (cliente_id,))
+        linhas = cur.fetchall()
+    if not linhas:
+        return None
+    pedido = _resumo_carrinho(linhas)
+    pedido["fechado_em"] = linhas[0]["fechado_em"]
+    return pedido
@@ -0,0 +1,105 @@
+"""Exportação de pedidos fechados por intervalo de tempo, em pedaços.
+
+As linhas vêm de um cursor no servidor (cursor nomeado do psycopg2), EXPORT_LOTE
+por vez, e cada lote já sai formatado: a memória usada não depende de quantos
+pedidos existem no intervalo. Os geradores são síncronos; o StreamingResponse
+do FastAPI chama cada passo numa thread, fora do event loop.
+"""
+import csv
+import io
+import json
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional
+
+from app.config import config
+from app.utils.db import get_conn
+
+COLUNAS = [
+    "pedido_id", "cliente_id", "cliente_nome", "fechado_em", "total_centavos",
+    "produto_id", "produto", "quantidade", "preco_unitario_centavos", "subtotal_centavos",
+]
+
+FORMATOS = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+    "json": "application/json",
+}
+
+
+def lotes_de_linhas(inicio: datetime, fim: datetime, lote: Optional[int] = None) -> Iterator[List[Dict]]:
+    """Uma linha por item de pedido, ordenadas por pedido (fechado_em, id)."""
+    lote = lote or config.EXPORT_LOTE
+    with get_conn() as conn, conn.cursor(name="exportacao_pedidos") as cur:
+        cur.itersize = lote
+        cur.execute("""
+            SELECT
+                ca.id AS pedido_id,
+                ca.usuario_id AS cliente_id,
+                cl.nome AS cliente_nome,
+                ca.fechado_em,
+                ca.total_centavos,
+                ic.produto_id,
+                c.nome AS produto,
+                ic.quantidade,
+                ic.preco_unitario_centavos,
+                (ic.quantidade * ic.preco_unitario_centavos) AS subtotal_centavos
+            FROM carrinhos ca
+            JOIN itens_carrinho ic ON ic.carrinho_id = ca.id
+            JOIN cardapio c ON c.id = ic.produto_id
+            LEFT JOIN clientes cl ON cl.id = ca.usuario_id
+            WHERE ca.status = 'fechado'
+              AND ca.fechado_em >= %s AND ca.fechado_em < %s
+            ORDER BY ca.fechado_em, ca.id, c.nome
+        """, (inicio, fim))
+        while True:
+            linhas = cur.fetchmany(lote)
+            if not linhas:
+                return
+            yield linhas
+
+def _valor(v):
+    return v.isoformat() if isinstance(v, datetime) else v
+
+def exportar_csv(inicio: datetime, fim: datetime) -> Iterator[str]:
+    buf = io.StringIO()
+    escritor = csv.writer(buf)
+    escritor.writerow(COLUNAS)
+    yield buf.getvalue()
+    for linhas in lotes_de_linhas(inicio, fim):
+        buf.seek(0)
+        buf.truncate()
+        escritor.writerows([_valor(linha[c]) for c in COLUNAS] for linha in linhas)
+        yield buf.getvalue()
+
+def _pedidos(inicio: datetime, fim: datetime) -> Iterator[List[Dict]]:
+    """Agrupa as linhas consecutivas do mesmo pedido; um pedido pode atravessar dois lotes."""
+    atual: Optional[Dict] = None
+    for linhas in lotes_de_linhas(inicio, fim):
+        prontos = []
+        for linha in linhas:
+            if atual is None or atual["pedido_id"] != linha["pedido_id"]:
+                if atual is not None:
+                    prontos.append(atual)
+                atual = {c: _valor(linha[c]) for c in COLUNAS[:5]}
+                atual["itens"] = []
+            atual["itens"].append({c: linha[c] for c in COLUNAS[5:]})
+        if prontos:
+            yield prontos
+    if atual is not None:
+        yield [atual]
+
+def exportar_ndjson(inicio: datetime, fim: datetime) -> Iterator[str]:
+    for pedidos in _pedidos(inicio, fim):
+        yield "".join(json.dumps(p, ensure_ascii=False, default=str) + "\n" for p in pedidos)
+
+def exportar_json(inicio: datetime, fim: datetime) -> Iterator[str]:
+    yield "["
+    primeiro = True
+    for pedidos in _pedidos(inicio, fim):
+        corpo = ",".join(json.dumps(p, ensure_ascii=False, default=str) for p in pedidos)
+        yield corpo if primeiro else "," + corpo
+        primeiro = False
+    yield "]"
+
+def exportar(formato: str, inicio: datetime, fim: datetime) -> Iterator[str]:
+    return {"csv": exportar_csv, "ndjson": exportar_ndjson, "json": exportar_json}[formato](inicio, fim)
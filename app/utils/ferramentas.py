@@ -0,0 +1,137 @@
+"""Ferramentas que a IA pode chamar (tool calling no formato da OpenAI).
+
+Em vez de mandar o cardápio inteiro em todo prompt, a IA pede só o que precisa:
+o cardápio e a busca de produtos vêm do cache em memória (cardapio_cache.py),
+o carrinho vem das funções de app/utils/db.py. Cada resultado volta pra IA como
+JSON curto, com preços já em reais pra ela não errar a conta.
+
+As ferramentas de carrinho só existem quando o cliente já está cadastrado, e
+todas amarradas ao id dele: a IA nunca escolhe de quem é o carrinho.
+"""
+import json
+import logging
+from typing import Dict, List, Optional
+
+from app.utils.cardapio_cache import (
+    obter_cardapio,
+    buscar_candidatos_no_cardapio,
+    buscar_produto_no_cardapio,
+)
+from app.utils.db import executar_db, adicionar_ao_carrinho, ver_carrinho, fechar_pedido
+
+logger = logging.getLogger(__name__)
+
+QUANTIDADE_MAX = 20
+
+
+def _funcao(nome: str, descricao: str, propriedades: Optional[Dict] = None, obrigatorias: Optional[List[str]] = None) -> Dict:
+    return {
+        "type": "function",
+        "function": {
+            "name": nome,
+            "description": descricao,
+            "parameters": {
+                "type": "object",
+                "properties": propriedades or {},
+                "required": obrigatorias or [],
+            },
+        },
+    }
+
+_PRODUTO = {"type": "string", "description": "Nome do produto como o cliente escreveu"}
+
+DEFINICOES_CARDAPIO = [
+    _funcao("ver_cardapio", "Lista todos os produtos disponíveis hoje, com preço em reais."),
+    _funcao("buscar_produto", "Procura produtos do cardápio parecidos com o nome dado; use pra confirmar nome e preço.",
+            {"nome": _PRODUTO}, ["nome"]),
+]
+
+DEFINICOES_CARRINHO = [
+    _funcao("ver_carrinho", "Mostra os itens e o total do carrinho aberto do cliente."),
+    _funcao("adicionar_ao_carrinho", "Coloca um produto no carrinho do cliente. Só use quando ele pedir.",
+            {"produto": _PRODUTO,
+             "quantidade": {"type": "integer", "minimum": 1, "maximum": QUANTIDADE_MAX}},
+            ["produto"]),
+    _funcao("fechar_pedido", "Fecha o carrinho e manda o pedido pra cozinha. "
+            "Só use quando o cliente confirmar que quer fechar o pedido."),
+]
+
+# Podem rodar em paralelo entre si; as outras mexem no carrinho e vão uma de cada vez
+SOMENTE_LEITURA = {"ver_cardapio", "buscar_produto", "ver_carrinho"}
+
+
+def _reais(centavos: int) -> str:
+    return f"R$ {centavos / 100:.2f}"
+
+def _produto(p: Dict) -> Dict:
+    return {"nome": p["nome"], "preco": _reais(p["preco_centavos"])}
+
+def _carrinho(c: Dict) -> Dict:
+    return {
+        "itens": [
+            {"quantidade": i["quantidade"], "nome": i["nome"], "subtotal": _reais(i["subtotal_centavos"])}
+            for i in c["itens"]
+        ],
+        "total": _reais(c["total_centavos"]),
+    }
+
+
+class FerramentasAtendimento:
+    """Ferramentas de um atendimento; `cliente_id=None` deixa só as do cardápio."""
+
+    def __init__(self, cliente_id: Optional[int] = None):
+        self.cliente_id = cliente_id
+        self.definicoes = DEFINICOES_CARDAPIO + (DEFINICOES_CARRINHO if cliente_id is not None else [])
+        self._nomes = {d["function"]["name"] for d in self.definicoes}
+        # O que a IA fez no carrinho, pro atendimento lembrar na memória da conversa
+        self.alteracoes: List[str] = []
+
+    def somente_leitura(self, nome: str) -> bool:
+        return nome in SOMENTE_LEITURA
+
+    async def executar(self, nome: str, argumentos: str) -> str:
+        """Roda uma chamada da IA e devolve o resultado em JSON; erro também volta como JSON pra ela."""
+        if nome not in self._nomes:
+            return json.dumps({"erro": f"ferramenta desconhecida: {nome}"})
+        try:
+            args = json.loads(argumentos or "{}")
+            if not isinstance(args, dict):
+                raise ValueError("argumentos devem ser um objeto")
+            resultado = await getattr(self, f"_{nome}")(**args)
+        except (TypeError, ValueError) as e:
+            resultado = {"erro": f"argumentos inválidos: {e}"}
+        except Exception as e:
+            logger.exception(f"❌ Ferramenta {nome} falhou: {e}")
+            resultado = {"erro": "falha ao consultar, tente de novo"}
+        return json.dumps(resultado, ensure_ascii=False)
+
+    async def _ver_cardapio(self) -> Dict:
+        return {"produtos": [_produto(p) for p in await obter_cardapio()]}
+
+    async def _buscar_produto(self, nome: str) -> Dict:
+        candidatos = await buscar_candidatos_no_cardapio(str(nome))
+        return {"produtos": [_produto(p) for p, _ in candidatos]}
+
+    async def _ver_carrinho(self) -> Dict:
+        return _carrinho(await executar_db(ver_carrinho, self.cliente_id))
+
+    async def _adicionar_ao_carrinho(self, produto: str, quantidade: int = 1) -> Dict:
+        quantidade = int(quantidade)
+        if not 1 <= quantidade <= QUANTIDADE_MAX:
+            return {"erro": f"quantidade deve ser de 1 a {QUANTIDADE_MAX}"}
+        encontrado = await buscar_produto_no_cardapio(str(produto))
+        if not encontrado:
+            return {"erro": f"'{produto}' não está no cardápio"}
+        carrinho = await executar_db(adicionar_ao_carrinho, self.cliente_id, encontrado["id"], quantidade)
+        self.alteracoes.append(f"coloquei {quantidade}x {encontrado['nome']} no carrinho")
+        logger.info(f"🛒 IA adicionou {quantidade}x {encontrado['nome']} ao carrinho {carrinho['carrinho_id']}")
+        return {"adicionado": _produto(encontrado), "quantidade": quantidade, "carrinho": _carrinho(carrinho)}
+
+    async def _fechar_pedido(self) -> Dict:
+        pedido = await executar_db(fechar_pedido, self.cliente_id)
+        if not pedido:
+            return {"erro": "carrinho vazio, nada pra fechar"}
+        numero = pedido["carrinho_id"][:8].upper()
+        self.alteracoes.append(f"fechei o pedido #{numero}, total {_reais(pedido['total_centavos'])}")
+        logger.info(f"🧾 IA fechou o pedido {pedido['carrinho_id']}: total {pedido['total_centavos']} centavos")
+        return {"pedido": numero, **_carrinho(pedido)}
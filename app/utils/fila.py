@@ -0,0 +1,91 @@
+"""Fila em memória com workers asyncio e ordem garantida por chave."""
+import asyncio
+import logging
+import time
+import zlib
+from typing import Any, Awaitable, Callable, Dict, List
+
+logger = logging.getLogger(__name__)
+
+
+class FilaParticionada:
+    """N workers, cada um com sua própria fila. Itens com a mesma chave (ex.: telefone)
+    caem sempre no mesmo worker, então são processados em ordem e nunca em paralelo."""
+
+    def __init__(self, nome: str, handler: Callable[[Any], Awaitable[None]], workers: int, maxsize: int = 0):
+        self.nome = nome
+        self.handler = handler
+        self.n_workers = max(1, workers)
+        # maxsize é o total; cada partição fica com sua fatia
+        self.maxsize = maxsize
+        self._filas: List[asyncio.Queue] = []
+        self._tarefas: List[asyncio.Task] = []
+        self.enfileirados = 0
+        self.processados = 0
+        self.falhas = 0
+        self.espera_total = 0.0
+        self.espera_max = 0.0
+
+    def _fila_da_chave(self, chave: str) -> asyncio.Queue:
+        return self._filas[zlib.crc32(str(chave).encode()) % self.n_workers]
+
+    async def iniciar(self):
+        if self._tarefas:
+            return
+        por_particao = -(-self.maxsize // self.n_workers) if self.maxsize else 0
+        self._filas = [asyncio.Queue(maxsize=por_particao) for _ in range(self.n_workers)]
+        self._tarefas = [
+            asyncio.create_task(self._worker(fila), name=f"{self.nome}-{i}")
+            for i, fila in enumerate(self._filas)
+        ]
+
+    async def colocar(self, chave: str, item: Any):
+        """Enfileira o item; só espera se a partição estiver cheia (backpressure)."""
+        if not self._tarefas:
+            await self.iniciar()
+        await self._fila_da_chave(chave).put((time.perf_counter(), item))
+        self.enfileirados += 1
+
+    async def _worker(self, fila: asyncio.Queue):
+        while True:
+            enfileirado_em, item = await fila.get()
+            espera = time.perf_counter() - enfileirado_em
+            self.espera_total += espera
+            self.espera_max = max(self.espera_max, espera)
+            try:
+                await self.handler(item)
+                self.processados += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.falhas += 1
+                logger.exception(f"[{self.nome}] Falha processando item: {e}")
+            finally:
+                fila.task_done()
+
+    def pendentes(self) -> int:
+        return sum(f.qsize() for f in self._filas)
+
+    async def drenar(self, timeout: float):
+        """Espera o que já está na fila terminar (até `timeout`) e encerra os workers."""
+        if not self._tarefas:
+            return
+        try:
+            await asyncio.wait_for(asyncio.gather(*(f.join() for f in self._filas)), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"[{self.nome}] Encerrando com {self.pendentes()} item(ns) ainda na fila")
+        for t in self._tarefas:
+            t.cancel()
+        await asyncio.gather(*self._tarefas, return_exceptions=True)
+        self._tarefas = []
+
+    def metricas(self) -> Dict:
+        return {
+            "workers": self.n_workers,
+            "pendentes": self.pendentes(),
+            "enfileirados": self.enfileirados,
+            "processados": self.processados,
+            "falhas": self.falhas,
+            "espera_media_ms": round(self.espera_total * 1000 / self.processados, 3) if self.processados else 0.0,
+            "espera_max_ms": round(self.espera_max * 1000, 3),
+        }
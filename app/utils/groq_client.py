@@ -1,14 +1,29 @@
-import os
-import requests
-from typing import Optional
-from app.config import GROQ_API_KEY, GROQ_MODEL
-from app.utils.nordeste import nordestinizar
+import asyncio
+import json
+import logging
+import random
+import time
+import httpx
+from typing import AsyncIterator, Callable, Dict, List, Optional
+from app.config import (
+    GROQ_API_KEY,
+    GROQ_BASE_URL,
+    GROQ_MAX_CONCORRENCIA,
+    GROQ_MAX_CONEXOES,
+    GROQ_MODELS_VALIDOS,
+    GROQ_USO_TTL,
+    MEMORIA_MAX_CONVERSAS,
+    config,
+)
+from app.utils.cache import CacheTTL
+from app.utils.cache_respostas import cache_respostas
+from app.utils.ferramentas import FerramentasAtendimento
+from app.utils.nordeste import nordestinizar, nordestinizar_stream
+from app.utils.telemetria import medir
 
-_GROQ_ENDPOINT = "https://api.groq.com/openai/v1/chat/completions"
+logger = logging.getLogger(__name__)
 
-GROQ_MODELS_VALIDOS = [
-    "llama-3.3-70b-versatile",
-]
+_GROQ_ENDPOINT = f"{GROQ_BASE_URL}/chat/completions"
 
 SYSTEM_PROMPT = (
     "Você é um atendente virtual simpático de uma hamburgueria/restaurante chamado Brasas. "
@@ -18,43 +33,486 @@ SYSTEM_PROMPT = (
     "Seja prestativo e alegre, como um bom nordestino!"
 )
 
-def gerar_resposta_nordestina(mensagem: str, contexto: Optional[str] = None) -> str:
+# Vai junto do SYSTEM_PROMPT quando a IA tem ferramentas
+INSTRUCOES_FERRAMENTAS = (
+    " Nunca invente produto nem preço: consulte as ferramentas do cardápio antes de falar deles. "
+    "Use as ferramentas do carrinho só quando o cliente pedir."
+)
+
+RESPOSTA_SOBRECARGA = (
+    "Eita, tá uma correria danada aqui agora! Me manda tua mensagem de novo "
+    "daqui a pouquinho que eu te respondo direitinho, visse?"
+)
+
+_client: Optional[httpx.AsyncClient] = None
+_semaforo: Optional[asyncio.Semaphore] = None
+
+_metricas = {
+    "chamadas": 0,
+    "erros": 0,
+    "retries": 0,
+    "respostas_429": 0,
+    "em_andamento": 0,
+    "aguardando_vaga": 0,
+    "descartadas_sobrecarga": 0,
+    "latencia_total_ms": 0.0,
+    "tokens_prompt": 0,
+    "tokens_resposta": 0,
+    "chamadas_ferramentas": 0,
+    "limite_passos_atingido": 0,
+}
+
+# Tokens gastos por conversa (telefone), pra saber quem custa caro
+_uso_por_conversa = CacheTTL(maxsize=MEMORIA_MAX_CONVERSAS, ttl=GROQ_USO_TTL)
+config.ao_mudar(("GROQ_USO_TTL",), lambda: setattr(_uso_por_conversa, "ttl", config.GROQ_USO_TTL))
+
+
+class ErroGroq(Exception):
+    def __init__(self, mensagem: str, status: Optional[int] = None, texto: str = ""):
+        super().__init__(mensagem)
+        self.status = status
+        self.texto = texto
+
+    @property
+    def transitorio(self) -> bool:
+        """Falha de rede, 429 ou 5xx: pode dar certo numa nova tentativa do job."""
+        return self.status is None or _deve_tentar_de_novo(self.status)
+
+class GroqSobrecarregado(ErroGroq):
+    """Fila de espera por vaga cheia: melhor não entrar nela."""
+
+
+def _http2_disponivel() -> bool:
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+def _timeout() -> httpx.Timeout:
+    # Passado em cada requisição, pra valer o GROQ_TIMEOUT ajustado sem recriar o cliente
+    return httpx.Timeout(config.GROQ_TIMEOUT, connect=5.0)
+
+def max_aguardando() -> int:
+    return config.GROQ_MAX_AGUARDANDO or GROQ_MAX_CONCORRENCIA * 4
+
+async def iniciar_cliente_groq() -> httpx.AsyncClient:
+    """Cria o cliente HTTP compartilhado (keep-alive, HTTP/2 quando disponível).
+
+    Chamado sozinho na primeira chamada à IA; o lifespan só o antecipa no aquecimento.
+    """
+    global _client, _semaforo
+    if _semaforo is None:
+        _semaforo = asyncio.Semaphore(GROQ_MAX_CONCORRENCIA)
+    if _client is None:
+        _client = httpx.AsyncClient(
+            http2=_http2_disponivel(),
+            timeout=_timeout(),
+            limits=httpx.Limits(
+                max_connections=GROQ_MAX_CONEXOES,
+                max_keepalive_connections=GROQ_MAX_CONEXOES,
+            ),
+            headers={
+                "Authorization": f"Bearer {GROQ_API_KEY}",
+                "Content-Type": "application/json",
+            },
+        )
+    return _client
+
+async def aquecer_cliente_groq():
+    """Abre a conexão (TLS/HTTP2) com o Groq antes da primeira mensagem, sem gastar token."""
+    cli = await iniciar_cliente_groq()
+    try:
+        resp = await cli.get(f"{GROQ_BASE_URL}/models")
+        logger.info(f"Conexão com o Groq aquecida (HTTP {resp.status_code})")
+    except httpx.HTTPError as e:
+        logger.warning(f"Não consegui aquecer a conexão com o Groq: {e}")
+
+async def fechar_cliente_groq():
+    global _client
+    cli, _client = _client, None
+    if cli is not None:
+        await cli.aclose()
+
+def metricas_groq() -> Dict:
+    m = dict(_metricas)
+    m["latencia_media_ms"] = round(m["latencia_total_ms"] / m["chamadas"], 3) if m["chamadas"] else 0.0
+    m["latencia_total_ms"] = round(m["latencia_total_ms"], 3)
+    m["max_concorrencia"] = GROQ_MAX_CONCORRENCIA
+    m["max_aguardando"] = max_aguardando()
+    m["conversas_com_uso"] = len(_uso_por_conversa)
+    m["conversas_mais_tokens"] = conversas_que_mais_gastam()
+    return m
+
+def _contar_uso(data: Dict, conversa: Optional[str]):
+    uso = data.get("usage") or {}
+    prompt = uso.get("prompt_tokens", 0)
+    resposta = uso.get("completion_tokens", 0)
+    _metricas["tokens_prompt"] += prompt
+    _metricas["tokens_resposta"] += resposta
+    if conversa is None:
+        return
+    atual = _uso_por_conversa.get(conversa) or {"chamadas": 0, "tokens_prompt": 0, "tokens_resposta": 0}
+    _uso_por_conversa.set(conversa, {
+        "chamadas": atual["chamadas"] + 1,
+        "tokens_prompt": atual["tokens_prompt"] + prompt,
+        "tokens_resposta": atual["tokens_resposta"] + resposta,
+    })
+
+def uso_da_conversa(conversa: str) -> Dict:
+    """Chamadas e tokens gastos com essa conversa nas últimas GROQ_USO_TTL segundos sem uso."""
+    return _uso_por_conversa.get(conversa) or {"chamadas": 0, "tokens_prompt": 0, "tokens_resposta": 0}
+
+def _mascarar(telefone: str) -> str:
+    return f"{telefone[:4]}…{telefone[-4:]}" if len(telefone) > 8 else "…"
+
+def conversas_que_mais_gastam(n: int = 10) -> List[Dict]:
+    """As `n` conversas com mais tokens no período de GROQ_USO_TTL, com o telefone mascarado.
+
+    É lista, então aparece em /test-db mas não no /metrics (que só exporta números).
+    """
+    ordenadas = sorted(
+        _uso_por_conversa.itens(),
+        key=lambda par: par[1]["tokens_prompt"] + par[1]["tokens_resposta"],
+        reverse=True,
+    )
+    return [{"conversa": _mascarar(str(conversa)), **uso} for conversa, uso in ordenadas[:n]]
+
+def groq_saturado() -> bool:
+    return _metricas["aguardando_vaga"] >= max_aguardando()
+
+
+def _tempo_espera(resp: Optional[httpx.Response], tentativa: int) -> float:
+    """Respeita o `retry-after` do 429; senão, backoff exponencial com jitter."""
+    if resp is not None:
+        retry_after = resp.headers.get("retry-after")
+        if retry_after:
+            try:
+                return min(float(retry_after), config.GROQ_BACKOFF_MAX)
+            except ValueError:
+                pass
+    return min(config.GROQ_BACKOFF_MAX, 0.5 * (2 ** tentativa)) * random.uniform(0.5, 1.0)
+
+def _deve_tentar_de_novo(status: int) -> bool:
+    return status == 429 or status >= 500
+
+class _Vaga:
+    """Ocupa uma vaga no semáforo de concorrência do Groq, contando quem espera."""
+
+    async def __aenter__(self):
+        await iniciar_cliente_groq()
+        _metricas["aguardando_vaga"] += 1
+        try:
+            await _semaforo.acquire()
+        finally:
+            _metricas["aguardando_vaga"] -= 1
+        _metricas["em_andamento"] += 1
+        return self
+
+    async def __aexit__(self, *exc):
+        _metricas["em_andamento"] -= 1
+        _semaforo.release()
+
+
+async def _chamar_groq(payload: Dict) -> Dict:
+    """POST no endpoint de chat com retries em 429/5xx/timeouts. A vaga é liberada durante a espera."""
+    tentativas = config.GROQ_MAX_TENTATIVAS
+    for tentativa in range(tentativas):
+        ultima = tentativa == tentativas - 1
+        resp = None
+        inicio = time.perf_counter()
+        try:
+            async with _Vaga():
+                _metricas["chamadas"] += 1
+                resp = await _client.post(_GROQ_ENDPOINT, json=payload, timeout=_timeout())
+        except httpx.TransportError as e:
+            if ultima:
+                _metricas["erros"] += 1
+                raise ErroGroq(f"Não consegui conectar com a IA ({e})") from e
+        finally:
+            _metricas["latencia_total_ms"] += (time.perf_counter() - inicio) * 1000
+
+        if resp is not None:
+            if resp.status_code == 429:
+                _metricas["respostas_429"] += 1
+            if not _deve_tentar_de_novo(resp.status_code) or ultima:
+                if resp.is_error:
+                    _metricas["erros"] += 1
+                    raise ErroGroq(f"Erro HTTP na IA ({resp.status_code})", resp.status_code, resp.text)
+                return resp.json()
+
+        _metricas["retries"] += 1
+        espera = _tempo_espera(resp, tentativa)
+        logger.warning(f"Groq indisponível (tentativa {tentativa + 1}), tentando de novo em {espera:.1f}s")
+        await asyncio.sleep(espera)
+    raise ErroGroq("Groq sem resposta")
+
+# Marca o fim da resposta na fila de _stream_groq
+_FIM_STREAM = object()
+
+async def _ler_stream_groq(payload: Dict, entregar: Callable[[str], None]):
+    """Igual a `_chamar_groq`, mas com `stream=True` e cada pedaço indo pra `entregar`.
+
+    Só tenta de novo antes do primeiro token.
+    """
+    payload = {**payload, "stream": True}
+    tentativas = config.GROQ_MAX_TENTATIVAS
+    for tentativa in range(tentativas):
+        ultima = tentativa == tentativas - 1
+        status = None
+        espera = _tempo_espera(None, tentativa)
+        try:
+            async with _Vaga():
+                _metricas["chamadas"] += 1
+                async with _client.stream("POST", _GROQ_ENDPOINT, json=payload, timeout=_timeout()) as resp:
+                    status = resp.status_code
+                    if resp.status_code == 429:
+                        _metricas["respostas_429"] += 1
+                    if resp.is_error:
+                        texto = (await resp.aread()).decode("utf-8", "replace")
+                        if ultima or not _deve_tentar_de_novo(resp.status_code):
+                            _metricas["erros"] += 1
+                            raise ErroGroq(f"Erro HTTP na IA ({resp.status_code})", resp.status_code, texto)
+                        espera = _tempo_espera(resp, tentativa)
+                    else:
+                        async for linha in resp.aiter_lines():
+                            if not linha.startswith("data:"):
+                                continue
+                            dado = linha[5:].strip()
+                            if dado == "[DONE]":
+                                return
+                            delta = json.loads(dado)["choices"][0].get("delta", {}).get("content")
+                            if delta:
+                                entregar(delta)
+                        return
+        except httpx.TransportError as e:
+            if ultima or status is not None:
+                _metricas["erros"] += 1
+                raise ErroGroq(f"Não consegui conectar com a IA ({e})") from e
+        _metricas["retries"] += 1
+        await asyncio.sleep(espera)
+
+async def _stream_groq(payload: Dict) -> AsyncIterator[str]:
+    """Pedaços da resposta em streaming.
+
+    A leitura roda numa tarefa à parte que põe os pedaços numa fila, então a vaga
+    do semáforo é devolvida quando o Groq termina, e não quando quem consome
+    termina. A resposta tem no máximo `max_tokens`, então a fila não cresce sem
+    limite. Se quem consome desistir no meio, a leitura é cancelada.
+    """
+    fila: asyncio.Queue = asyncio.Queue()
+
+    async def ler():
+        try:
+            await _ler_stream_groq(payload, fila.put_nowait)
+            fila.put_nowait(_FIM_STREAM)
+        except Exception as e:
+            fila.put_nowait(e)
+
+    tarefa = asyncio.create_task(ler())
+    try:
+        while (item := await fila.get()) is not _FIM_STREAM:
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        tarefa.cancel()
+
+
+def _validar_config() -> Optional[str]:
     if not GROQ_API_KEY:
         return "Configuração de LLM ausente. Fale com o suporte, visse?"
-    
-    if GROQ_MODEL not in GROQ_MODELS_VALIDOS:
-        return f"Modelo configurado inválido: {GROQ_MODEL}. Escolha entre: {', '.join(GROQ_MODELS_VALIDOS)}"
-    
+    if config.GROQ_MODEL not in GROQ_MODELS_VALIDOS:
+        return f"Modelo configurado inválido: {config.GROQ_MODEL}. Escolha entre: {', '.join(GROQ_MODELS_VALIDOS)}"
+    return None
+
+def _conteudo(data: Dict) -> str:
+    """Texto da resposta; mensagem vazia (ou só com tool_calls) vira ErroGroq."""
+    conteudo = data["choices"][0]["message"].get("content")
+    if not conteudo or not conteudo.strip():
+        raise ErroGroq("A IA respondeu vazio")
+    return conteudo
+
+def _montar_payload(
+    mensagem: str,
+    contexto: Optional[str],
+    historico: Optional[List[Dict]] = None,
+    ferramentas: Optional[FerramentasAtendimento] = None,
+) -> Dict:
     user_prompt = mensagem if contexto is None else f"{contexto}\n\nMensagem do cliente: {mensagem}"
+    sistema = SYSTEM_PROMPT if ferramentas is None else SYSTEM_PROMPT + INSTRUCOES_FERRAMENTAS
     payload = {
-        "model": GROQ_MODEL,
+        "model": config.GROQ_MODEL,
         "messages": [
-            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "system", "content": sistema},
+            *(historico or []),
             {"role": "user", "content": user_prompt}
         ],
         "temperature": 0.7,
         "max_tokens": 200,
     }
-    
-    headers = {
-        "Authorization": f"Bearer {GROQ_API_KEY}",
-        "Content-Type": "application/json"
-    }
-    
+    if ferramentas is not None:
+        payload["tools"] = ferramentas.definicoes
+        payload["tool_choice"] = "auto"
+    return payload
+
+async def _executar_chamadas(ferramentas: FerramentasAtendimento, chamadas: List[Dict]) -> List[Dict]:
+    """Mensagens `tool` com o resultado de cada chamada, na ordem pedida pela IA.
+
+    Consultas seguidas rodam juntas (gather); o que mexe no carrinho roda sozinho,
+    depois do que veio antes, pra ordem das alterações ser a que a IA pediu.
+    """
+    resultados: List[str] = []
+    grupo: List[Dict] = []
+
+    async def _rodar_grupo():
+        if grupo:
+            resultados.extend(await asyncio.gather(
+                *(ferramentas.executar(c["function"]["name"], c["function"].get("arguments")) for c in grupo)
+            ))
+            grupo.clear()
+
+    for chamada in chamadas:
+        nome = chamada["function"]["name"]
+        logger.info(f"🔧 IA chamou {nome}({chamada['function'].get('arguments') or ''})")
+        if ferramentas.somente_leitura(nome):
+            grupo.append(chamada)
+            continue
+        await _rodar_grupo()
+        resultados.append(await ferramentas.executar(nome, chamada["function"].get("arguments")))
+    await _rodar_grupo()
+    _metricas["chamadas_ferramentas"] += len(chamadas)
+    return [
+        {"role": "tool", "tool_call_id": chamada["id"], "content": resultado}
+        for chamada, resultado in zip(chamadas, resultados)
+    ]
+
+async def _laco_ferramentas(payload: Dict, ferramentas: FerramentasAtendimento, conversa: Optional[str]) -> str:
+    """Chama a IA, executa as ferramentas que ela pedir e devolve o resultado, até ela responder em texto.
+
+    No máximo GROQ_FERRAMENTAS_MAX_PASSOS chamadas; na última as ferramentas são
+    desligadas (`tool_choice: none`) pra forçar uma resposta.
+    """
+    passos = config.GROQ_FERRAMENTAS_MAX_PASSOS
+    for passo in range(passos):
+        if passo == passos - 1:
+            payload["tool_choice"] = "none"
+        with medir("groq"):
+            data = await _chamar_groq(payload)
+        _contar_uso(data, conversa)
+        logger.debug(f"[Groq] Resposta (passo {passo + 1}): {data}")
+        mensagem = data["choices"][0]["message"]
+        chamadas = mensagem.get("tool_calls")
+        if not chamadas:
+            return _conteudo(data)
+        if passo == passos - 1:
+            break
+        payload["messages"].append({"role": "assistant", "content": mensagem.get("content"), "tool_calls": chamadas})
+        with medir("ferramentas"):
+            payload["messages"] += await _executar_chamadas(ferramentas, chamadas)
+    _metricas["limite_passos_atingido"] += 1
+    raise ErroGroq("A IA não concluiu a resposta")
+
+async def gerar_resposta_base(
+    mensagem: str,
+    contexto: Optional[str] = None,
+    historico: Optional[List[Dict]] = None,
+    ferramentas: Optional[FerramentasAtendimento] = None,
+    conversa: Optional[str] = None,
+) -> str:
+    """Texto cru da IA, antes do nordestinizar. Levanta ErroGroq/KeyError em falha.
+
+    Com `ferramentas` a IA pode consultar cardápio e carrinho antes de responder;
+    `conversa` (o telefone) só serve pra somar os tokens gastos.
+    """
+    if groq_saturado():
+        _metricas["descartadas_sobrecarga"] += 1
+        raise GroqSobrecarregado("Groq com fila de espera cheia")
+    payload = _montar_payload(mensagem, contexto, historico, ferramentas)
+    if ferramentas is not None:
+        return await _laco_ferramentas(payload, ferramentas, conversa)
+    with medir("groq"):
+        data = await _chamar_groq(payload)
+    _contar_uso(data, conversa)
+    logger.debug(f"[Groq] Resposta: {data}")
+    return _conteudo(data)
+
+def resposta_do_cache(mensagem: str) -> Optional[str]:
+    """Resposta pronta pra `mensagem`, já nordestinizada, sem chamar a IA (None = não tem)."""
+    resposta = cache_respostas.buscar(mensagem)
+    if resposta is None:
+        return None
+    logger.info("♻️ Resposta da IA reaproveitada do cache")
+    return nordestinizar(resposta, add_tail=True)
+
+async def _gerar_e_guardar(
+    mensagem: str,
+    contexto: Optional[str],
+    ferramentas: Optional[FerramentasAtendimento] = None,
+    conversa: Optional[str] = None,
+) -> str:
+    inicio = time.perf_counter()
+    resposta = await gerar_resposta_base(mensagem, contexto, ferramentas=ferramentas, conversa=conversa)
+    cache_respostas.guardar(mensagem, resposta, (time.perf_counter() - inicio) * 1000)
+    return resposta
+
+async def gerar_resposta_nordestina(
+    mensagem: str,
+    contexto: Optional[str] = None,
+    historico: Optional[List[Dict]] = None,
+    guardar_no_cache: bool = False,
+    ferramentas: Optional[FerramentasAtendimento] = None,
+    conversa: Optional[str] = None,
+    repassar_falhas: bool = False,
+) -> str:
+    """Com `guardar_no_cache=True` a resposta vai pro cache de respostas (a busca é
+    `resposta_do_cache`, antes); aí o histórico é ignorado, e contexto e
+    ferramentas não podem ter nada do cliente.
+
+    Com `repassar_falhas=True` um ErroGroq transitório é levantado em vez de virar
+    resposta de erro, pra quem chamou poder tentar de novo.
+    """
+    erro_config = _validar_config()
+    if erro_config:
+        return erro_config
+
     try:
-        resp = requests.post(_GROQ_ENDPOINT, headers=headers, json=payload, timeout=60)
-       
-        print(f"[DEBUG Groq] Status: {resp.status_code}, Response: {resp.text}")
-        
-        resp.raise_for_status()
-        data = resp.json()
-        resposta = data["choices"][0]["message"]["content"]
-    except requests.exceptions.HTTPError as http_err:
-        resposta = f"Eita! Erro HTTP na IA ({resp.status_code}): {resp.text}"
-    except requests.exceptions.RequestException as req_err:
-        resposta = f"Eita! Não consegui conectar com a IA ({req_err})"
-    except KeyError:
-        resposta = f"Eita! Resposta inesperada da IA: {resp.text}"
-    
+        if guardar_no_cache:
+            resposta = await _gerar_e_guardar(mensagem, contexto, ferramentas, conversa)
+        else:
+            resposta = await gerar_resposta_base(mensagem, contexto, historico, ferramentas, conversa)
+    except GroqSobrecarregado:
+        logger.warning("🚦 Groq saturado, mandando resposta pronta")
+        return RESPOSTA_SOBRECARGA
+    except ErroGroq as e:
+        if repassar_falhas and e.transitorio:
+            raise
+        return resposta_de_falha(e)
+    except (KeyError, IndexError, ValueError):
+        resposta = "Eita! Resposta inesperada da IA."
+
     resposta = nordestinizar(resposta, add_tail=True)
     return resposta
+
+def resposta_de_falha(e: ErroGroq) -> str:
+    return nordestinizar(f"Eita! {e}" + (f": {e.texto}" if e.texto else ""), add_tail=True)
+
+async def gerar_resposta_stream(
+    mensagem: str,
+    contexto: Optional[str] = None,
+    historico: Optional[List[Dict]] = None,
+    nordestino: bool = False,
+) -> AsyncIterator[str]:
+    """Modo streaming: devolve os pedaços do texto à medida que chegam do Groq.
+
+    Com `nordestino=True` os pedaços já saem nordestinizados (com a expressão final).
+    """
+    erro_config = _validar_config()
+    if erro_config:
+        yield erro_config
+        return
+    pedacos = _stream_groq(_montar_payload(mensagem, contexto, historico))
+    if nordestino:
+        pedacos = nordestinizar_stream(pedacos)
+    async for pedaco in pedacos:
+        yield pedaco
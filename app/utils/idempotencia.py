@@ -0,0 +1,109 @@
+"""Deduplicação de webhooks pelo id da mensagem da UltraMsg.
+
+A UltraMsg reenvia o webhook quando demoramos a responder; sem isso cada
+reenvio viraria outra chamada à IA e outro item no carrinho.
+
+O id só fica marcado se a mensagem entrar na fila: se o enfileiramento falhar,
+`esquecer` desfaz a marca e o reenvio é aceito. Com DEDUP_POSTGRES e
+JOBS_BACKEND=postgres o id vai pra `mensagens_recebidas` na mesma transação
+que grava o job (ver `registrar_ids` e jobs._inserir_job).
+"""
+import logging
+from typing import Dict, Iterable, List, Optional
+
+from app.config import DEDUP_MAX, DEDUP_TTL, DEDUP_POSTGRES, JOBS_BACKEND, config
+from app.utils.cache import CacheTTL
+from app.utils.db import executar_db, get_conn
+
+logger = logging.getLogger(__name__)
+
+_vistos = CacheTTL(maxsize=DEDUP_MAX, ttl=DEDUP_TTL)
+config.ao_mudar(("DEDUP_TTL",), lambda: setattr(_vistos, "ttl", config.DEDUP_TTL))
+
+# Com a fila de jobs no Postgres, a tabela é gravada junto com o job, não aqui
+_REGISTRO_AQUI = DEDUP_POSTGRES and JOBS_BACKEND != "postgres"
+
+_metricas = {
+    "novas": 0,
+    "duplicadas": 0,
+    "sem_id": 0,
+    "esquecidas": 0,
+    "erros_banco": 0,
+}
+
+
+def _registrar_no_banco(message_id: str) -> bool:
+    """True se o id ainda não estava na tabela (vale entre vários processos)."""
+    with get_conn() as conn, conn.cursor() as cur:
+        cur.execute("""
+            INSERT INTO mensagens_recebidas (message_id)
+            VALUES (%s)
+            ON CONFLICT (message_id) DO NOTHING
+        """, (message_id,))
+        return cur.rowcount == 1
+
+def registrar_ids(cur, message_ids: List[str]) -> List[str]:
+    """Grava os ids na transação de `cur` e devolve os que ainda não estavam lá."""
+    cur.execute("""
+        INSERT INTO mensagens_recebidas (message_id)
+        SELECT unnest(%s::text[])
+        ON CONFLICT (message_id) DO NOTHING
+        RETURNING message_id
+    """, (message_ids,))
+    return [linha["message_id"] for linha in cur.fetchall()]
+
+def _apagar_do_banco(message_ids: List[str]):
+    with get_conn() as conn, conn.cursor() as cur:
+        cur.execute("DELETE FROM mensagens_recebidas WHERE message_id = ANY(%s)", (message_ids,))
+
+def limpar_mensagens_antigas() -> int:
+    """Apaga ids mais velhos que o TTL; a UltraMsg não reenvia depois disso."""
+    with get_conn() as conn, conn.cursor() as cur:
+        cur.execute("""
+            DELETE FROM mensagens_recebidas
+            WHERE recebido_em < now() - make_interval(secs => %s)
+        """, (config.DEDUP_TTL,))
+        return cur.rowcount
+
+async def primeira_vez(message_id: Optional[str]) -> bool:
+    """Retorna False se essa mensagem já foi recebida antes."""
+    if not message_id:
+        _metricas["sem_id"] += 1
+        return True
+
+    if not _vistos.adicionar_se_ausente(message_id):
+        _metricas["duplicadas"] += 1
+        return False
+
+    if _REGISTRO_AQUI:
+        try:
+            nova = await executar_db(_registrar_no_banco, message_id)
+        except Exception as e:
+            # Na dúvida, processa: melhor uma resposta repetida do que uma perdida
+            _metricas["erros_banco"] += 1
+            logger.error(f"Falha ao registrar mensagem {message_id} para deduplicação: {e}")
+            nova = True
+        if not nova:
+            _metricas["duplicadas"] += 1
+            return False
+
+    _metricas["novas"] += 1
+    return True
+
+async def esquecer(message_ids: Iterable[Optional[str]]):
+    """Desfaz `primeira_vez` de mensagens que não chegaram na fila, pra o reenvio ser aceito."""
+    ids = [i for i in message_ids if i]
+    if not ids:
+        return
+    for message_id in ids:
+        _vistos.remover(message_id)
+    _metricas["esquecidas"] += len(ids)
+    if _REGISTRO_AQUI:
+        try:
+            await executar_db(_apagar_do_banco, ids)
+        except Exception as e:
+            _metricas["erros_banco"] += 1
+            logger.error(f"Falha ao esquecer as mensagens {ids}: {e}")
+
+def metricas_idempotencia() -> Dict:
+    return {**_metricas, "postgres": DEDUP_POSTGRES, "cache": _vistos.metricas()}
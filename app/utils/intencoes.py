@@ -0,0 +1,222 @@
+"""Detecção de intenção por regras, antes de cair na IA.
+
+Tudo é compilado uma vez, na importação:
+- as palavras-chave de todas as regras viram um único autômato Aho-Corasick,
+  então o texto é varrido uma vez só, independente de quantas palavras existam;
+- cada intenção por padrão tem uma única regex (alternação de todos os padrões).
+
+Cada regra devolve uma confiança; vence a maior. Abaixo de CONFIANCA_MINIMA a
+mensagem vai para a IA. Regras novas entram com `MotorIntencoes.registrar`.
+"""
+import re
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from app.utils.busca_produtos import normalizar
+
+CONFIANCA_MINIMA = 0.5
+
+NUMEROS = {
+    "um": 1, "uma": 1, "dois": 2, "duas": 2, "tres": 3, "quatro": 4, "cinco": 5,
+    "seis": 6, "sete": 7, "oito": 8, "nove": 9, "dez": 10, "meia duzia": 6,
+}
+
+
+@dataclass
+class ItemPedido:
+    produto: str
+    quantidade: int = 1
+
+
+@dataclass
+class Intencao:
+    nome: str
+    confianca: float
+    itens: List[ItemPedido] = field(default_factory=list)
+
+
+class AhoCorasick:
+    """Busca simultânea de várias palavras-chave, respeitando limite de palavra."""
+
+    def __init__(self, palavras: Iterable[str]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._falha: List[int] = [0]
+        self._saida: List[List[str]] = [[]]
+        for palavra in palavras:
+            self._inserir(palavra)
+        self._construir_falhas()
+
+    def _inserir(self, palavra: str):
+        estado = 0
+        for c in palavra:
+            proximo = self._goto[estado].get(c)
+            if proximo is None:
+                proximo = len(self._goto)
+                self._goto[estado][c] = proximo
+                self._goto.append({})
+                self._falha.append(0)
+                self._saida.append([])
+            estado = proximo
+        self._saida[estado].append(palavra)
+
+    def _construir_falhas(self):
+        fila = deque(self._goto[0].values())
+        while fila:
+            estado = fila.popleft()
+            for c, proximo in self._goto[estado].items():
+                fila.append(proximo)
+                f = self._falha[estado]
+                while f and c not in self._goto[f]:
+                    f = self._falha[f]
+                self._falha[proximo] = self._goto[f].get(c, 0)
+                self._saida[proximo] = self._saida[proximo] + self._saida[self._falha[proximo]]
+
+    def buscar(self, texto: str) -> List[Tuple[int, str]]:
+        """(posição inicial, palavra) de cada ocorrência como palavra inteira."""
+        achados = []
+        estado = 0
+        for i, c in enumerate(texto):
+            while estado and c not in self._goto[estado]:
+                estado = self._falha[estado]
+            estado = self._goto[estado].get(c, 0)
+            for palavra in self._saida[estado]:
+                inicio = i - len(palavra) + 1
+                fim = i + 1
+                if (inicio == 0 or not texto[inicio - 1].isalnum()) and (fim == len(texto) or not texto[fim].isalnum()):
+                    achados.append((inicio, palavra))
+        return achados
+
+
+class RegraPalavrasChave:
+    """Intenção disparada por palavras-chave, cada uma com sua confiança."""
+
+    def __init__(self, nome: str, palavras: Dict[str, float]):
+        self.nome = nome
+        self.palavras = {normalizar(p): peso for p, peso in palavras.items()}
+
+    def avaliar(self, texto: str, achados: Dict[str, List[int]]) -> Optional[Intencao]:
+        pesos = [self.palavras[p] for p in achados if p in self.palavras]
+        if not pesos:
+            return None
+        return Intencao(self.nome, max(pesos))
+
+
+class RegraPadrao:
+    """Intenção disparada por regex; os padrões viram uma alternação só."""
+
+    def __init__(self, nome: str, padroes: List[str], confianca: float):
+        self.nome = nome
+        self.confianca = confianca
+        self.regex = re.compile("|".join(f"(?:{p})" for p in padroes))
+        self.palavras: Dict[str, float] = {}
+
+    def avaliar(self, texto: str, achados: Dict[str, List[int]]) -> Optional[Intencao]:
+        if self.regex.search(texto):
+            return Intencao(self.nome, self.confianca)
+        return None
+
+
+_verbos_pedido = r"quero|queria|vou querer|adiciona|adicione|acrescenta|coloca|coloque|bota|manda|me ve|me da|traz"
+_cauda_pedido = re.compile(r"\s+(?:no carrinho|pra mim|para mim|por favor|porfavor)\b.*$")
+_separador_itens = re.compile(r"\s*(?:,|\+|\be\b|\bmais\b)\s*")
+_quantidade = re.compile(
+    r"^(?:(?P<num>\d{1,2})|(?P<pal>" + "|".join(sorted(NUMEROS, key=len, reverse=True)) + r"))\s+(?P<resto>.+)$"
+)
+_artigo = re.compile(r"^(?:o|a|os|as|de|do|da|dos|das)\s+")
+
+
+def extrair_itens(texto: str) -> List[ItemPedido]:
+    """'dois x bacon e uma coca' -> [ItemPedido('x bacon', 2), ItemPedido('coca', 1)]"""
+    itens = []
+    for parte in _separador_itens.split(texto):
+        parte = _artigo.sub("", parte.strip())
+        if not parte:
+            continue
+        quantidade = 1
+        m = _quantidade.match(parte)
+        if m:
+            quantidade = int(m.group("num")) if m.group("num") else NUMEROS[m.group("pal")]
+            parte = _artigo.sub("", m.group("resto").strip())
+        if parte:
+            itens.append(ItemPedido(parte, max(quantidade, 1)))
+    return itens
+
+
+class RegraPedido:
+    """'quero dois x-bacon e uma coca' -> itens com quantidade."""
+
+    nome = "adicionar"
+    palavras: Dict[str, float] = {}
+
+    def __init__(self, confianca: float = 0.85):
+        self.confianca = confianca
+        self.regex = re.compile(rf"\b(?:{_verbos_pedido})\s+(?P<resto>.+)")
+
+    def avaliar(self, texto: str, achados: Dict[str, List[int]]) -> Optional[Intencao]:
+        m = self.regex.search(texto)
+        if not m:
+            return None
+        itens = extrair_itens(_cauda_pedido.sub("", m.group("resto")).strip())
+        if not itens:
+            return None
+        return Intencao(self.nome, self.confianca, itens)
+
+
+class MotorIntencoes:
+    def __init__(self, regras: Optional[List] = None):
+        self.regras: List = []
+        self._automato = AhoCorasick([])
+        for regra in regras or []:
+            self.registrar(regra)
+
+    def registrar(self, regra):
+        self.regras.append(regra)
+        palavras = {p for r in self.regras for p in r.palavras}
+        self._automato = AhoCorasick(palavras)
+
+    def classificar(self, texto: str) -> Intencao:
+        # A normalização some com a pontuação; a vírgula separa itens, então vira " e "
+        norm = normalizar(texto.replace(",", " e "))
+        achados: Dict[str, List[int]] = {}
+        for pos, palavra in self._automato.buscar(norm):
+            achados.setdefault(palavra, []).append(pos)
+
+        melhor = Intencao("llm", 0.0)
+        for regra in self.regras:
+            intencao = regra.avaliar(norm, achados)
+            if intencao and intencao.confianca > melhor.confianca:
+                melhor = intencao
+        if melhor.confianca < CONFIANCA_MINIMA:
+            return Intencao("llm", melhor.confianca)
+        return melhor
+
+
+_nome_re = re.compile(r"(?:meu nome é|meu nome e|sou o|sou a|aqui é o|aqui é a|me chamo)\s+([a-zA-ZÀ-ÿ\s]{3,})")
+
+def extrair_nome(texto: str) -> Optional[str]:
+    """Nome do cliente em frases como 'meu nome é João' (com acento preservado)."""
+    match = _nome_re.search(texto.lower())
+    if match:
+        return match.group(1).strip().title()
+    return None
+
+
+motor = MotorIntencoes([
+    RegraPalavrasChave("cardapio", {
+        "cardápio": 0.95, "menu": 0.9, "o que tem": 0.8, "o que voces tem": 0.85,
+        "produtos": 0.7, "lanche": 0.6, "lanches": 0.6, "hamburguer": 0.55,
+    }),
+    RegraPadrao("ver_carrinho", [
+        r"\b(?:meu|o|ver|mostra|mostrar|cade|como ta|como esta)\s+(?:carrinho|pedido)\b",
+    ], 0.9),
+    RegraPalavrasChave("ver_carrinho", {"carrinho": 0.7, "pedido": 0.65}),
+    RegraPadrao("fechar_pedido", [
+        r"\b(?:fechar|finalizar|fecha|finaliza|concluir|conclui|confirmar|confirma)\s+(?:o\s+|a\s+|meu\s+|minha\s+)?(?:pedido|carrinho|compra|conta)\b",
+        r"\bpode fechar\b",
+    ], 0.95),
+    RegraPedido(0.85),
+])
+
+def classificar(texto: str) -> Intencao:
+    return motor.classificar(texto)
@@ -0,0 +1,222 @@
+"""Fila de jobs do webhook: o POST só valida e enfileira, o processamento roda nos workers.
+
+Backends (JOBS_BACKEND):
+    memoria   workers asyncio no próprio processo web (padrão)
+    postgres  tabela jobs_webhook (SKIP LOCKED) + LISTEN/NOTIFY, consumida por `python -m app.worker`
+
+Nos dois casos as mensagens do mesmo chat são processadas uma de cada vez, em ordem.
+No Postgres, um job cujo handler levanta exceção volta pra fila depois de um
+backoff exponencial (JOBS_BACKOFF_BASE, 2x, 4x...) e vira 'erro' depois de
+JOBS_MAX_TENTATIVAS; as mensagens seguintes do mesmo chat esperam por ele.
+Erro no próprio banco não derruba o worker: ele espera JOBS_POLL_INTERVALO,
+dobrando a cada erro seguido até ESPERA_ERRO_MAX, e tenta de novo.
+"""
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, Optional
+
+from psycopg2.extras import Json
+
+from app.config import (
+    DEDUP_POSTGRES,
+    JOBS_BACKEND,
+    JOBS_WORKERS,
+    JOBS_FILA_MAX,
+    JOBS_MAX_TENTATIVAS,
+    JOBS_BACKOFF_BASE,
+    JOBS_POLL_INTERVALO,
+    JOBS_TRAVADO_APOS,
+)
+from app.utils.db import executar_db, get_conn, OuvintePostgres
+from app.utils.fila import FilaParticionada
+from app.utils.idempotencia import registrar_ids
+
+logger = logging.getLogger(__name__)
+
+CANAL_JOBS = "jobs_webhook"
+# Teto da espera de um worker depois de erros seguidos no banco
+ESPERA_ERRO_MAX = 60.0
+
+Handler = Callable[[Dict], Awaitable[Dict]]
+
+
+class FilaJobsMemoria:
+    """Workers asyncio no processo web; a chave de partição é o telefone."""
+
+    def __init__(self, handler: Handler):
+        self._fila = FilaParticionada("jobs", handler, workers=JOBS_WORKERS, maxsize=JOBS_FILA_MAX)
+
+    async def iniciar(self):
+        await self._fila.iniciar()
+
+    async def enfileirar(self, msg: Dict):
+        await self._fila.colocar(msg["telefone"], msg)
+
+    async def parar(self, timeout: float):
+        await self._fila.drenar(timeout)
+
+    def metricas(self) -> Dict:
+        return {"backend": "memoria", **self._fila.metricas()}
+
+
+def _inserir_job(msg: Dict) -> Optional[int]:
+    """Grava o job; com DEDUP_POSTGRES os ids da mensagem entram na mesma transação.
+
+    Devolve None se todos os ids já tinham sido recebidos (por outro processo).
+    """
+    with get_conn() as conn, conn.cursor() as cur:
+        ids = [i for i in msg.get("message_ids") or [msg.get("message_id")] if i]
+        if DEDUP_POSTGRES and ids and not registrar_ids(cur, ids):
+            return None
+        cur.execute("""
+            INSERT INTO jobs_webhook (chat_id, payload)
+            VALUES (%s, %s)
+            RETURNING id
+        """, (msg["telefone"], Json(msg)))
+        job_id = cur.fetchone()["id"]
+        cur.execute("SELECT pg_notify(%s, '')", (CANAL_JOBS,))
+        return job_id
+
+def _reservar_job() -> Optional[Dict]:
+    """Pega o job pendente mais antigo de um chat que não tem nada em processamento."""
+    with get_conn() as conn, conn.cursor() as cur:
+        cur.execute("""
+            UPDATE jobs_webhook j
+            SET status = 'processando', tentativas = j.tentativas + 1, iniciado_em = now()
+            WHERE j.id = (
+                SELECT p.id FROM jobs_webhook p
+                WHERE p.status = 'pendente'
+                  AND p.disponivel_em <= now()
+                  AND NOT EXISTS (
+                      SELECT 1 FROM jobs_webhook o
+                      WHERE o.chat_id = p.chat_id
+                        AND (o.status = 'processando' OR (o.status = 'pendente' AND o.id < p.id))
+                  )
+                ORDER BY p.id
+                FOR UPDATE SKIP LOCKED
+                LIMIT 1
+            )
+            RETURNING j.id, j.chat_id, j.payload, j.tentativas
+        """)
+        return cur.fetchone()
+
+def _concluir_job(job_id: int):
+    with get_conn() as conn, conn.cursor() as cur:
+        cur.execute("DELETE FROM jobs_webhook WHERE id = %s", (job_id,))
+
+def _falhar_job(job_id: int, tentativas: int, erro: str):
+    status = "erro" if tentativas >= JOBS_MAX_TENTATIVAS else "pendente"
+    espera = JOBS_BACKOFF_BASE * 2 ** (tentativas - 1)
+    with get_conn() as conn, conn.cursor() as cur:
+        cur.execute("""
+            UPDATE jobs_webhook
+            SET status = %s, erro = %s, iniciado_em = NULL,
+                disponivel_em = now() + make_interval(secs => %s)
+            WHERE id = %s
+        """, (status, erro[:1000], espera, job_id))
+
+def _liberar_travados() -> int:
+    """Devolve pra fila jobs presos em 'processando' (worker que morreu no meio)."""
+    with get_conn() as conn, conn.cursor() as cur:
+        cur.execute("""
+            UPDATE jobs_webhook SET status = 'pendente', iniciado_em = NULL
+            WHERE status = 'processando' AND iniciado_em < now() - make_interval(secs => %s)
+        """, (JOBS_TRAVADO_APOS,))
+        return cur.rowcount
+
+
+class FilaJobsPostgres:
+    """Lado do processo web: só grava o job e avisa os workers via NOTIFY."""
+
+    def __init__(self):
+        self.enfileirados = 0
+        self.duplicados = 0
+
+    async def iniciar(self):
+        pass
+
+    async def enfileirar(self, msg: Dict):
+        if await executar_db(_inserir_job, msg) is None:
+            self.duplicados += 1
+            logger.info(f"🔁 Mensagem repetida ignorada pela fila: {msg.get('message_id')}")
+            return
+        self.enfileirados += 1
+
+    async def parar(self, timeout: float):
+        pass
+
+    def metricas(self) -> Dict:
+        return {"backend": "postgres", "enfileirados": self.enfileirados, "duplicados": self.duplicados}
+
+
+class ConsumidorPostgres:
+    """Lado do worker: N coroutines reservando jobs com SKIP LOCKED, acordadas por LISTEN."""
+
+    def __init__(self, handler: Handler, workers: int = JOBS_WORKERS):
+        self.handler = handler
+        self.n_workers = workers
+        self.processados = 0
+        self.falhas = 0
+        self.erros_banco = 0
+        self._aviso: Optional[asyncio.Event] = None
+
+    async def _worker(self, parar: asyncio.Event):
+        erros_seguidos = 0
+        while not parar.is_set():
+            try:
+                await self._proximo_job()
+                erros_seguidos = 0
+            except Exception as e:
+                # Banco fora não pode matar o worker: espera um pouco mais a cada erro e tenta de novo
+                erros_seguidos += 1
+                self.erros_banco += 1
+                espera = min(JOBS_POLL_INTERVALO * 2 ** (erros_seguidos - 1), ESPERA_ERRO_MAX)
+                logger.exception(f"💥 Worker de jobs: erro no banco ({erros_seguidos} seguido(s)), de novo em {espera:.1f}s: {e}")
+                try:
+                    await asyncio.wait_for(parar.wait(), espera)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def _proximo_job(self):
+        job = await executar_db(_reservar_job)
+        if job is None:
+            self._aviso.clear()
+            try:
+                await asyncio.wait_for(self._aviso.wait(), JOBS_POLL_INTERVALO)
+            except asyncio.TimeoutError:
+                await executar_db(_liberar_travados)
+            return
+        try:
+            await self.handler({**job["payload"], "tentativas_restantes": JOBS_MAX_TENTATIVAS - job["tentativas"]})
+        except Exception as e:
+            self.falhas += 1
+            logger.exception(f"Job {job['id']} falhou (tentativa {job['tentativas']}/{JOBS_MAX_TENTATIVAS}): {e}")
+            # Se isso falhar também, o job fica 'processando' e _liberar_travados devolve depois
+            await executar_db(_falhar_job, job["id"], job["tentativas"], str(e))
+            return
+        self.processados += 1
+        await executar_db(_concluir_job, job["id"])
+
+    async def rodar(self, parar: asyncio.Event):
+        """Processa até `parar` ser setado; os jobs em andamento terminam antes de retornar."""
+        self._aviso = asyncio.Event()
+        ouvinte = OuvintePostgres(CANAL_JOBS, self._aviso.set)
+        ouvinte.iniciar()
+        workers = [asyncio.create_task(self._worker(parar)) for _ in range(self.n_workers)]
+        await parar.wait()
+        # Acorda quem está esperando aviso pra que veja o `parar`
+        self._aviso.set()
+        await asyncio.gather(*workers, return_exceptions=True)
+        await asyncio.to_thread(ouvinte.parar)
+
+    def metricas(self) -> Dict:
+        return {"backend": "postgres", "workers": self.n_workers, "processados": self.processados,
+                "falhas": self.falhas, "erros_banco": self.erros_banco}
+
+
+def criar_fila_jobs(handler: Handler):
+    if JOBS_BACKEND == "postgres":
+        return FilaJobsPostgres()
+    if JOBS_BACKEND != "memoria":
+        logger.warning(f"JOBS_BACKEND desconhecido ({JOBS_BACKEND}), usando memória")
+    return FilaJobsMemoria(handler)
@@ -0,0 +1,183 @@
+"""Limite de quantas mensagens vão pra IA, por telefone e no total (token bucket).
+
+Cada telefone tem um balde de LIMITE_TELEFONE_CAPACIDADE fichas que enche
+LIMITE_TELEFONE_POR_MINUTO fichas por minuto; o serviço inteiro tem outro
+balde (LIMITE_GLOBAL_*). Cada resposta da IA gasta uma ficha de cada.
+
+Com LIMITE_BACKEND=postgres os baldes ficam na tabela limites_fichas e valem
+entre vários workers; em caso de erro no banco a mensagem passa. Capacidade e
+taxa são lidas a cada mensagem, então um ajuste (app/utils/ajustes.py) vale na hora.
+"""
+import logging
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+from app.config import LIMITE_BACKEND, LIMITE_MAX_TELEFONES, config
+from app.utils.db import executar_db, get_conn
+
+logger = logging.getLogger(__name__)
+
+CHAVE_GLOBAL = "__global__"
+
+
+class Balde:
+    __slots__ = ("fichas", "atualizado_em")
+
+    def __init__(self, capacidade: float):
+        self.fichas = capacidade
+        self.atualizado_em = time.monotonic()
+
+    def _encher(self, agora: float, capacidade: float, por_minuto: float):
+        self.fichas = min(capacidade, self.fichas + (agora - self.atualizado_em) * por_minuto / 60)
+        self.atualizado_em = agora
+
+    def disponivel(self, agora: float, capacidade: float, por_minuto: float) -> bool:
+        self._encher(agora, capacidade, por_minuto)
+        return self.fichas >= 1
+
+    def gastar(self):
+        self.fichas -= 1
+
+
+class LimitadorMemoria:
+    def __init__(self):
+        self._telefones: "OrderedDict[str, Balde]" = OrderedDict()
+        self._global = Balde(config.LIMITE_GLOBAL_CAPACIDADE)
+
+    def _balde(self, telefone: str) -> Balde:
+        balde = self._telefones.get(telefone)
+        if balde is None:
+            balde = self._telefones[telefone] = Balde(config.LIMITE_TELEFONE_CAPACIDADE)
+            while len(self._telefones) > LIMITE_MAX_TELEFONES:
+                self._telefones.popitem(last=False)
+        self._telefones.move_to_end(telefone)
+        return balde
+
+    async def verificar(self, telefone: str) -> Optional[str]:
+        agora = time.monotonic()
+        balde = self._balde(telefone)
+        if not balde.disponivel(agora, config.LIMITE_TELEFONE_CAPACIDADE, config.LIMITE_TELEFONE_POR_MINUTO):
+            return "telefone"
+        if not self._global.disponivel(agora, config.LIMITE_GLOBAL_CAPACIDADE, config.LIMITE_GLOBAL_POR_MINUTO):
+            return "global"
+        balde.gastar()
+        self._global.gastar()
+        return None
+
+    def estado(self) -> Dict:
+        self._global.disponivel(time.monotonic(), config.LIMITE_GLOBAL_CAPACIDADE, config.LIMITE_GLOBAL_POR_MINUTO)
+        return {
+            "telefones_rastreados": len(self._telefones),
+            "fichas_globais": round(self._global.fichas, 2),
+        }
+
+
+# Enche o balde pelo tempo desde a última atualização e gasta uma ficha, numa
+# instrução só; sem linha devolvida = balde vazio
+_GASTAR_FICHA = """
+    INSERT INTO limites_fichas AS l (chave, fichas, atualizado_em)
+    VALUES (%(chave)s, %(capacidade)s - 1, clock_timestamp())
+    ON CONFLICT (chave) DO UPDATE SET
+        fichas = LEAST(%(capacidade)s, l.fichas + EXTRACT(EPOCH FROM clock_timestamp() - l.atualizado_em) * %(por_segundo)s) - 1,
+        atualizado_em = clock_timestamp()
+    WHERE LEAST(%(capacidade)s, l.fichas + EXTRACT(EPOCH FROM clock_timestamp() - l.atualizado_em) * %(por_segundo)s) >= 1
+    RETURNING fichas
+"""
+
+def _gastar_fichas_no_banco(telefone: str) -> Optional[str]:
+    with get_conn() as conn, conn.cursor() as cur:
+        cur.execute(_GASTAR_FICHA, {
+            "chave": telefone,
+            "capacidade": config.LIMITE_TELEFONE_CAPACIDADE,
+            "por_segundo": config.LIMITE_TELEFONE_POR_MINUTO / 60,
+        })
+        if cur.fetchone() is None:
+            return "telefone"
+        cur.execute(_GASTAR_FICHA, {
+            "chave": CHAVE_GLOBAL,
+            "capacidade": config.LIMITE_GLOBAL_CAPACIDADE,
+            "por_segundo": config.LIMITE_GLOBAL_POR_MINUTO / 60,
+        })
+        if cur.fetchone() is None:
+            # Devolve a ficha do telefone: a mensagem não vai pra IA
+            conn.rollback()
+            return "global"
+        return None
+
+def _fichas_globais_no_banco() -> Optional[float]:
+    with get_conn() as conn, conn.cursor() as cur:
+        cur.execute("""
+            SELECT LEAST(%s, fichas + EXTRACT(EPOCH FROM clock_timestamp() - atualizado_em) * %s) AS fichas
+            FROM limites_fichas WHERE chave = %s
+        """, (config.LIMITE_GLOBAL_CAPACIDADE, config.LIMITE_GLOBAL_POR_MINUTO / 60, CHAVE_GLOBAL))
+        row = cur.fetchone()
+        return float(row["fichas"]) if row else None
+
+def limpar_fichas_antigas() -> int:
+    """Apaga baldes de telefone que já estariam cheios de novo (não guardam informação nenhuma)."""
+    cheio_apos = config.LIMITE_TELEFONE_CAPACIDADE / (config.LIMITE_TELEFONE_POR_MINUTO / 60)
+    with get_conn() as conn, conn.cursor() as cur:
+        cur.execute("""
+            DELETE FROM limites_fichas
+            WHERE chave <> %s AND atualizado_em < now() - make_interval(secs => %s)
+        """, (CHAVE_GLOBAL, cheio_apos))
+        return cur.rowcount
+
+
+class LimitadorPostgres:
+    def __init__(self):
+        self.erros_banco = 0
+
+    async def verificar(self, telefone: str) -> Optional[str]:
+        try:
+            return await executar_db(_gastar_fichas_no_banco, telefone)
+        except Exception as e:
+            self.erros_banco += 1
+            logger.error(f"Falha ao consultar limite de {telefone}: {e}")
+            return None
+
+    def estado(self) -> Dict:
+        return {"erros_banco": self.erros_banco}
+
+
+class Limites:
+    def __init__(self, backend: str):
+        self.backend = backend
+        self._limitador = LimitadorPostgres() if backend == "postgres" else LimitadorMemoria()
+        self.permitidas = 0
+        self.negadas = {"telefone": 0, "global": 0}
+
+    async def verificar(self, telefone: str) -> Optional[str]:
+        """None se a mensagem pode ir pra IA; senão o motivo ("telefone" ou "global")."""
+        motivo = await self._limitador.verificar(telefone)
+        if motivo:
+            self.negadas[motivo] += 1
+        else:
+            self.permitidas += 1
+        return motivo
+
+    async def metricas(self) -> Dict:
+        estado = self._limitador.estado()
+        if self.backend == "postgres":
+            try:
+                estado["fichas_globais"] = await executar_db(_fichas_globais_no_banco)
+            except Exception as e:
+                logger.error(f"Falha ao ler fichas globais: {e}")
+        return {
+            "backend": self.backend,
+            "permitidas": self.permitidas,
+            "negadas": dict(self.negadas),
+            "telefone": {"capacidade": config.LIMITE_TELEFONE_CAPACIDADE, "por_minuto": config.LIMITE_TELEFONE_POR_MINUTO},
+            "global": {"capacidade": config.LIMITE_GLOBAL_CAPACIDADE, "por_minuto": config.LIMITE_GLOBAL_POR_MINUTO},
+            **estado,
+        }
+
+
+limites = Limites(LIMITE_BACKEND)
+
+async def verificar_limite(telefone: str) -> Optional[str]:
+    return await limites.verificar(telefone)
+
+async def metricas_limites() -> Dict:
+    return await limites.metricas()
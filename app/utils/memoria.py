@@ -0,0 +1,206 @@
+"""Memória de conversa por chat, pra IA saber o que já foi dito.
+
+Cada chat guarda só os últimos MEMORIA_MAX_TURNOS turnos (ring buffer); o que
+sai do buffer vira um resumo curto, sem chamar a IA. O total de chats em
+memória é limitado por LRU, então o consumo fica em torno de
+MEMORIA_MAX_CONVERSAS x (turnos + resumo). Com MEMORIA_POSTGRES=true os turnos
+também são gravados na tabela conversas_turnos e recarregados quando o chat
+não está em memória (outro worker, restart).
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+from app.config import (
+    MEMORIA_MAX_CONVERSAS,
+    MEMORIA_MAX_TURNOS,
+    MEMORIA_MAX_CHARS_RESUMO,
+    MEMORIA_MAX_CHARS_TURNO,
+    MEMORIA_TOKENS_HISTORICO,
+    MEMORIA_POSTGRES,
+)
+from app.utils.db import executar_db, get_conn
+
+logger = logging.getLogger(__name__)
+
+_ROTULOS = {"user": "Cliente", "assistant": "Atendente"}
+
+
+def estimar_tokens(texto: str) -> int:
+    """Estimativa barata (~4 caracteres por token em português) + overhead da mensagem."""
+    return len(texto) // 4 + 4
+
+
+class Conversa:
+    __slots__ = ("turnos", "resumo", "atualizada_em")
+
+    def __init__(self, max_turnos: int):
+        self.turnos: Deque[Tuple[str, str]] = deque(maxlen=max_turnos)
+        self.resumo = ""
+        self.atualizada_em = time.time()
+
+    def tamanho_chars(self) -> int:
+        return len(self.resumo) + sum(len(texto) for _, texto in self.turnos)
+
+
+class MemoriaConversas:
+    def __init__(self, max_conversas: int, max_turnos: int, max_chars_resumo: int):
+        self.max_conversas = max_conversas
+        self.max_turnos = max_turnos
+        self.max_chars_resumo = max_chars_resumo
+        self._conversas: "OrderedDict[str, Conversa]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.descartadas = 0
+        self.resumidas = 0
+
+    def _resumir(self, conversa: Conversa, papel: str, texto: str):
+        """Joga o turno mais antigo no resumo, mantendo só o final dele."""
+        trecho = f"{_ROTULOS.get(papel, papel)}: {texto.strip()}"
+        resumo = f"{conversa.resumo} | {trecho}" if conversa.resumo else trecho
+        if len(resumo) > self.max_chars_resumo:
+            resumo = "…" + resumo[-(self.max_chars_resumo - 1):]
+        conversa.resumo = resumo
+        self.resumidas += 1
+
+    def tem(self, chat_id: str) -> bool:
+        with self._lock:
+            return chat_id in self._conversas
+
+    def _obter(self, chat_id: str) -> Conversa:
+        conversa = self._conversas.get(chat_id)
+        if conversa is None:
+            conversa = self._conversas[chat_id] = Conversa(self.max_turnos)
+            while len(self._conversas) > self.max_conversas:
+                self._conversas.popitem(last=False)
+                self.descartadas += 1
+        self._conversas.move_to_end(chat_id)
+        return conversa
+
+    def registrar(self, chat_id: str, papel: str, texto: str, em: Optional[float] = None):
+        """`em` é o horário do turno (epoch) quando ele vem do banco; senão, agora."""
+        with self._lock:
+            conversa = self._obter(chat_id)
+            if len(conversa.turnos) == conversa.turnos.maxlen:
+                self._resumir(conversa, *conversa.turnos[0])
+            conversa.turnos.append((papel, texto))
+            conversa.atualizada_em = time.time() if em is None else em
+
+    def segundos_desde_ultimo_turno(self, chat_id: str) -> Optional[float]:
+        """None se a conversa não existe (ou não tem turno nenhum)."""
+        with self._lock:
+            conversa = self._conversas.get(chat_id)
+            if conversa is None or not conversa.turnos:
+                return None
+            return time.time() - conversa.atualizada_em
+
+    def historico(self, chat_id: str, orcamento_tokens: int) -> List[Dict]:
+        """Mensagens no formato da API de chat: resumo (se couber) + turnos mais recentes que cabem no orçamento."""
+        with self._lock:
+            conversa = self._conversas.get(chat_id)
+            if conversa is None:
+                return []
+            self._conversas.move_to_end(chat_id)
+            turnos = list(conversa.turnos)
+            resumo = conversa.resumo
+
+        mensagens: List[Dict] = []
+        restante = orcamento_tokens
+        for papel, texto in reversed(turnos):
+            custo = estimar_tokens(texto)
+            if custo > restante:
+                break
+            mensagens.append({"role": papel, "content": texto})
+            restante -= custo
+        mensagens.reverse()
+
+        if resumo:
+            conteudo = f"Resumo do começo da conversa: {resumo}"
+            if estimar_tokens(conteudo) <= restante:
+                mensagens.insert(0, {"role": "system", "content": conteudo})
+        return mensagens
+
+    def metricas(self) -> Dict:
+        with self._lock:
+            chars = sum(c.tamanho_chars() for c in self._conversas.values())
+            turnos = sum(len(c.turnos) for c in self._conversas.values())
+            n = len(self._conversas)
+        return {
+            "conversas": n,
+            "max_conversas": self.max_conversas,
+            "turnos": turnos,
+            "chars_texto": chars,
+            "chars_medio_por_conversa": round(chars / n, 1) if n else 0.0,
+            "conversas_descartadas": self.descartadas,
+            "turnos_resumidos": self.resumidas,
+            "postgres": MEMORIA_POSTGRES,
+        }
+
+
+memoria = MemoriaConversas(MEMORIA_MAX_CONVERSAS, MEMORIA_MAX_TURNOS, MEMORIA_MAX_CHARS_RESUMO)
+
+
+def _gravar_turno(chat_id: str, papel: str, texto: str):
+    with get_conn() as conn, conn.cursor() as cur:
+        cur.execute("""
+            INSERT INTO conversas_turnos (chat_id, papel, conteudo)
+            VALUES (%s, %s, %s)
+        """, (chat_id, papel, texto))
+
+def _carregar_turnos(chat_id: str, limite: int) -> List[Dict]:
+    with get_conn() as conn, conn.cursor() as cur:
+        cur.execute("""
+            SELECT papel, conteudo, criado_em FROM (
+                SELECT id, papel, conteudo, criado_em
+                FROM conversas_turnos
+                WHERE chat_id = %s
+                ORDER BY id DESC
+                LIMIT %s
+            ) t
+            ORDER BY id
+        """, (chat_id, limite))
+        return cur.fetchall()
+
+def _cortar(texto: str) -> str:
+    """Um turno enorme (cardápio colado, spam) não pode ocupar o buffer nem a tabela."""
+    if len(texto) <= MEMORIA_MAX_CHARS_TURNO:
+        return texto
+    return texto[:MEMORIA_MAX_CHARS_TURNO - 1] + "…"
+
+async def _garantir_carregada(chat_id: str):
+    """Traz a conversa do banco antes do primeiro uso dela neste processo (restart, LRU, outro worker).
+
+    Tem que rodar antes de qualquer `memoria.registrar`: depois que a conversa
+    existe em memória, o que está no banco não é mais lido.
+    """
+    if not MEMORIA_POSTGRES or memoria.tem(chat_id):
+        return
+    try:
+        # Traz um pouco além do buffer pra que os mais antigos já entrem no resumo
+        linhas = await executar_db(_carregar_turnos, chat_id, memoria.max_turnos * 2)
+    except Exception as e:
+        logger.error(f"Falha ao carregar conversa {chat_id} do banco: {e}")
+        return
+    # Outra tarefa pode ter carregado enquanto esta esperava o banco
+    if memoria.tem(chat_id):
+        return
+    for row in linhas:
+        memoria.registrar(chat_id, row["papel"], row["conteudo"], row["criado_em"].timestamp())
+
+async def registrar_turno(chat_id: str, papel: str, texto: str):
+    texto = _cortar(texto)
+    await _garantir_carregada(chat_id)
+    memoria.registrar(chat_id, papel, texto)
+    if MEMORIA_POSTGRES:
+        try:
+            await executar_db(_gravar_turno, chat_id, papel, texto)
+        except Exception as e:
+            logger.error(f"Falha ao gravar turno da conversa {chat_id}: {e}")
+
+async def obter_historico(chat_id: str, orcamento_tokens: int = MEMORIA_TOKENS_HISTORICO) -> List[Dict]:
+    await _garantir_carregada(chat_id)
+    return memoria.historico(chat_id, orcamento_tokens)
+
+def metricas_memoria() -> Dict:
+    return memoria.metricas()
@@ -1,5 +1,21 @@
-"""Funções para aplicar estilo de fala nordestina às respostas."""
+"""Funções para aplicar estilo de fala nordestina às respostas.
+
+Todas as substituições viram uma regex só (alternação de grupos nomeados), e o
+grupo que casou diz qual troca aplicar, então o texto é varrido uma vez. A
+caixa da palavra original é mantida ("Você" -> "Tu", "VOCÊ" -> "TU").
+
+Dicionários regionais extras podem ser carregados de arquivos JSON
+({"palavra ou expressão": "troca"}), listados em NORDESTE_DICIONARIOS.
+Para texto que chega aos pedaços (streaming da IA) use `TransformadorStream`.
+"""
+import json
+import logging
 import re, random
+from typing import AsyncIterator, Dict, Iterable, List, Tuple
+
+from app.config import NORDESTE_DICIONARIOS
+
+logger = logging.getLogger(__name__)
 
 EXPRESSOES_FINAIS = [
     "Oxente, visse?",
@@ -21,11 +37,130 @@ _SUBSTS = [
     (r"\bsim\b", "oxente, sim"),
     (r"\bnão\b", "num"),
 ]
+_espacos = re.compile(r"\s+")
+
+
+def _ajustar_caixa(original: str, troca: str) -> str:
+    if len(original) > 1 and original.isupper():
+        return troca.upper()
+    if original[:1].isupper():
+        return troca[:1].upper() + troca[1:]
+    return troca
+
+def carregar_dicionario(caminho: str) -> List[Tuple[str, str]]:
+    """Lê um JSON {"expressão": "troca"}; as chaves são texto literal, casadas como palavra inteira."""
+    with open(caminho, encoding="utf-8") as f:
+        dados = json.load(f)
+    return [(r"\b" + re.escape(chave.lower()) + r"\b", troca) for chave, troca in dados.items()]
+
+
+class TransformadorNordestino:
+    def __init__(self, substituicoes: Iterable[Tuple[str, str]]):
+        self._trocas: Dict[str, str] = {}
+        partes = []
+        iniciais = set()
+        self.max_palavras = 1
+        # Expressões mais longas primeiro, pra "muito obrigado" ganhar de "muito"
+        ordenadas = sorted(substituicoes, key=lambda s: len(s[0]), reverse=True)
+        for i, (padrao, troca) in enumerate(ordenadas):
+            if not padrao.startswith(r"\b"):
+                raise ValueError(f"Substituição precisa começar em limite de palavra (\\b): {padrao}")
+            corpo = padrao[2:]
+            grupo = f"s{i}"
+            self._trocas[grupo] = troca
+            partes.append(f"(?P<{grupo}>{corpo})")
+            iniciais.add(corpo[:1] if corpo[:1].isalnum() else None)
+            self.max_palavras = max(self.max_palavras, len(padrao.replace(r"\ ", " ").split()))
+        # O \b comum e a primeira letra vão pra frente da alternação: nas posições
+        # que não podem casar, o motor desiste sem testar cada padrão
+        prefixo = r"\b"
+        if iniciais and None not in iniciais:
+            letras = {c for ini in iniciais for c in (ini.lower(), ini.upper())}
+            prefixo += "(?=[" + re.escape("".join(sorted(letras))) + "])"
+        self.regex = re.compile(prefixo + "(?:" + "|".join(partes) + ")" if partes else r"(?!)", re.IGNORECASE)
+
+    def _trocar(self, m: "re.Match") -> str:
+        return _ajustar_caixa(m.group(), self._trocas[m.lastgroup])
+
+    def transformar(self, texto: str) -> str:
+        return self.regex.sub(self._trocar, texto)
+
+    def stream(self) -> "TransformadorStream":
+        return TransformadorStream(self)
+
+
+class TransformadorStream:
+    """Transforma texto que chega aos pedaços, segurando só o fim que ainda pode casar.
+
+    Fica retido o trecho das últimas `max_palavras` palavras (a última pode estar
+    pela metade); o resto já sai transformado, igual ao que sairia no texto inteiro.
+    """
+
+    def __init__(self, transformador: TransformadorNordestino):
+        self._t = transformador
+        self._buffer = ""
+        self._inicio = True
+
+    def _corte_seguro(self) -> int:
+        limites = [m.end() for m in _espacos.finditer(self._buffer)]
+        if len(limites) < self._t.max_palavras:
+            return 0
+        return limites[-self._t.max_palavras]
+
+    def alimentar(self, pedaco: str) -> str:
+        self._buffer += pedaco
+        if self._inicio:
+            self._buffer = self._buffer.lstrip()
+        corte = self._corte_seguro()
+        if not corte:
+            return ""
+        saida = []
+        pos = 0
+        for m in self._t.regex.finditer(self._buffer):
+            if m.start() >= corte:
+                break
+            saida.append(self._buffer[pos:m.start()])
+            saida.append(self._t._trocar(m))
+            pos = m.end()
+        fim = max(pos, corte)
+        saida.append(self._buffer[pos:fim])
+        self._buffer = self._buffer[fim:]
+        self._inicio = False
+        return "".join(saida)
+
+    def finalizar(self) -> str:
+        resto = self._t.transformar(self._buffer).rstrip()
+        self._buffer = ""
+        return resto
+
+
+def _substituicoes_padrao() -> List[Tuple[str, str]]:
+    substs = list(_SUBSTS)
+    for caminho in NORDESTE_DICIONARIOS:
+        try:
+            substs.extend(carregar_dicionario(caminho))
+        except (OSError, ValueError) as e:
+            logger.error(f"Não consegui carregar o dicionário regional {caminho}: {e}")
+    return substs
+
+transformador = TransformadorNordestino(_substituicoes_padrao())
+
+
 def nordestinizar(texto: str, add_tail: bool = True) -> str:
-    t = texto
-    for padrao, substi in _SUBSTS:
-        t = re.sub(padrao, substi, t, flags=re.IGNORECASE)
-    t = t.strip()
+    t = transformador.transformar(texto).strip()
     if add_tail:
         t += " " + random.choice(EXPRESSOES_FINAIS)
     return t
+
+async def nordestinizar_stream(pedacos: AsyncIterator[str], add_tail: bool = True) -> AsyncIterator[str]:
+    """Versão streaming de `nordestinizar`: vai devolvendo o texto transformado sem esperar o fim."""
+    s = transformador.stream()
+    async for pedaco in pedacos:
+        saida = s.alimentar(pedaco)
+        if saida:
+            yield saida
+    resto = s.finalizar()
+    if resto:
+        yield resto
+    if add_tail:
+        yield " " + random.choice(EXPRESSOES_FINAIS)
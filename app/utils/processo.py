@@ -0,0 +1,41 @@
+"""Informações do processo (worker) atual: memória e tempo de inicialização."""
+import os
+import resource
+import time
+from typing import Dict
+
+# Marcado na primeira importação, que acontece no começo do carregamento do app
+_importado_em = time.perf_counter()
+_tempos: Dict[str, float] = {}
+
+
+def memoria_rss_mb() -> float:
+    """RSS atual lido do /proc; fora do Linux, o pico (ru_maxrss) do processo."""
+    try:
+        with open("/proc/self/status") as f:
+            for linha in f:
+                if linha.startswith("VmRSS:"):
+                    return int(linha.split()[1]) / 1024
+    except OSError:
+        pass
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return pico / (1024 * 1024) if os.uname().sysname == "Darwin" else pico / 1024
+
+def marcar(etapa: str):
+    """Guarda quantos ms se passaram desde o início do carregamento até `etapa`."""
+    _tempos[etapa] = round((time.perf_counter() - _importado_em) * 1000, 1)
+
+def relatorio_inicializacao() -> str:
+    """'importado 420ms → config +1ms → pool +35ms ...': quanto cada etapa da subida levou."""
+    partes, anterior = [], None
+    for etapa, ms in _tempos.items():
+        partes.append(f"{etapa} {ms:.0f}ms" if anterior is None else f"{etapa} +{ms - anterior:.0f}ms")
+        anterior = ms
+    return " → ".join(partes)
+
+def metricas_processo() -> Dict:
+    return {
+        "pid": os.getpid(),
+        "rss_mb": round(memoria_rss_mb(), 1),
+        "inicializacao_ms": dict(_tempos),
+    }
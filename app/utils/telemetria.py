@@ -0,0 +1,162 @@
+"""Tempo gasto em cada etapa do atendimento, agregado em histogramas na memória.
+
+    with medir("intencao"):
+        ...
+
+Cada etapa vira uma série `bot_etapa_duracao_segundos{etapa="..."}` no
+/metrics (formato Prometheus). Com METRICAS_AMOSTRAGEM < 1 só essa fração das
+medições é registrada: o custo de uma medição descartada é um random().
+"""
+import random
+import threading
+import time
+from bisect import bisect_left
+from typing import Dict, List, Optional, Tuple
+
+from app.config import METRICAS_AMOSTRAGEM, config
+
+# Limites dos buckets, em segundos (de 1ms a 30s)
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Histograma:
+    __slots__ = ("contagens", "soma", "total")
+
+    def __init__(self):
+        self.contagens = [0] * (len(BUCKETS) + 1)
+        self.soma = 0.0
+        self.total = 0
+
+    def observar(self, segundos: float):
+        self.contagens[bisect_left(BUCKETS, segundos)] += 1
+        self.soma += segundos
+        self.total += 1
+
+    def percentil(self, p: float) -> float:
+        """Aproximado pelo limite superior do bucket (o último bucket usa 30s)."""
+        if not self.total:
+            return 0.0
+        alvo = p * self.total
+        acumulado = 0
+        for i, n in enumerate(self.contagens):
+            acumulado += n
+            if acumulado >= alvo:
+                return BUCKETS[min(i, len(BUCKETS) - 1)]
+        return BUCKETS[-1]
+
+
+class _Medicao:
+    __slots__ = ("_telemetria", "_etapa", "_inicio")
+
+    def __init__(self, telemetria: "Telemetria", etapa: str):
+        self._telemetria = telemetria
+        self._etapa = etapa
+
+    def __enter__(self):
+        self._inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._telemetria.observar(self._etapa, time.perf_counter() - self._inicio)
+        return False
+
+
+class _NaoMedir:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NAO_MEDIR = _NaoMedir()
+
+
+class Telemetria:
+    def __init__(self, amostragem: float):
+        self.amostragem = amostragem
+        self._etapas: Dict[str, Histograma] = {}
+        self._lock = threading.Lock()
+
+    def amostrar(self) -> bool:
+        return self.amostragem >= 1.0 or random.random() < self.amostragem
+
+    def observar(self, etapa: str, segundos: float):
+        # Chamado também das threads do banco
+        with self._lock:
+            hist = self._etapas.get(etapa)
+            if hist is None:
+                hist = self._etapas[etapa] = Histograma()
+            hist.observar(segundos)
+
+    def medir(self, etapa: str):
+        if self.amostragem < 1.0 and random.random() >= self.amostragem:
+            return _NAO_MEDIR
+        return _Medicao(self, etapa)
+
+    def copia(self) -> List[Tuple[str, List[int], float, int]]:
+        with self._lock:
+            return [(etapa, list(h.contagens), h.soma, h.total) for etapa, h in sorted(self._etapas.items())]
+
+    def resumo(self) -> Dict[str, Dict]:
+        with self._lock:
+            return {
+                etapa: {
+                    "n": h.total,
+                    "media_ms": round(h.soma / h.total * 1000, 3) if h.total else 0.0,
+                    "p50_ms": h.percentil(0.5) * 1000,
+                    "p95_ms": h.percentil(0.95) * 1000,
+                    "p99_ms": h.percentil(0.99) * 1000,
+                }
+                for etapa, h in sorted(self._etapas.items())
+            }
+
+    def limpar(self):
+        with self._lock:
+            self._etapas.clear()
+
+
+telemetria = Telemetria(METRICAS_AMOSTRAGEM)
+config.ao_mudar(("METRICAS_AMOSTRAGEM",), lambda: setattr(telemetria, "amostragem", config.METRICAS_AMOSTRAGEM))
+
+def medir(etapa: str):
+    return telemetria.medir(etapa)
+
+def observar(etapa: str, segundos: float):
+    telemetria.observar(etapa, segundos)
+
+def amostrar() -> bool:
+    return telemetria.amostrar()
+
+
+def _nome_prometheus(partes: List[str]) -> str:
+    return "_".join(p.replace("-", "_").replace(".", "_") for p in partes).lower()
+
+def _achatar(prefixo: List[str], valor, linhas: List[str]):
+    """Dicionários de métricas (pool, jobs, caches...) viram gauges `bot_<grupo>_<chave>`."""
+    if isinstance(valor, dict):
+        for chave, v in valor.items():
+            _achatar(prefixo + [str(chave)], v, linhas)
+    elif isinstance(valor, bool):
+        linhas.append(f"{_nome_prometheus(prefixo)} {int(valor)}")
+    elif isinstance(valor, (int, float)):
+        linhas.append(f"{_nome_prometheus(prefixo)} {valor}")
+
+def formato_prometheus(grupos: Optional[Dict[str, Dict]] = None) -> str:
+    linhas = [
+        "# HELP bot_etapa_duracao_segundos Tempo gasto em cada etapa do atendimento.",
+        "# TYPE bot_etapa_duracao_segundos histogram",
+    ]
+    for etapa, contagens, soma, total in telemetria.copia():
+        acumulado = 0
+        for limite, n in zip(BUCKETS, contagens):
+            acumulado += n
+            linhas.append(f'bot_etapa_duracao_segundos_bucket{{etapa="{etapa}",le="{limite}"}} {acumulado}')
+        linhas.append(f'bot_etapa_duracao_segundos_bucket{{etapa="{etapa}",le="+Inf"}} {total}')
+        linhas.append(f'bot_etapa_duracao_segundos_sum{{etapa="{etapa}"}} {soma:.6f}')
+        linhas.append(f'bot_etapa_duracao_segundos_count{{etapa="{etapa}"}} {total}')
+    linhas.append(f"bot_metricas_amostragem {telemetria.amostragem}")
+    for grupo, valores in (grupos or {}).items():
+        _achatar(["bot", grupo], valores, linhas)
+    return "\n".join(linhas) + "\n"
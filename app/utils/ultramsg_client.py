@@ -1,16 +1,127 @@
+import asyncio
+import logging
+import random
+import time
 import httpx
-from app.config import ULTRAMSG_BASE_URL, ULTRAMSG_INSTANCE_ID, ULTRAMSG_TOKEN
+from typing import Dict, Optional
+from app.config import (
+    ULTRAMSG_BASE_URL,
+    ULTRAMSG_INSTANCE_ID,
+    ULTRAMSG_TOKEN,
+    ULTRAMSG_WORKERS,
+    ULTRAMSG_FILA_MAX,
+    config,
+)
+from app.utils.fila import FilaParticionada
+from app.utils.telemetria import medir, observar
+
+logger = logging.getLogger(__name__)
+
+_client: Optional[httpx.AsyncClient] = None
+
+_metricas = {
+    "enviadas": 0,
+    "falhas": 0,
+    "retries": 0,
+    "latencia_total_ms": 0.0,
+    "latencia_max_ms": 0.0,
+}
+
+
+class ErroUltraMsg(Exception):
+    pass
+
+
+def _timeout() -> httpx.Timeout:
+    return httpx.Timeout(config.ULTRAMSG_TIMEOUT, connect=5.0)
 
 def ultramsg_url(path: str) -> str:
     return f"{ULTRAMSG_BASE_URL}/{ULTRAMSG_INSTANCE_ID}{path}"
 
-async def enviar_mensagem(telefone: str, texto: str):
-    async with httpx.AsyncClient() as cli:
-        resp = await cli.post(
-        ultramsg_url(f"/messages/chat?token={ULTRAMSG_TOKEN}"),
-        data={
-              "to": telefone,
-             "body": texto,
-    },
-    timeout=60,
-)
+async def iniciar_cliente_ultramsg() -> httpx.AsyncClient:
+    global _client
+    if _client is None:
+        _client = httpx.AsyncClient(
+            timeout=_timeout(),
+            limits=httpx.Limits(max_connections=ULTRAMSG_WORKERS * 2, max_keepalive_connections=ULTRAMSG_WORKERS * 2),
+        )
+    await _fila.iniciar()
+    return _client
+
+async def aquecer_cliente_ultramsg():
+    """Abre a conexão com a UltraMsg antes do primeiro envio (consulta o status da instância)."""
+    cli = await iniciar_cliente_ultramsg()
+    try:
+        resp = await cli.get(ultramsg_url("/instance/status"), params={"token": ULTRAMSG_TOKEN})
+        logger.info(f"Conexão com a UltraMsg aquecida (HTTP {resp.status_code})")
+    except httpx.HTTPError as e:
+        logger.warning(f"Não consegui aquecer a conexão com a UltraMsg: {e}")
+
+async def fechar_cliente_ultramsg(timeout: float = 10):
+    """Entrega o que ainda está na fila (até `timeout`) e fecha o cliente."""
+    global _client
+    await _fila.drenar(timeout)
+    cli, _client = _client, None
+    if cli is not None:
+        await cli.aclose()
+
+async def enviar_mensagem(telefone: str, texto: str) -> Dict:
+    """Envia direto (sem fila), com retry e backoff em 5xx/timeouts."""
+    cli = _client or await iniciar_cliente_ultramsg()
+    tentativas = config.ULTRAMSG_MAX_TENTATIVAS
+    for tentativa in range(tentativas):
+        ultima = tentativa == tentativas - 1
+        try:
+            resp = await cli.post(
+                ultramsg_url(f"/messages/chat?token={ULTRAMSG_TOKEN}"),
+                data={
+                    "to": telefone,
+                    "body": texto,
+                },
+                timeout=_timeout(),
+            )
+        except httpx.TransportError as e:
+            if ultima:
+                raise ErroUltraMsg(f"Falha de conexão com UltraMsg: {e}") from e
+        else:
+            if resp.status_code < 500 or ultima:
+                if resp.is_error:
+                    raise ErroUltraMsg(f"UltraMsg respondeu {resp.status_code}: {resp.text}")
+                dados = resp.json()
+                # A UltraMsg responde 200 com {"error": ...} quando recusa o envio
+                if isinstance(dados, dict) and dados.get("error"):
+                    raise ErroUltraMsg(f"UltraMsg recusou o envio: {dados['error']}")
+                return dados
+        _metricas["retries"] += 1
+        await asyncio.sleep(min(8.0, 0.5 * (2 ** tentativa)) * random.uniform(0.5, 1.0))
+    raise ErroUltraMsg("UltraMsg sem resposta")
+
+
+async def _entregar(item):
+    telefone, texto, criado_em = item
+    observar("ultramsg_fila", time.perf_counter() - criado_em)
+    try:
+        with medir("ultramsg_envio"):
+            await enviar_mensagem(telefone, texto)
+    except Exception:
+        _metricas["falhas"] += 1
+        raise
+    latencia = (time.perf_counter() - criado_em) * 1000
+    _metricas["enviadas"] += 1
+    _metricas["latencia_total_ms"] += latencia
+    _metricas["latencia_max_ms"] = max(_metricas["latencia_max_ms"], latencia)
+
+# Um worker por partição: mensagens pro mesmo telefone saem na ordem em que entraram
+_fila = FilaParticionada("ultramsg", _entregar, workers=ULTRAMSG_WORKERS, maxsize=ULTRAMSG_FILA_MAX)
+
+async def enfileirar_mensagem(telefone: str, texto: str):
+    """Coloca a mensagem na fila de saída e retorna na hora; a entrega acontece em background."""
+    await _fila.colocar(telefone, (telefone, texto, time.perf_counter()))
+
+def metricas_ultramsg() -> Dict:
+    m = dict(_metricas)
+    m["latencia_media_ms"] = round(m["latencia_total_ms"] / m["enviadas"], 3) if m["enviadas"] else 0.0
+    m["latencia_total_ms"] = round(m["latencia_total_ms"], 3)
+    m["latencia_max_ms"] = round(m["latencia_max_ms"], 3)
+    m["fila"] = _fila.metricas()
+    return m
@@ -0,0 +1,57 @@
+"""Worker separado para JOBS_BACKEND=postgres.
+
+Uso:
+    python -m app.worker
+"""
+# Primeiro import de propósito: marca o começo do carregamento do worker
+from app.utils.processo import marcar, metricas_processo, relatorio_inicializacao
+import asyncio
+import signal
+
+from app.atendimento import processar_mensagem
+from app.config import AQUECER_CONEXOES, JOBS_WORKERS, JOBS_DRENAGEM_TIMEOUT, exigir_config_valida, logger
+from app.utils.ajustes import ajustes
+from app.utils.cardapio_cache import cache_cardapio
+from app.utils.db import abrir_pool, aquecer_pool, fechar_pool
+from app.utils.groq_client import iniciar_cliente_groq, aquecer_cliente_groq, fechar_cliente_groq
+from app.utils.jobs import ConsumidorPostgres
+from app.utils.ultramsg_client import iniciar_cliente_ultramsg, aquecer_cliente_ultramsg, fechar_cliente_ultramsg
+
+
+async def main():
+    exigir_config_valida()
+    await asyncio.to_thread(ajustes.aplicar_na_subida)
+    await asyncio.to_thread(abrir_pool)
+    await ajustes.iniciar()
+    await cache_cardapio.iniciar()
+    await iniciar_cliente_groq()
+    await iniciar_cliente_ultramsg()
+    if AQUECER_CONEXOES:
+        await asyncio.gather(aquecer_pool(), aquecer_cliente_groq(), aquecer_cliente_ultramsg())
+    marcar("pronto")
+
+    parar = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, parar.set)
+
+    consumidor = ConsumidorPostgres(processar_mensagem, workers=JOBS_WORKERS)
+    processo = metricas_processo()
+    logger.info(
+        f"👷 Worker de jobs iniciado com {JOBS_WORKERS} workers em {processo['inicializacao_ms']['pronto']:.0f}ms "
+        f"({relatorio_inicializacao()}), "
+        f"memória {processo['rss_mb']:.1f} MB"
+    )
+    try:
+        await consumidor.rodar(parar)
+    finally:
+        logger.info(f"🛑 Worker encerrando: {consumidor.metricas()}")
+        await fechar_cliente_ultramsg(JOBS_DRENAGEM_TIMEOUT)
+        await fechar_cliente_groq()
+        await cache_cardapio.parar()
+        await ajustes.parar()
+        await asyncio.to_thread(fechar_pool)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
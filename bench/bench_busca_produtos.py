@@ -0,0 +1,93 @@
+"""Compara a busca aproximada em memória com o LIKE do banco.
+
+Uso:
+    python -m bench.bench_busca_produtos [--repeticoes 200]
+
+Sempre mede o índice em memória e uma emulação do `LOWER(nome) LIKE '%x%'`
+sobre o mesmo cardápio de exemplo. Com DATABASE_URL configurada (e a tabela
+`cardapio` com os itens de bench/cardapio_exemplo.json), mede também a consulta
+SQL que o bot usava antes do índice.
+"""
+import argparse
+import json
+import os
+import statistics
+import time
+from pathlib import Path
+
+from app.utils.busca_produtos import IndiceProdutos
+
+AQUI = Path(__file__).resolve().parent
+
+
+def carregar_corpus():
+    casos = []
+    for linha in (AQUI / "frases_pedido.txt").read_text(encoding="utf-8").splitlines():
+        if not linha.strip() or linha.startswith("#"):
+            continue
+        frase, _, esperado = linha.partition("|")
+        casos.append((frase.strip(), esperado.strip() or None))
+    return casos
+
+def like_em_memoria(cardapio):
+    def buscar(frase):
+        alvo = frase.lower()
+        for item in cardapio:
+            if alvo in item["nome"].lower():
+                return item
+        return None
+    return buscar
+
+def like_no_banco(nome_produto):
+    """A busca por LIKE que o bot fazia no banco antes do índice em memória."""
+    from app.utils.db import get_conn
+    with get_conn() as conn, conn.cursor() as cur:
+        cur.execute("""
+            SELECT id, nome, preco_centavos, ativo
+            FROM cardapio
+            WHERE ativo = true AND LOWER(nome) LIKE LOWER(%s)
+            LIMIT 1
+        """, (f"%{nome_produto}%",))
+        return cur.fetchone()
+
+def medir(nome, buscar, casos, repeticoes):
+    tempos = []
+    acertos = 0
+    for frase, esperado in casos:
+        achado = buscar(frase)
+        if (achado["nome"] if achado else None) == esperado:
+            acertos += 1
+        for _ in range(repeticoes):
+            inicio = time.perf_counter()
+            buscar(frase)
+            tempos.append((time.perf_counter() - inicio) * 1e6)
+    tempos.sort()
+    p99 = tempos[int(len(tempos) * 0.99) - 1]
+    print(f"{nome:<22} acerto {acertos:>3}/{len(casos)} ({acertos / len(casos):6.1%})   "
+          f"p50 {statistics.median(tempos):9.1f}µs   p99 {p99:9.1f}µs")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeticoes", type=int, default=200)
+    args = parser.parse_args()
+
+    cardapio = json.loads((AQUI / "cardapio_exemplo.json").read_text(encoding="utf-8"))
+    casos = carregar_corpus()
+    indice = IndiceProdutos(cardapio)
+
+    print(f"{len(casos)} frases, {len(cardapio)} itens no cardápio\n")
+    medir("índice em memória", indice.melhor, casos, args.repeticoes)
+    medir("LIKE (emulado)", like_em_memoria(cardapio), casos, args.repeticoes)
+
+    if os.getenv("DATABASE_URL"):
+        from app.utils.db import fechar_pool
+        try:
+            medir("LIKE (PostgreSQL)", like_no_banco, casos, max(1, args.repeticoes // 20))
+        finally:
+            fechar_pool()
+    else:
+        print("\nDATABASE_URL não configurada: pulando a medição do SQL.")
+
+
+if __name__ == "__main__":
+    main()
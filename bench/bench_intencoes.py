@@ -0,0 +1,82 @@
+"""Mede o motor de intenções: mensagens por segundo e quanto vai pra IA.
+
+Uso:
+    python -m bench.bench_intencoes [--repeticoes 2000]
+
+Compara com as funções de detecção antigas do main.py (reproduzidas aqui),
+que recompilavam regex a cada chamada e davam prioridade fixa ao cardápio.
+"""
+import argparse
+import re
+import time
+from pathlib import Path
+
+from app.utils.intencoes import classificar
+
+AQUI = Path(__file__).resolve().parent
+
+
+def _legado_cardapio(texto):
+    texto = texto.lower()
+    palavras_cardapio = ['cardápio', 'cardapio', 'menu', 'produtos', 'hamburguer', 'lanche', 'o que tem']
+    return any(palavra in texto for palavra in palavras_cardapio)
+
+def _legado_adicionar(texto):
+    texto = texto.lower()
+    patterns = [
+        r"quero (?:o |um |uma )?(.+)",
+        r"adiciona (?:o |um |uma )?(.+)",
+        r"coloca (?:o |um |uma )?(.+)(?:\s+no carrinho)?",
+        r"vou querer (?:o |um |uma )?(.+)"
+    ]
+    for pattern in patterns:
+        match = re.search(pattern, texto)
+        if match:
+            produto = match.group(1).strip()
+            return re.sub(r"\s+(no carrinho|pra mim|por favor).*", "", produto)
+    return None
+
+def legado(texto):
+    if _legado_cardapio(texto):
+        return "cardapio"
+    if _legado_adicionar(texto):
+        return "adicionar"
+    if any(palavra in texto.lower() for palavra in ['carrinho', 'pedido', 'meu pedido']):
+        return "ver_carrinho"
+    return "llm"
+
+def novo(texto):
+    return classificar(texto).nome
+
+def medir(nome, func, mensagens, repeticoes):
+    rotulos = [func(m) for m in mensagens]
+    para_llm = rotulos.count("llm")
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        for m in mensagens:
+            func(m)
+    total = time.perf_counter() - inicio
+    por_seg = repeticoes * len(mensagens) / total
+    print(f"{nome:<8} {por_seg:>12,.0f} msg/s   vão pra IA: {para_llm}/{len(mensagens)} ({para_llm / len(mensagens):.1%})")
+    return rotulos
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeticoes", type=int, default=2000)
+    parser.add_argument("--detalhe", action="store_true", help="mostra a classificação de cada mensagem")
+    args = parser.parse_args()
+
+    mensagens = [l.strip() for l in (AQUI / "mensagens_exemplo.txt").read_text(encoding="utf-8").splitlines() if l.strip()]
+    print(f"{len(mensagens)} mensagens x {args.repeticoes} repetições\n")
+    antigos = medir("legado", legado, mensagens, args.repeticoes)
+    novos = medir("motor", novo, mensagens, args.repeticoes)
+
+    if args.detalhe:
+        print()
+        for m, a, n in zip(mensagens, antigos, novos):
+            marca = "" if a == n else "  <-"
+            print(f"{m[:45]:<45} {a:<13} {n:<13}{marca}")
+
+
+if __name__ == "__main__":
+    main()
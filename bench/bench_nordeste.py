@@ -0,0 +1,65 @@
+"""Compara o nordestinizar antigo (9 re.sub) com o transformador de uma passada.
+
+Uso:
+    python -m bench.bench_nordeste [--repeticoes 5000] [--pedaco 4]
+
+Também mede o modo streaming (texto entregue em pedaços de `--pedaco`
+caracteres, como os tokens da IA) e confere que o resultado é o mesmo do
+texto inteiro.
+"""
+import argparse
+import re
+import time
+from pathlib import Path
+
+from app.utils.nordeste import _SUBSTS, transformador
+
+AQUI = Path(__file__).resolve().parent
+
+
+def legado(texto):
+    t = texto
+    for padrao, substi in _SUBSTS:
+        t = re.sub(padrao, substi, t, flags=re.IGNORECASE)
+    return t.strip()
+
+def novo(texto):
+    return transformador.transformar(texto).strip()
+
+def em_pedacos(texto, tamanho):
+    s = transformador.stream()
+    saida = [s.alimentar(texto[i:i + tamanho]) for i in range(0, len(texto), tamanho)]
+    saida.append(s.finalizar())
+    return "".join(saida)
+
+def medir(nome, func, respostas, repeticoes):
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        for r in respostas:
+            func(r)
+    total = time.perf_counter() - inicio
+    por_resposta_us = total / (repeticoes * len(respostas)) * 1e6
+    print(f"{nome:<10} {por_resposta_us:>8.2f} µs/resposta   {repeticoes * len(respostas) / total:>10,.0f} respostas/s")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeticoes", type=int, default=5000)
+    parser.add_argument("--pedaco", type=int, default=4, help="tamanho dos pedaços no modo streaming")
+    args = parser.parse_args()
+
+    respostas = [l.strip() for l in (AQUI / "respostas_exemplo.txt").read_text(encoding="utf-8").splitlines() if l.strip()]
+    print(f"{len(respostas)} respostas x {args.repeticoes} repetições\n")
+    medir("legado", legado, respostas, args.repeticoes)
+    medir("uma passada", novo, respostas, args.repeticoes)
+    medir("streaming", lambda r: em_pedacos(r, args.pedaco), respostas, args.repeticoes // 5 or 1)
+
+    # O antigo perde a caixa; fora isso o resultado tem que ser igual
+    diferentes = [r for r in respostas if legado(r).lower() != novo(r).lower()]
+    stream_diferente = [r for r in respostas if em_pedacos(r, args.pedaco) != novo(r)]
+    print(f"\ndiferenças (ignorando caixa): {len(diferentes)}   streaming != texto inteiro: {len(stream_diferente)}")
+    for r in respostas[:3]:
+        print(f"\n  {legado(r)}\n  {novo(r)}")
+
+
+if __name__ == "__main__":
+    main()
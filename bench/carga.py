@@ -0,0 +1,293 @@
+"""Teste de carga do bot inteiro, sem sair da máquina.
+
+Sobe o Groq falso (bench/fake_groq.py), a UltraMsg falsa (bench/fake_ultramsg.py),
+um Postgres local com schema e cardápio (bench/postgres_local.py) e o próprio
+app (`uvicorn app.main:app`). Depois dispara webhooks no formato da UltraMsg
+numa taxa fixa e mostra:
+- webhook: requisições/s, p50/p95/p99 e erros;
+- ponta a ponta: do webhook até a resposta chegar na UltraMsg falsa;
+- por etapa: p50/p95/p99 de cada etapa, lidos do /test-db do app.
+
+Uso:
+    python -m bench.carga --taxa 50 --duracao 30
+    python -m bench.carga --taxa 100 --groq-latencia-ms 800 --groq-taxa-429 0.05 --json atual.json
+    python -m bench.carga --comparar base.json   # sai com código 1 se piorou além da tolerância
+
+Variáveis de ajuste do app (GROQ_MAX_CONCORRENCIA, JOBS_WORKERS...) são
+repassadas do ambiente.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from collections import defaultdict, deque
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import httpx
+
+from bench.postgres_local import PostgresLocal, porta_livre
+
+AQUI = Path(__file__).resolve().parent
+RAIZ = AQUI.parent
+
+
+def percentil(valores: List[float], p: float) -> float:
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(p * len(ordenados)))]
+
+def resumo_ms(valores: List[float]) -> Dict:
+    return {
+        "n": len(valores),
+        "p50_ms": round(percentil(valores, 0.50) * 1000, 1),
+        "p95_ms": round(percentil(valores, 0.95) * 1000, 1),
+        "p99_ms": round(percentil(valores, 0.99) * 1000, 1),
+    }
+
+
+class Servidor:
+    """Um uvicorn em subprocesso, esperando responder em `saude` antes de seguir."""
+
+    def __init__(self, nome: str, alvo: str, env: Dict[str, str], saude: str = "/"):
+        self.nome = nome
+        self.alvo = alvo
+        self.env = env
+        self.saude = saude
+        self.url = f"http://127.0.0.1:{porta_livre()}"
+        self._proc: Optional[subprocess.Popen] = None
+
+    def __enter__(self) -> "Servidor":
+        porta = self.url.rsplit(":", 1)[1]
+        self._proc = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", self.alvo, "--host", "127.0.0.1", "--port", porta, "--log-level", "warning"],
+            cwd=RAIZ, env=self.env,
+        )
+        limite = time.monotonic() + 30
+        while time.monotonic() < limite:
+            if self._proc.poll() is not None:
+                raise RuntimeError(f"{self.nome} saiu com código {self._proc.returncode}")
+            try:
+                if httpx.get(self.url + self.saude, timeout=1).status_code < 500:
+                    return self
+            except httpx.TransportError:
+                pass
+            time.sleep(0.2)
+        raise RuntimeError(f"{self.nome} não respondeu em 30s")
+
+    def __exit__(self, *exc):
+        if self._proc and self._proc.poll() is None:
+            self._proc.terminate()
+            try:
+                self._proc.wait(30)
+            except subprocess.TimeoutExpired:
+                self._proc.kill()
+
+
+def gerar_payloads(n: int, telefones: List[str], mensagens: List[str], rnd: random.Random) -> List[Dict]:
+    payloads = []
+    for i in range(n):
+        tel = rnd.choice(telefones)
+        payloads.append({
+            "event_type": "message_received",
+            "instanceId": "bench",
+            "data": {
+                "id": f"bench_{i}_{tel}",
+                "from": f"{tel}@c.us",
+                "to": "5581000000000@c.us",
+                "chatId": f"{tel}@c.us",
+                "body": rnd.choice(mensagens),
+                "pushname": f"Cliente {tel[-4:]}",
+                "type": "chat",
+                "time": int(time.time()),
+            },
+        })
+    return payloads
+
+async def _enviar(cli: httpx.AsyncClient, url: str, payload: Dict) -> Dict:
+    enviado_em = time.time()
+    inicio = time.perf_counter()
+    try:
+        resp = await cli.post(url, json=payload)
+        status = resp.json().get("status", f"http_{resp.status_code}") if resp.status_code == 200 else f"http_{resp.status_code}"
+    except (httpx.HTTPError, ValueError) as e:
+        status = f"excecao_{type(e).__name__}"
+    return {
+        "telefone": payload["data"]["from"].split("@")[0],
+        "enviado_em": enviado_em,
+        "latencia": time.perf_counter() - inicio,
+        "status": status,
+    }
+
+async def disparar(url: str, payloads: List[Dict], taxa: float) -> List[Dict]:
+    """Carga em malha aberta: cada webhook sai no seu horário, sem esperar os anteriores."""
+    limites = httpx.Limits(max_connections=1000, max_keepalive_connections=200)
+    async with httpx.AsyncClient(timeout=30, limits=limites) as cli:
+        tarefas = []
+        inicio = time.perf_counter()
+        for i, payload in enumerate(payloads):
+            espera = inicio + i / taxa - time.perf_counter()
+            if espera > 0:
+                await asyncio.sleep(espera)
+            tarefas.append(asyncio.create_task(_enviar(cli, url, payload)))
+        return await asyncio.gather(*tarefas)
+
+def esperar_respostas(ultramsg_url: str, esperadas: int, parado_por: float) -> Dict:
+    """Espera a UltraMsg falsa receber `esperadas` envios, ou ficar `parado_por` segundos sem novidade."""
+    ultimo, desde = -1, time.monotonic()
+    while True:
+        stats = httpx.get(f"{ultramsg_url}/stats", timeout=10).json()
+        if stats["enviadas"] >= esperadas or time.monotonic() - desde > parado_por:
+            return httpx.get(f"{ultramsg_url}/stats", params={"envios": 1}, timeout=30).json()
+        if stats["enviadas"] != ultimo:
+            ultimo, desde = stats["enviadas"], time.monotonic()
+        time.sleep(0.5)
+
+def ponta_a_ponta(resultados: List[Dict], envios: List[Dict]) -> List[float]:
+    """Casa webhooks e respostas por telefone, em ordem (o bot responde cada cliente em ordem)."""
+    pendentes = defaultdict(deque)
+    for r in sorted(resultados, key=lambda r: r["enviado_em"]):
+        if r["status"] == "enfileirado":
+            pendentes[r["telefone"]].append(r["enviado_em"])
+    tempos = []
+    for e in sorted(envios, key=lambda e: e["em"]):
+        fila = pendentes.get(e["to"])
+        if fila:
+            tempos.append(e["em"] - fila.popleft())
+    return tempos
+
+
+def rodar(args) -> Dict:
+    rnd = random.Random(args.semente)
+    mensagens = [l.strip() for l in (AQUI / "mensagens_exemplo.txt").read_text(encoding="utf-8").splitlines() if l.strip()]
+    telefones = [f"55819{i:08d}" for i in range(args.telefones)]
+    cadastrados = telefones[: int(len(telefones) * args.fracao_cadastrados)]
+    payloads = gerar_payloads(int(args.taxa * args.duracao), telefones, mensagens, rnd)
+
+    base_env = {**os.environ, "LOG_LEVEL": os.getenv("LOG_LEVEL", "WARNING")}
+    env_groq = {**base_env, "FAKE_GROQ_LATENCIA_MS": str(args.groq_latencia_ms),
+                "FAKE_GROQ_JITTER_MS": str(args.groq_jitter_ms), "FAKE_GROQ_TAXA_429": str(args.groq_taxa_429)}
+    env_ultramsg = {**base_env, "FAKE_ULTRAMSG_LATENCIA_MS": str(args.ultramsg_latencia_ms),
+                    "FAKE_ULTRAMSG_TAXA_ERRO": str(args.ultramsg_taxa_erro)}
+
+    with PostgresLocal() as pg, \
+            Servidor("fake_groq", "bench.fake_groq:app", env_groq, "/stats") as groq, \
+            Servidor("fake_ultramsg", "bench.fake_ultramsg:app", env_ultramsg, "/stats") as ultramsg:
+        pg.semear(cadastrados)
+        env_app = {
+            **base_env,
+            "DATABASE_URL": pg.url,
+            "GROQ_API_KEY": "bench",
+            "GROQ_MODEL": "llama-3.3-70b-versatile",
+            "GROQ_BASE_URL": f"{groq.url}/openai/v1",
+            "ULTRAMSG_BASE_URL": ultramsg.url,
+            "ULTRAMSG_INSTANCE_ID": "bench",
+            "ULTRAMSG_TOKEN": "bench",
+        }
+        with Servidor("app", "app.main:app", env_app) as bot:
+            print(f"🚀 {len(payloads)} webhooks a {args.taxa}/s para {bot.url} ({args.telefones} telefones)")
+            inicio = time.time()
+            resultados = asyncio.run(disparar(bot.url + "/", payloads, args.taxa))
+            fim_envio = time.time()
+            aceitos = sum(1 for r in resultados if r["status"] == "enfileirado")
+            stats_ultramsg = esperar_respostas(ultramsg.url, aceitos, args.espera_final)
+            app_metricas = httpx.get(f"{bot.url}/test-db", timeout=30).json()
+            stats_groq = httpx.get(f"{groq.url}/stats", timeout=10).json()
+
+    envios = stats_ultramsg.pop("envios")
+    tempos_e2e = ponta_a_ponta(resultados, envios)
+    ultima_resposta = max((e["em"] for e in envios), default=fim_envio)
+    por_status = defaultdict(int)
+    for r in resultados:
+        por_status[r["status"]] += 1
+    erros_webhook = sum(n for s, n in por_status.items() if s != "enfileirado")
+
+    return {
+        "config": {k: v for k, v in vars(args).items() if k not in ("json", "comparar")},
+        "webhook": {
+            "enviados": len(resultados),
+            "por_segundo": round(len(resultados) / max(fim_envio - inicio, 1e-9), 1),
+            "por_status": dict(por_status),
+            "taxa_erro": round(erros_webhook / len(resultados), 4) if resultados else 0.0,
+            **resumo_ms([r["latencia"] for r in resultados]),
+        },
+        "ponta_a_ponta": {
+            "respostas": len(envios),
+            "sem_resposta": max(aceitos - len(envios), 0),
+            "taxa_erro": round(max(aceitos - len(envios), 0) / aceitos, 4) if aceitos else 0.0,
+            "por_segundo": round(len(envios) / max(ultima_resposta - inicio, 1e-9), 1),
+            **resumo_ms(tempos_e2e),
+        },
+        "etapas": app_metricas.get("etapas", {}),
+        "groq": {**app_metricas.get("groq", {}), "servidor_falso": stats_groq},
+        "ultramsg": {**app_metricas.get("ultramsg", {}), "servidor_falso": stats_ultramsg},
+        "jobs": app_metricas.get("jobs", {}),
+        "pool": app_metricas.get("pool", {}),
+    }
+
+def imprimir(r: Dict):
+    w, e = r["webhook"], r["ponta_a_ponta"]
+    print(f"\nwebhook        {w['por_segundo']:>8.1f} req/s   p50 {w['p50_ms']:>7.1f}ms   p95 {w['p95_ms']:>7.1f}ms   "
+          f"p99 {w['p99_ms']:>7.1f}ms   erros {w['taxa_erro']:.2%}   {w['por_status']}")
+    print(f"ponta a ponta  {e['por_segundo']:>8.1f} msg/s   p50 {e['p50_ms']:>7.1f}ms   p95 {e['p95_ms']:>7.1f}ms   "
+          f"p99 {e['p99_ms']:>7.1f}ms   sem resposta {e['sem_resposta']} ({e['taxa_erro']:.2%})")
+    print("\netapa                          n      média     p50     p95     p99  (ms, p* pelo bucket)")
+    for etapa, m in r["etapas"].items():
+        print(f"  {etapa:<26} {m['n']:>6} {m['media_ms']:>9.2f} {m['p50_ms']:>7.1f} {m['p95_ms']:>7.1f} {m['p99_ms']:>7.1f}")
+    g = r["groq"]
+    print(f"\ngroq: chamadas {g.get('chamadas')}  retries {g.get('retries')}  429 {g.get('respostas_429')}  erros {g.get('erros')}")
+    u = r["ultramsg"]
+    print(f"ultramsg: enviadas {u.get('enviadas')}  falhas {u.get('falhas')}  retries {u.get('retries')}")
+
+def comparar(atual: Dict, base: Dict, tolerancia: float) -> List[str]:
+    """Regressões: vazão caiu ou p95/erros subiram mais que `tolerancia` em relação à base."""
+    problemas = []
+    for secao in ("webhook", "ponta_a_ponta"):
+        a, b = atual[secao], base[secao]
+        if a["por_segundo"] < b["por_segundo"] * (1 - tolerancia):
+            problemas.append(f"{secao}: vazão {a['por_segundo']}/s < {b['por_segundo']}/s")
+        if a["p95_ms"] > b["p95_ms"] * (1 + tolerancia):
+            problemas.append(f"{secao}: p95 {a['p95_ms']}ms > {b['p95_ms']}ms")
+        if a["taxa_erro"] > b["taxa_erro"] + tolerancia / 10:
+            problemas.append(f"{secao}: erros {a['taxa_erro']:.2%} > {b['taxa_erro']:.2%}")
+    return problemas
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Teste de carga offline do bot")
+    parser.add_argument("--taxa", type=float, default=20, help="webhooks por segundo")
+    parser.add_argument("--duracao", type=float, default=15, help="segundos de carga")
+    parser.add_argument("--telefones", type=int, default=200)
+    parser.add_argument("--fracao-cadastrados", type=float, default=0.8, help="fração dos telefones já cadastrados")
+    parser.add_argument("--groq-latencia-ms", type=float, default=300)
+    parser.add_argument("--groq-jitter-ms", type=float, default=200)
+    parser.add_argument("--groq-taxa-429", type=float, default=0.0)
+    parser.add_argument("--ultramsg-latencia-ms", type=float, default=50)
+    parser.add_argument("--ultramsg-taxa-erro", type=float, default=0.0)
+    parser.add_argument("--espera-final", type=float, default=30, help="segundos sem respostas novas pra desistir")
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--json", help="grava o resultado nesse arquivo")
+    parser.add_argument("--comparar", help="resultado anterior (JSON) pra detectar regressão")
+    parser.add_argument("--tolerancia", type=float, default=0.2)
+    args = parser.parse_args()
+
+    resultado = rodar(args)
+    imprimir(resultado)
+    if args.json:
+        Path(args.json).write_text(json.dumps(resultado, indent=2, ensure_ascii=False), encoding="utf-8")
+    if args.comparar:
+        problemas = comparar(resultado, json.loads(Path(args.comparar).read_text(encoding="utf-8")), args.tolerancia)
+        for p in problemas:
+            print(f"❌ regressão: {p}")
+        if problemas:
+            sys.exit(1)
+        print("✅ sem regressão em relação à base")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""Servidor falso compatível com a API de chat da OpenAI/Groq, para testes e benchmarks locais.
+
+Rode com:
+    uvicorn bench.fake_groq:app --port 9001
+e aponte o bot para ele com `GROQ_BASE_URL=http://localhost:9001/openai/v1`.
+
+Variáveis:
+    FAKE_GROQ_LATENCIA_MS  latência simulada por resposta (padrão 300)
+    FAKE_GROQ_JITTER_MS    variação aleatória somada à latência, de 0 até esse valor (padrão 0)
+    FAKE_GROQ_TAXA_429     fração de requisições respondidas com 429 (padrão 0)
+    FAKE_GROQ_RETRY_AFTER  valor do header retry-after nos 429 (padrão 1)
+
+Quando o pedido traz `tools`, a primeira resposta chama `buscar_produto` (e
+`ver_carrinho`, se existir) e a seguinte responde em texto com o que voltou.
+"""
+import asyncio
+import json
+import os
+import random
+import time
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+LATENCIA_MS = float(os.getenv("FAKE_GROQ_LATENCIA_MS", "300"))
+JITTER_MS = float(os.getenv("FAKE_GROQ_JITTER_MS", "0"))
+TAXA_429 = float(os.getenv("FAKE_GROQ_TAXA_429", "0"))
+RETRY_AFTER = os.getenv("FAKE_GROQ_RETRY_AFTER", "1")
+
+RESPOSTA_PADRAO = "Olá! Você está falando com a Brasas. Temos hambúrguer artesanal muito bom, quer ver o cardápio?"
+
+app = FastAPI(title="Fake Groq")
+contadores = {"requisicoes": 0, "respostas_429": 0}
+
+
+def _latencia() -> float:
+    return (LATENCIA_MS + random.uniform(0, JITTER_MS)) / 1000
+
+def _resposta_para(payload: dict) -> str:
+    ultima = payload.get("messages", [{}])[-1].get("content", "")
+    return f"{RESPOSTA_PADRAO} (você disse: {ultima[-60:]})"
+
+def _chamadas_para(payload: dict) -> list:
+    """Chamadas de ferramenta pra primeira volta do modo ferramentas; vazio = responder em texto."""
+    mensagens = payload.get("messages", [{}])
+    if not payload.get("tools") or payload.get("tool_choice") == "none" or mensagens[-1].get("role") != "user":
+        return []
+    nomes = {t["function"]["name"] for t in payload["tools"]}
+    chamadas = [("buscar_produto", {"nome": mensagens[-1].get("content", "")[-40:]})]
+    if "ver_carrinho" in nomes:
+        chamadas.append(("ver_carrinho", {}))
+    return [
+        {"id": f"fake_{i}", "type": "function", "function": {"name": nome, "arguments": json.dumps(args)}}
+        for i, (nome, args) in enumerate(chamadas) if nome in nomes
+    ]
+
+@app.post("/openai/v1/chat/completions")
+async def chat_completions(req: Request):
+    payload = await req.json()
+    contadores["requisicoes"] += 1
+
+    if TAXA_429 and random.random() < TAXA_429:
+        contadores["respostas_429"] += 1
+        return JSONResponse(
+            {"error": {"message": "Rate limit reached", "type": "tokens"}},
+            status_code=429,
+            headers={"retry-after": RETRY_AFTER},
+        )
+
+    texto = _resposta_para(payload)
+    criado = int(time.time())
+
+    if payload.get("stream"):
+        palavras = texto.split(" ")
+        atraso = _latencia() / max(len(palavras), 1)
+
+        async def eventos():
+            for i, palavra in enumerate(palavras):
+                await asyncio.sleep(atraso)
+                pedaco = palavra if i == 0 else " " + palavra
+                chunk = {
+                    "id": "fake",
+                    "object": "chat.completion.chunk",
+                    "created": criado,
+                    "model": payload.get("model"),
+                    "choices": [{"index": 0, "delta": {"content": pedaco}, "finish_reason": None}],
+                }
+                yield f"data: {json.dumps(chunk)}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(eventos(), media_type="text/event-stream")
+
+    await asyncio.sleep(_latencia())
+    chamadas = _chamadas_para(payload)
+    if chamadas:
+        mensagem = {"role": "assistant", "content": None, "tool_calls": chamadas}
+    else:
+        if payload["messages"][-1].get("role") == "tool":
+            texto = f"{RESPOSTA_PADRAO} (consultei: {payload['messages'][-1]['content'][:80]})"
+        mensagem = {"role": "assistant", "content": texto}
+    return {
+        "id": "fake",
+        "object": "chat.completion",
+        "created": criado,
+        "model": payload.get("model"),
+        "choices": [{"index": 0, "message": mensagem, "finish_reason": "tool_calls" if chamadas else "stop"}],
+        "usage": {"prompt_tokens": 50, "completion_tokens": len(texto) // 4, "total_tokens": 50 + len(texto) // 4},
+    }
+
+@app.get("/stats")
+async def stats():
+    return contadores
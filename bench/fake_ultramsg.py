@@ -0,0 +1,52 @@
+"""Servidor falso da UltraMsg, para testes e benchmarks locais.
+
+Rode com:
+    uvicorn bench.fake_ultramsg:app --port 9002
+e aponte o bot para ele com `ULTRAMSG_BASE_URL=http://localhost:9002`.
+
+Variáveis:
+    FAKE_ULTRAMSG_LATENCIA_MS  latência simulada por envio (padrão 50)
+    FAKE_ULTRAMSG_TAXA_ERRO    fração de envios respondidos com 503 (padrão 0)
+
+GET /stats devolve os contadores e, com `?envios=1`, cada envio recebido
+(telefone e horário), que o bench/carga.py usa pra medir o tempo ponta a ponta.
+"""
+import asyncio
+import os
+import random
+import time
+from urllib.parse import parse_qs
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+LATENCIA_MS = float(os.getenv("FAKE_ULTRAMSG_LATENCIA_MS", "50"))
+TAXA_ERRO = float(os.getenv("FAKE_ULTRAMSG_TAXA_ERRO", "0"))
+
+app = FastAPI(title="Fake UltraMsg")
+contadores = {"requisicoes": 0, "enviadas": 0, "erros_simulados": 0}
+registro_envios = []
+
+
+@app.post("/{instancia}/messages/chat")
+async def enviar_chat(instancia: str, req: Request):
+    # Form urlencoded lido na mão, pra não depender do python-multipart
+    campos = {k: v[0] for k, v in parse_qs((await req.body()).decode("utf-8")).items()}
+    contadores["requisicoes"] += 1
+
+    await asyncio.sleep(LATENCIA_MS / 1000)
+    if TAXA_ERRO and random.random() < TAXA_ERRO:
+        contadores["erros_simulados"] += 1
+        return JSONResponse({"error": "serviço indisponível"}, status_code=503)
+    if not campos.get("to") or not campos.get("body"):
+        return {"error": "to e body são obrigatórios"}
+
+    contadores["enviadas"] += 1
+    registro_envios.append({"to": campos["to"], "em": time.time(), "tamanho": len(campos["body"])})
+    return {"sent": "true", "message": "ok", "id": contadores["enviadas"]}
+
+@app.get("/stats")
+async def stats(envios: int = 0):
+    if envios:
+        return {**contadores, "envios": registro_envios}
+    return contadores
@@ -0,0 +1,81 @@
+"""Postgres descartável para o benchmark, já com schema e dados de exemplo.
+
+Com BENCH_DATABASE_URL usa esse banco (as tabelas são criadas se faltarem).
+Sem ela, sobe um cluster temporário com `initdb`/`pg_ctl` (precisam estar no
+PATH) numa porta livre, e apaga tudo na saída. Nada vai pra rede.
+
+    with PostgresLocal() as pg:
+        pg.semear(telefones_cadastrados)
+        ... pg.url ...
+"""
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from typing import List, Optional
+
+AQUI = Path(__file__).resolve().parent
+RAIZ = AQUI.parent
+
+
+def porta_livre() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class PostgresLocal:
+    def __init__(self, url: Optional[str] = None):
+        self.url = url or os.getenv("BENCH_DATABASE_URL")
+        self._dir: Optional[str] = None
+
+    def __enter__(self) -> "PostgresLocal":
+        if self.url:
+            return self
+        if not shutil.which("initdb") or not shutil.which("pg_ctl"):
+            raise RuntimeError("initdb/pg_ctl não encontrados no PATH; defina BENCH_DATABASE_URL")
+        self._dir = tempfile.mkdtemp(prefix="bench_pg_")
+        porta = porta_livre()
+        dados = os.path.join(self._dir, "dados")
+        subprocess.run(["initdb", "-D", dados, "-U", "bench", "--auth=trust", "-E", "UTF8"],
+                       check=True, stdout=subprocess.DEVNULL)
+        subprocess.run(["pg_ctl", "-D", dados, "-l", os.path.join(self._dir, "log"), "-w",
+                        "-o", f"-p {porta} -k {self._dir} -c listen_addresses=127.0.0.1 -c fsync=off",
+                        "start"], check=True, stdout=subprocess.DEVNULL)
+        subprocess.run(["createdb", "-h", "127.0.0.1", "-p", str(porta), "-U", "bench", "bot"], check=True)
+        self.url = f"postgresql://bench@127.0.0.1:{porta}/bot"
+        return self
+
+    def __exit__(self, *exc):
+        if self._dir:
+            subprocess.run(["pg_ctl", "-D", os.path.join(self._dir, "dados"), "-m", "fast", "-w", "stop"],
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            shutil.rmtree(self._dir, ignore_errors=True)
+
+    def semear(self, telefones_cadastrados: List[str]):
+        """Tabelas de negócio + migrations/ + cardápio de exemplo + clientes já cadastrados."""
+        import psycopg2
+
+        with psycopg2.connect(self.url) as conn, conn.cursor() as cur:
+            cur.execute((AQUI / "schema_base.sql").read_text(encoding="utf-8"))
+
+        # As migrações rodam num processo à parte porque app.config lê DATABASE_URL na importação
+        subprocess.run([sys.executable, "-m", "app.migrar"], cwd=RAIZ, check=True,
+                       env={**os.environ, "DATABASE_URL": self.url, "LOG_LEVEL": "WARNING"})
+
+        cardapio = json.loads((AQUI / "cardapio_exemplo.json").read_text(encoding="utf-8"))
+        with psycopg2.connect(self.url) as conn, conn.cursor() as cur:
+            cur.execute("SELECT count(*) FROM cardapio")
+            if cur.fetchone()[0] == 0:
+                cur.executemany(
+                    "INSERT INTO cardapio (nome, preco_centavos, ativo) VALUES (%s, %s, true)",
+                    [(item["nome"], item["preco_centavos"]) for item in cardapio],
+                )
+            cur.executemany(
+                "INSERT INTO clientes (telefone, nome) VALUES (%s, %s) ON CONFLICT (telefone) DO NOTHING",
+                [(tel, f"Cliente {tel[-4:]}") for tel in telefones_cadastrados],
+            )
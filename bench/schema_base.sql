@@ -0,0 +1,30 @@
+-- Tabelas de negócio que o bot espera encontrar (ver README e app/utils/db.py).
+-- Usado só pelo bench/postgres_local.py; as tabelas do próprio bot vêm de migrations/.
+CREATE TABLE IF NOT EXISTS clientes (
+    id SERIAL PRIMARY KEY,
+    nome TEXT NOT NULL,
+    cpf  VARCHAR(14) UNIQUE,
+    telefone VARCHAR(20) UNIQUE,
+    email TEXT
+);
+
+CREATE TABLE IF NOT EXISTS cardapio (
+    id SERIAL PRIMARY KEY,
+    nome TEXT NOT NULL,
+    preco_centavos INTEGER NOT NULL,
+    ativo BOOLEAN NOT NULL DEFAULT true
+);
+
+CREATE TABLE IF NOT EXISTS carrinhos (
+    id SERIAL PRIMARY KEY,
+    usuario_id INTEGER NOT NULL REFERENCES clientes(id),
+    status TEXT NOT NULL DEFAULT 'aberto',
+    criado_em TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE TABLE IF NOT EXISTS itens_carrinho (
+    id SERIAL PRIMARY KEY,
+    carrinho_id INTEGER NOT NULL REFERENCES carrinhos(id),
+    produto_id INTEGER NOT NULL REFERENCES cardapio(id),
+    quantidade INTEGER NOT NULL DEFAULT 1
+);
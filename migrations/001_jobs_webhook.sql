@@ -0,0 +1,15 @@
+-- Fila de jobs do webhook (JOBS_BACKEND=postgres)
+CREATE TABLE IF NOT EXISTS jobs_webhook (
+    id          BIGSERIAL PRIMARY KEY,
+    chat_id     TEXT NOT NULL,
+    payload     JSONB NOT NULL,
+    status      TEXT NOT NULL DEFAULT 'pendente',  -- pendente | processando | erro
+    tentativas  INT NOT NULL DEFAULT 0,
+    erro        TEXT,
+    criado_em   TIMESTAMPTZ NOT NULL DEFAULT now(),
+    iniciado_em TIMESTAMPTZ
+);
+
+CREATE INDEX IF NOT EXISTS jobs_webhook_ativos_idx
+    ON jobs_webhook (chat_id, id)
+    WHERE status IN ('pendente', 'processando');
@@ -0,0 +1,8 @@
+-- Ids de mensagens da UltraMsg já recebidas (DEDUP_POSTGRES=true)
+CREATE TABLE IF NOT EXISTS mensagens_recebidas (
+    message_id  TEXT PRIMARY KEY,
+    recebido_em TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS mensagens_recebidas_recebido_em_idx
+    ON mensagens_recebidas (recebido_em);
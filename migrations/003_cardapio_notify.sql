@@ -0,0 +1,12 @@
+-- Avisa o cache do cardápio (canal cardapio_alterado) a cada alteração na tabela
+CREATE OR REPLACE FUNCTION notificar_cardapio_alterado() RETURNS trigger AS $$
+BEGIN
+    PERFORM pg_notify('cardapio_alterado', '');
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS cardapio_alterado ON cardapio;
+CREATE TRIGGER cardapio_alterado
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON cardapio
+    FOR EACH STATEMENT EXECUTE FUNCTION notificar_cardapio_alterado();
@@ -0,0 +1,21 @@
+-- Telefones passam a ser guardados só com dígitos, pra busca usar o índice UNIQUE
+-- de clientes.telefone em vez de um regexp_replace por linha.
+
+-- Normaliza quem ainda tem máscara. Se dois cadastros viram o mesmo número,
+-- só o mais antigo é normalizado (o outro é duplicata e fica como está).
+UPDATE clientes c
+SET telefone = n.digitos
+FROM (
+    SELECT DISTINCT ON (regexp_replace(telefone, '\D', '', 'g'))
+           id, regexp_replace(telefone, '\D', '', 'g') AS digitos
+    FROM clientes
+    WHERE telefone ~ '\D'
+    ORDER BY regexp_replace(telefone, '\D', '', 'g'), id
+) n
+WHERE c.id = n.id
+  AND NOT EXISTS (SELECT 1 FROM clientes o WHERE o.telefone = n.digitos);
+
+-- Vale pros novos cadastros e alterações; NOT VALID não trava a tabela revalidando o histórico
+ALTER TABLE clientes DROP CONSTRAINT IF EXISTS clientes_telefone_so_digitos;
+ALTER TABLE clientes
+    ADD CONSTRAINT clientes_telefone_so_digitos CHECK (telefone ~ '^[0-9]*$') NOT VALID;
@@ -0,0 +1,29 @@
+-- Um produto aparece uma vez só por carrinho; é o que permite o
+-- INSERT ... ON CONFLICT (carrinho_id, produto_id) DO UPDATE do carrinho.
+
+-- Junta linhas repetidas (somando as quantidades) antes de criar a constraint
+UPDATE itens_carrinho i
+SET quantidade = s.total
+FROM (
+    SELECT carrinho_id, produto_id, SUM(quantidade) AS total
+    FROM itens_carrinho
+    GROUP BY carrinho_id, produto_id
+    HAVING COUNT(*) > 1
+) s
+WHERE i.carrinho_id = s.carrinho_id AND i.produto_id = s.produto_id;
+
+DELETE FROM itens_carrinho a
+USING itens_carrinho b
+WHERE a.carrinho_id = b.carrinho_id
+  AND a.produto_id = b.produto_id
+  AND a.ctid > b.ctid;
+
+DO $$
+BEGIN
+    IF NOT EXISTS (
+        SELECT 1 FROM pg_constraint WHERE conname = 'itens_carrinho_carrinho_produto_key'
+    ) THEN
+        ALTER TABLE itens_carrinho
+            ADD CONSTRAINT itens_carrinho_carrinho_produto_key UNIQUE (carrinho_id, produto_id);
+    END IF;
+END $$;
@@ -0,0 +1,11 @@
+-- Histórico de conversa por chat (MEMORIA_POSTGRES=true)
+CREATE TABLE IF NOT EXISTS conversas_turnos (
+    id        BIGSERIAL PRIMARY KEY,
+    chat_id   TEXT NOT NULL,
+    papel     TEXT NOT NULL,  -- user | assistant
+    conteudo  TEXT NOT NULL,
+    criado_em TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS conversas_turnos_chat_idx
+    ON conversas_turnos (chat_id, id DESC);
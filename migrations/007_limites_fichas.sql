@@ -0,0 +1,10 @@
+-- Baldes de fichas do limite de mensagens pra IA (LIMITE_BACKEND=postgres).
+-- chave = telefone, ou '__global__' pro balde do serviço inteiro.
+CREATE TABLE IF NOT EXISTS limites_fichas (
+    chave         TEXT PRIMARY KEY,
+    fichas        DOUBLE PRECISION NOT NULL,
+    atualizado_em TIMESTAMPTZ NOT NULL DEFAULT clock_timestamp()
+);
+
+CREATE INDEX IF NOT EXISTS limites_fichas_atualizado_em_idx
+    ON limites_fichas (atualizado_em);
@@ -0,0 +1,10 @@
+-- Checkout: o carrinho vira pedido ('fechado') com total e preços congelados,
+-- pra mudança de preço no cardápio não alterar pedido antigo.
+ALTER TABLE carrinhos ADD COLUMN IF NOT EXISTS fechado_em TIMESTAMPTZ;
+ALTER TABLE carrinhos ADD COLUMN IF NOT EXISTS total_centavos INTEGER;
+ALTER TABLE itens_carrinho ADD COLUMN IF NOT EXISTS preco_unitario_centavos INTEGER;
+
+-- Exportação por intervalo de tempo (cozinha, relatório do dia)
+CREATE INDEX IF NOT EXISTS carrinhos_fechados_fechado_em_idx
+    ON carrinhos (fechado_em)
+    WHERE status = 'fechado';
@@ -0,0 +1,21 @@
+-- Ajustes de configuração sem reiniciar os workers (ver app/utils/ajustes.py).
+-- Cada linha sobrescreve um campo recarregável de app/config.py; o valor é texto,
+-- como numa variável de ambiente.
+CREATE TABLE IF NOT EXISTS config_ajustes (
+    chave         TEXT PRIMARY KEY,
+    valor         TEXT NOT NULL,
+    atualizado_em TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+-- Avisa os processos (canal config_ajustada) a cada alteração na tabela
+CREATE OR REPLACE FUNCTION notificar_config_ajustada() RETURNS trigger AS $$
+BEGIN
+    PERFORM pg_notify('config_ajustada', '');
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS config_ajustada ON config_ajustes;
+CREATE TRIGGER config_ajustada
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON config_ajustes
+    FOR EACH STATEMENT EXECUTE FUNCTION notificar_config_ajustada();
@@ -0,0 +1,9 @@
+-- Última atividade do carrinho: a expiração conta a partir dela, não da criação,
+-- pra não expirar o carrinho de quem ainda está pedindo.
+ALTER TABLE carrinhos ADD COLUMN IF NOT EXISTS atualizado_em TIMESTAMPTZ;
+UPDATE carrinhos SET atualizado_em = COALESCE(fechado_em, criado_em) WHERE atualizado_em IS NULL;
+ALTER TABLE carrinhos ALTER COLUMN atualizado_em SET DEFAULT now();
+ALTER TABLE carrinhos ALTER COLUMN atualizado_em SET NOT NULL;
+
+-- Substituído por carrinhos_status_atualizado_em_idx (criado pela manutenção)
+DROP INDEX IF EXISTS carrinhos_status_criado_em_idx;
@@ -0,0 +1,2 @@
+-- Backoff entre tentativas de um job que falhou
+ALTER TABLE jobs_webhook ADD COLUMN IF NOT EXISTS disponivel_em TIMESTAMPTZ NOT NULL DEFAULT now();
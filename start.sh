@@ -4,4 +4,6 @@ set -e
 if [ -f .env ]; then
   export $(grep -v '^#' .env | xargs)
 fi
-uvicorn app.main:app --host 0.0.0.0 --port ${PORT:-10000}
+# Workers: WEB_WORKERS; se 0, um só com JOBS_BACKEND=memoria (padrão) e um por CPU com postgres.
+# uvloop/httptools e drenagem no SIGTERM
+exec python -m app.servidor
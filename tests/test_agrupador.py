@@ -0,0 +1,18 @@
+from app.utils.agrupador import juntar
+
+
+def _msg(texto, message_id, pushname=""):
+    return {"telefone": "5511999999999", "texto": texto, "message_id": message_id, "pushname": pushname}
+
+
+def test_uma_mensagem_passa_como_veio():
+    msg = _msg("oi", "a")
+    assert juntar([msg]) is msg
+
+
+def test_junta_textos_na_ordem_e_guarda_todos_os_ids():
+    junta = juntar([_msg("oi", "a", "Ana"), _msg("", "b"), _msg("quero um x-salada", "c")])
+    assert junta["texto"] == "oi quero um x-salada"
+    assert junta["message_ids"] == ["a", "b", "c"]
+    assert junta["message_id"] == "c"
+    assert junta["pushname"] == "Ana"
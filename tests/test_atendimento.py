@@ -0,0 +1,63 @@
+import asyncio
+
+import pytest
+
+from app import atendimento
+from app.utils.cache_respostas import cache_respostas
+
+PERGUNTA = "vocês abrem que horas?"
+
+
+@pytest.fixture
+def atendimento_falso(monkeypatch):
+    """Cliente cadastrado, envio e limite falsos; a IA não pode ser chamada sem o teste deixar."""
+    estado = {"enviadas": [], "limites": [], "ia": [], "motivo_limite": None}
+
+    async def executar_db(func, *args):
+        return {"id": 1, "nome": "Ana", "telefone": args[0]}
+
+    async def enfileirar_mensagem(telefone, texto):
+        estado["enviadas"].append(texto)
+
+    async def verificar_limite(telefone):
+        estado["limites"].append(telefone)
+        return estado["motivo_limite"]
+
+    async def gerar_resposta_nordestina(mensagem, *args, **kwargs):
+        estado["ia"].append(mensagem)
+        return "resposta da IA"
+
+    monkeypatch.setattr(atendimento, "executar_db", executar_db)
+    monkeypatch.setattr(atendimento, "enfileirar_mensagem", enfileirar_mensagem)
+    monkeypatch.setattr(atendimento, "verificar_limite", verificar_limite)
+    monkeypatch.setattr(atendimento, "gerar_resposta_nordestina", gerar_resposta_nordestina)
+    yield estado
+    cache_respostas.limpar()
+
+
+def _processar(telefone, texto=PERGUNTA):
+    return asyncio.run(atendimento.processar_mensagem({"telefone": telefone, "texto": texto}))
+
+
+def test_resposta_do_cache_nao_gasta_ficha_do_limite(atendimento_falso):
+    cache_respostas.guardar(PERGUNTA, "Abrimos às 18h", 100.0)
+    atendimento_falso["motivo_limite"] = "telefone"
+
+    assert _processar("5511900000001") == {"status": "ok"}
+    assert atendimento_falso["limites"] == []
+    assert atendimento_falso["ia"] == []
+    assert atendimento_falso["enviadas"][0].startswith("Abrimos às 18h")
+
+
+def test_sem_cache_o_limite_vale_antes_da_ia(atendimento_falso):
+    atendimento_falso["motivo_limite"] = "telefone"
+
+    assert _processar("5511900000002")["status"] == "limitado"
+    assert atendimento_falso["limites"] == ["5511900000002"]
+    assert atendimento_falso["ia"] == []
+
+
+def test_sem_cache_e_com_ficha_chama_a_ia(atendimento_falso):
+    assert _processar("5511900000003") == {"status": "ok"}
+    assert atendimento_falso["ia"] == [PERGUNTA]
+    assert atendimento_falso["enviadas"] == ["resposta da IA"]
@@ -0,0 +1,31 @@
+import json
+from pathlib import Path
+
+from app.utils.busca_produtos import IndiceProdutos
+
+BENCH = Path(__file__).resolve().parent.parent / "bench"
+CARDAPIO = json.loads((BENCH / "cardapio_exemplo.json").read_text(encoding="utf-8"))
+
+
+def test_acha_o_produto_de_cada_frase_do_corpus():
+    indice = IndiceProdutos(CARDAPIO)
+    erros = []
+    for linha in (BENCH / "frases_pedido.txt").read_text(encoding="utf-8").splitlines():
+        if not linha.strip() or linha.startswith("#"):
+            continue
+        frase, _, esperado = linha.partition("|")
+        achado = indice.melhor(frase.strip())
+        if (achado["nome"] if achado else None) != (esperado.strip() or None):
+            erros.append(frase)
+    assert erros == []
+
+
+def test_busca_ordena_por_pontuacao_e_respeita_limite():
+    candidatos = IndiceProdutos(CARDAPIO).buscar("x bacon", limite=2)
+    assert candidatos[0][0]["nome"] == "X-Bacon"
+    assert len(candidatos) <= 2
+    assert [s for _, s in candidatos] == sorted((s for _, s in candidatos), reverse=True)
+
+
+def test_palavra_fora_do_cardapio_nao_acha_nada():
+    assert IndiceProdutos(CARDAPIO).buscar("pizza de calabresa") == []
@@ -0,0 +1,21 @@
+from app.config import config
+from app.utils.cache_respostas import motivo_sem_cache
+
+
+def test_pergunta_generica_pode_usar_cache():
+    assert motivo_sem_cache("vocês abrem que horas?") is None
+
+
+def test_continuacao_de_conversa_recente_nao_usa_cache():
+    assert motivo_sem_cache("e o de frango?", segundos_desde_ultimo_turno=30) == "conversa_recente"
+
+
+def test_conversa_antiga_volta_a_usar_cache():
+    antiga = config.CACHE_RESPOSTAS_CONVERSA_RECENTE + 1
+    assert motivo_sem_cache("e o de frango?", segundos_desde_ultimo_turno=antiga) is None
+
+
+def test_mensagens_pessoais_e_com_numero_nao_usam_cache():
+    assert motivo_sem_cache("cadê meu pedido?") == "pessoal"
+    assert motivo_sem_cache("quero 2 x-bacon") == "numeros"
+
@@ -0,0 +1,33 @@
+import pytest
+
+import app.config as modulo
+from app.config import Configuracao, ConfiguracaoInvalida
+
+
+def test_toda_variavel_tem_constante_no_modulo():
+    faltando = [c.nome for c in Configuracao.campos() if not hasattr(modulo, c.nome)]
+    assert faltando == []
+
+
+def test_constantes_tem_o_valor_da_subida():
+    for campo in Configuracao.campos():
+        assert getattr(modulo, campo.nome) == modulo.config.valores()[campo.nome]
+
+
+def test_aplicar_e_tudo_ou_nada():
+    cfg = Configuracao({})
+    antes = cfg.valores()
+    with pytest.raises(ConfiguracaoInvalida):
+        cfg.aplicar({"LIMITE_TELEFONE_CAPACIDADE": "8", "DB_POOL_MAX": "nao_e_numero"})
+    with pytest.raises(ConfiguracaoInvalida):
+        cfg.aplicar({"LIMITE_TELEFONE_CAPACIDADE": "8", "WEB_WORKERS": "4"})
+    assert cfg.valores() == antes
+
+
+def test_aplicar_troca_avisa_e_volta_ao_ambiente():
+    cfg = Configuracao({"LIMITE_TELEFONE_CAPACIDADE": "7"})
+    chamadas = []
+    cfg.ao_mudar(["LIMITE_TELEFONE_CAPACIDADE"], lambda: chamadas.append(cfg.LIMITE_TELEFONE_CAPACIDADE))
+    assert cfg.aplicar({"LIMITE_TELEFONE_CAPACIDADE": "8"}) == {"LIMITE_TELEFONE_CAPACIDADE": (7.0, 8.0)}
+    cfg.aplicar({})
+    assert chamadas == [8.0, 7.0]
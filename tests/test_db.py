@@ -0,0 +1,65 @@
+import pytest
+from psycopg2.pool import PoolError
+
+from app.utils import db
+
+
+class _ConexaoFalsa:
+    closed = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def close(self):
+        self.closed = 1
+
+
+class _PoolFalso:
+    """Mesmo contrato do ThreadedConnectionPool: putconn num pool fechado levanta PoolError."""
+
+    def __init__(self, minconn, maxconn, dsn, **kwargs):
+        self.closed = False
+
+    def getconn(self):
+        if self.closed:
+            raise PoolError("connection pool is closed")
+        return _ConexaoFalsa()
+
+    def putconn(self, conn, close=False):
+        if self.closed:
+            raise PoolError("connection pool is closed")
+
+    def closeall(self):
+        self.closed = True
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    monkeypatch.setattr(db, "ThreadedConnectionPool", _PoolFalso)
+    return db.PoolConexoes("postgresql://falso", 1, 2, timeout=0.1)
+
+
+def test_pool_aposentado_fecha_quando_a_ultima_conexao_volta(pool):
+    with pool.conexao():
+        pool.aposentar()
+        assert not pool._pool.closed
+    assert pool._pool.closed
+    assert pool.em_uso == 0
+
+
+def test_pool_aposentado_sem_conexao_em_uso_fecha_na_hora(pool):
+    pool.aposentar()
+    assert pool._pool.closed
+    with pytest.raises(RuntimeError):
+        with pool.conexao():
+            pass
+
+
+def test_devolver_depois_do_fechamento_forcado_nao_levanta(pool):
+    with pool.conexao() as conn:
+        pool.fechar(timeout=0)
+    assert conn.closed
+    assert pool.em_uso == 0
@@ -0,0 +1,74 @@
+import asyncio
+
+import httpx
+import pytest
+
+from bench import fake_groq
+from app.utils import groq_client
+from app.utils.groq_client import ErroGroq, _montar_payload, _stream_groq
+
+
+@pytest.fixture
+def groq_falso(monkeypatch):
+    """Cliente do Groq apontado pro bench/fake_groq, servido em processo."""
+    monkeypatch.setattr(fake_groq, "LATENCIA_MS", 20.0)
+    monkeypatch.setattr(fake_groq, "TAXA_429", 0.0)
+    monkeypatch.setattr(fake_groq, "RETRY_AFTER", "0")
+    monkeypatch.setattr(groq_client, "_GROQ_ENDPOINT", "http://fake-groq/openai/v1/chat/completions")
+    monkeypatch.setattr(groq_client, "_client", None)
+    monkeypatch.setattr(groq_client, "_semaforo", None)
+    metricas = dict(groq_client._metricas)
+    yield monkeypatch
+    groq_client._metricas.update(metricas)
+
+
+def _rodar(cenario):
+    async def com_cliente():
+        groq_client._client = httpx.AsyncClient(transport=httpx.ASGITransport(app=fake_groq.app))
+        groq_client._semaforo = asyncio.Semaphore(1)
+        try:
+            return await asyncio.wait_for(cenario(), 5)
+        finally:
+            await groq_client._client.aclose()
+    return asyncio.run(com_cliente())
+
+
+def _payload(texto="oi"):
+    return _montar_payload(texto, None)
+
+
+def test_stream_entrega_a_resposta_inteira(groq_falso):
+    async def cenario():
+        return "".join([p async for p in _stream_groq(_payload("quero um x-bacon"))])
+    assert _rodar(cenario) == fake_groq._resposta_para(_payload("quero um x-bacon"))
+
+
+def test_stream_com_429_tenta_de_novo_e_desiste_com_erro(groq_falso):
+    groq_falso.setattr(fake_groq, "TAXA_429", 1.0)
+    antes = dict(groq_client._metricas)
+
+    async def cenario():
+        with pytest.raises(ErroGroq) as erro:
+            async for _ in _stream_groq(_payload()):
+                pass
+        return erro.value
+
+    erro = _rodar(cenario)
+    tentativas = groq_client.config.GROQ_MAX_TENTATIVAS
+    assert erro.status == 429
+    assert groq_client._metricas["respostas_429"] - antes["respostas_429"] == tentativas
+    assert groq_client._metricas["retries"] - antes["retries"] == tentativas - 1
+
+
+def test_consumidor_lento_nao_segura_a_vaga_do_groq(groq_falso):
+    async def cenario():
+        lento = _stream_groq(_payload("primeiro"))
+        await lento.__anext__()
+        # Com uma vaga só, o segundo stream só anda se o primeiro já a devolveu
+        segundo = "".join([p async for p in _stream_groq(_payload("segundo"))])
+        resto = "".join([p async for p in lento])
+        return segundo, resto
+    segundo, resto = _rodar(cenario)
+    assert segundo == fake_groq._resposta_para(_payload("segundo"))
+    assert resto
+    assert groq_client._metricas["em_andamento"] == 0
@@ -0,0 +1,33 @@
+import pytest
+
+from app.utils import groq_client
+from app.utils.groq_client import _contar_uso, conversas_que_mais_gastam, metricas_groq, uso_da_conversa
+
+
+def _resposta(prompt, resposta):
+    return {"usage": {"prompt_tokens": prompt, "completion_tokens": resposta}}
+
+
+@pytest.fixture(autouse=True)
+def limpar_uso():
+    groq_client._uso_por_conversa.limpar()
+    yield
+    groq_client._uso_por_conversa.limpar()
+
+
+def test_uso_da_conversa_soma_as_chamadas():
+    _contar_uso(_resposta(100, 20), "5511900000001")
+    _contar_uso(_resposta(50, 10), "5511900000001")
+    assert uso_da_conversa("5511900000001") == {"chamadas": 2, "tokens_prompt": 150, "tokens_resposta": 30}
+    assert uso_da_conversa("5511900000002")["chamadas"] == 0
+
+
+def test_metricas_mostram_as_conversas_que_mais_gastam_mascaradas():
+    _contar_uso(_resposta(10, 5), "5511900000001")
+    _contar_uso(_resposta(300, 50), "5511900000002")
+    _contar_uso(_resposta(100, 20), "5511900000003")
+
+    topo = conversas_que_mais_gastam(2)
+    assert [c["conversa"] for c in topo] == ["5511…0002", "5511…0003"]
+    assert topo[0]["tokens_prompt"] == 300
+    assert metricas_groq()["conversas_mais_tokens"][0]["conversa"] == "5511…0002"
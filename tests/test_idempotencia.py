@@ -0,0 +1,52 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import main
+from app.utils.idempotencia import esquecer, primeira_vez
+
+
+def _payload(message_id):
+    return {
+        "event_type": "message_received",
+        "data": {"type": "chat", "id": message_id, "body": "oi", "from": "5511900000009@c.us",
+                 "chatId": "5511900000009@c.us", "pushname": "Ana"},
+    }
+
+
+def test_esquecer_deixa_a_mensagem_ser_recebida_de_novo():
+    async def cenario():
+        assert await primeira_vez("idem-1")
+        assert not await primeira_vez("idem-1")
+        await esquecer(["idem-1", None])
+        return await primeira_vez("idem-1")
+    assert asyncio.run(cenario())
+
+
+@pytest.fixture
+def cliente(monkeypatch):
+    enfileiradas = []
+    estado = {"falhar": True}
+
+    async def enfileirar(msg):
+        if estado["falhar"]:
+            raise RuntimeError("banco fora")
+        enfileiradas.append(msg)
+
+    monkeypatch.setattr(main.fila_jobs, "enfileirar", enfileirar)
+    return TestClient(main.app), estado, enfileiradas
+
+
+def test_mensagem_que_nao_entrou_na_fila_e_aceita_no_reenvio(cliente):
+    http, estado, enfileiradas = cliente
+
+    falha = http.post("/", json=_payload("idem-2"))
+    assert falha.status_code == 503
+
+    estado["falhar"] = False
+    reenvio = http.post("/", json=_payload("idem-2"))
+    assert reenvio.json() == {"status": "enfileirado"}
+    assert [m["message_id"] for m in enfileiradas] == ["idem-2"]
+
+    assert http.post("/", json=_payload("idem-2")).json() == {"status": "duplicada"}
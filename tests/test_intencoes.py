@@ -0,0 +1,24 @@
+from app.utils.intencoes import ItemPedido, classificar, extrair_itens
+
+
+def test_extrai_quantidade_em_numero_e_por_extenso():
+    assert extrair_itens("dois x bacon e uma coca") == [ItemPedido("x bacon", 2), ItemPedido("coca", 1)]
+    assert extrair_itens("3 x salada") == [ItemPedido("x salada", 3)]
+
+
+def test_sem_quantidade_vale_um_e_tira_o_artigo():
+    assert extrair_itens("o suco de laranja") == [ItemPedido("suco de laranja", 1)]
+
+
+def test_texto_vazio_nao_tem_itens():
+    assert extrair_itens("") == []
+
+
+def test_pedido_com_virgula_vira_itens():
+    intencao = classificar("Quero dois X-Bacon, uma coca")
+    assert intencao.nome == "adicionar"
+    assert intencao.itens == [ItemPedido("x bacon", 2), ItemPedido("coca", 1)]
+
+
+def test_frase_sem_regra_vai_pra_ia():
+    assert classificar("qual o horário de vocês no domingo?").nome == "llm"
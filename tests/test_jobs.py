@@ -0,0 +1,88 @@
+import asyncio
+
+import psycopg2
+import pytest
+
+from app.utils import jobs
+
+
+class _OuvinteFalso:
+    def __init__(self, canal, ao_notificar):
+        pass
+
+    def iniciar(self):
+        pass
+
+    def parar(self):
+        pass
+
+
+@pytest.fixture
+def banco(monkeypatch):
+    """executar_db falso: cada função do jobs.py responde com o próximo item da sua lista."""
+    respostas = {}
+    chamadas = []
+
+    async def executar_db(func, *args):
+        chamadas.append((func.__name__, args))
+        fila = respostas.get(func.__name__, [])
+        resposta = fila.pop(0) if fila else None
+        if isinstance(resposta, Exception):
+            raise resposta
+        return resposta
+
+    monkeypatch.setattr(jobs, "executar_db", executar_db)
+    monkeypatch.setattr(jobs, "OuvintePostgres", _OuvinteFalso)
+    monkeypatch.setattr(jobs, "JOBS_POLL_INTERVALO", 0.01)
+    return respostas, chamadas
+
+
+def _rodar(consumidor, parar):
+    async def rodar():
+        await asyncio.wait_for(consumidor.rodar(parar), 5)
+    asyncio.run(rodar())
+
+
+def _job(job_id, tentativas=1):
+    return {"id": job_id, "chat_id": "5511900000001", "payload": {"telefone": "5511900000001", "texto": "oi"},
+            "tentativas": tentativas}
+
+
+def test_erro_ao_reservar_nao_derruba_o_worker(banco):
+    respostas, chamadas = banco
+    respostas["_reservar_job"] = [psycopg2.OperationalError("banco fora"), _job(1)]
+    parar = asyncio.Event()
+    recebidos = []
+
+    async def handler(msg):
+        recebidos.append(msg)
+        parar.set()
+        return {"status": "ok"}
+
+    consumidor = jobs.ConsumidorPostgres(handler, workers=1)
+    _rodar(consumidor, parar)
+
+    assert [m["texto"] for m in recebidos] == ["oi"]
+    assert ("_concluir_job", (1,)) in chamadas
+    assert consumidor.erros_banco == 1
+    assert consumidor.processados == 1
+
+
+def test_handler_que_falha_devolve_o_job_com_a_tentativa(banco):
+    respostas, chamadas = banco
+    respostas["_reservar_job"] = [_job(7, tentativas=2)]
+    parar = asyncio.Event()
+    recebidos = []
+
+    async def handler(msg):
+        recebidos.append(msg)
+        parar.set()
+        raise RuntimeError("IA fora")
+
+    consumidor = jobs.ConsumidorPostgres(handler, workers=1)
+    _rodar(consumidor, parar)
+
+    assert recebidos[0]["tentativas_restantes"] == jobs.JOBS_MAX_TENTATIVAS - 2
+    assert ("_falhar_job", (7, 2, "IA fora")) in chamadas
+    assert ("_concluir_job", (7,)) not in chamadas
+    assert consumidor.falhas == 1
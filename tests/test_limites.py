@@ -0,0 +1,21 @@
+from app.utils.limites import Balde
+
+
+def test_balde_gasta_ate_esvaziar():
+    balde = Balde(2)
+    agora = balde.atualizado_em
+    for _ in range(2):
+        assert balde.disponivel(agora, 2, 60)
+        balde.gastar()
+    assert not balde.disponivel(agora, 2, 60)
+
+
+def test_balde_enche_com_o_tempo_sem_passar_da_capacidade():
+    balde = Balde(3)
+    agora = balde.atualizado_em
+    for _ in range(3):
+        balde.gastar()
+    assert not balde.disponivel(agora + 0.5, 3, 60)
+    assert balde.disponivel(agora + 1, 3, 60)
+    balde.disponivel(agora + 3600, 3, 60)
+    assert balde.fichas == 3
@@ -0,0 +1,78 @@
+import asyncio
+from datetime import datetime, timezone
+
+from app.utils import memoria as modulo
+from app.utils.memoria import MemoriaConversas, _cortar, estimar_tokens
+
+
+def test_turno_que_sai_do_buffer_vai_pro_resumo():
+    m = MemoriaConversas(max_conversas=10, max_turnos=2, max_chars_resumo=200)
+    m.registrar("a", "user", "quero um x-bacon")
+    m.registrar("a", "assistant", "anotado")
+    m.registrar("a", "user", "e uma coca")
+
+    historico = m.historico("a", orcamento_tokens=1000)
+    assert historico[0] == {"role": "system", "content": "Resumo do começo da conversa: Cliente: quero um x-bacon"}
+    assert [h["content"] for h in historico[1:]] == ["anotado", "e uma coca"]
+    assert m.resumidas == 1
+
+
+def test_resumo_fica_com_o_final_quando_passa_do_limite():
+    m = MemoriaConversas(max_conversas=10, max_turnos=1, max_chars_resumo=20)
+    for texto in ("primeira mensagem bem comprida", "segunda", "terceira"):
+        m.registrar("a", "user", texto)
+    resumo = m._conversas["a"].resumo
+    assert len(resumo) == 20
+    assert resumo.startswith("…") and resumo.endswith("Cliente: segunda")
+
+
+def test_historico_respeita_o_orcamento_de_tokens_pelos_mais_recentes():
+    m = MemoriaConversas(max_conversas=10, max_turnos=10, max_chars_resumo=200)
+    for texto in ("a" * 40, "b" * 40, "c" * 40):
+        m.registrar("a", "user", texto)
+    orcamento = estimar_tokens("b" * 40) + estimar_tokens("c" * 40)
+    assert [h["content"][0] for h in m.historico("a", orcamento)] == ["b", "c"]
+
+
+def test_conversa_menos_usada_e_descartada():
+    m = MemoriaConversas(max_conversas=2, max_turnos=5, max_chars_resumo=200)
+    m.registrar("a", "user", "oi")
+    m.registrar("b", "user", "oi")
+    m.historico("a", 100)
+    m.registrar("c", "user", "oi")
+    assert (m.tem("a"), m.tem("b"), m.tem("c")) == (True, False, True)
+    assert m.descartadas == 1
+
+
+def test_turno_enorme_e_cortado():
+    texto = "x" * (modulo.MEMORIA_MAX_CHARS_TURNO + 500)
+    cortado = _cortar(texto)
+    assert len(cortado) == modulo.MEMORIA_MAX_CHARS_TURNO
+    assert cortado.endswith("…")
+    assert _cortar("oi") == "oi"
+
+
+def test_conversa_do_banco_e_carregada_antes_do_primeiro_turno(monkeypatch):
+    carregamentos = []
+    gravados = []
+    horario = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+    async def executar_db(func, *args):
+        if func is modulo._carregar_turnos:
+            carregamentos.append(args[0])
+            return [{"papel": "user", "conteudo": "meu nome é Ana", "criado_em": horario},
+                    {"papel": "assistant", "conteudo": "oi, Ana", "criado_em": horario}]
+        gravados.append(args)
+
+    monkeypatch.setattr(modulo, "MEMORIA_POSTGRES", True)
+    monkeypatch.setattr(modulo, "executar_db", executar_db)
+    monkeypatch.setattr(modulo, "memoria", MemoriaConversas(10, 5, 200))
+
+    async def cenario():
+        await modulo.registrar_turno("5511900000001", "user", "quero um x-salada")
+        return await modulo.obter_historico("5511900000001", 1000)
+
+    historico = asyncio.run(cenario())
+    assert [h["content"] for h in historico] == ["meu nome é Ana", "oi, Ana", "quero um x-salada"]
+    assert carregamentos == ["5511900000001"]
+    assert gravados == [("5511900000001", "user", "quero um x-salada")]
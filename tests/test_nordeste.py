@@ -0,0 +1,40 @@
+import asyncio
+from pathlib import Path
+
+from app.utils.nordeste import TransformadorNordestino, nordestinizar, nordestinizar_stream, transformador
+
+RESPOSTAS = (Path(__file__).resolve().parent.parent / "bench" / "respostas_exemplo.txt").read_text(encoding="utf-8").splitlines()
+
+
+def _pedacos(texto, tamanho):
+    return [texto[i:i + tamanho] for i in range(0, len(texto), tamanho)]
+
+def _stream(t, pedacos):
+    s = t.stream()
+    return "".join(s.alimentar(p) for p in pedacos) + s.finalizar()
+
+
+def test_stream_sai_igual_ao_texto_inteiro():
+    for texto in RESPOSTAS:
+        for tamanho in (1, 3, 7, len(texto) or 1):
+            assert _stream(transformador, _pedacos(texto, tamanho)) == nordestinizar(texto, add_tail=False)
+
+
+def test_expressao_de_varias_palavras_cortada_no_meio():
+    t = TransformadorNordestino([(r"\bmuito obrigado\b", "valeu demais"), (r"\bmuito\b", "muuuito")])
+    texto = "Muito obrigado e muito bom"
+    for tamanho in (1, 2, 5):
+        assert _stream(t, _pedacos(texto, tamanho)) == t.transformar(texto) == "Valeu demais e muuuito bom"
+
+
+def test_nordestinizar_stream_assincrono():
+    texto = RESPOSTAS[0]
+
+    async def gerar():
+        for p in _pedacos(texto, 4):
+            yield p
+
+    async def coletar():
+        return "".join([p async for p in nordestinizar_stream(gerar(), add_tail=False)])
+
+    assert asyncio.run(coletar()) == nordestinizar(texto, add_tail=False)